@@ -2,16 +2,189 @@
 Calculate sizes of documents, collections, and databases
 """
 
-from typing import Dict, Optional
-from models.schema import Schema, Field, Collection
+import math
+from typing import Dict, Optional, Tuple, Any, Iterable
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from models.schema import Schema, Collection, Index
 from models.statistics import Statistics
 from config.constants import *
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for the batch APIs
+    np = None
+
+
+def _require_numpy():
+    """Raise a clear error when a batch API is used without NumPy"""
+    if np is None:
+        raise ImportError("NumPy is required for batch size evaluation (pip install numpy)")
+
+
+@dataclass(frozen=True)
+class SizePlan:
+    """
+    Flat, precompiled representation of a document size.
+
+    size = base_bytes + sum(coefficient * prod(array_sizes[name] for name in path))
+
+    Each array path is the tuple of array field names from the root down to
+    the array (nested arrays multiply their cardinalities).
+    """
+    base_bytes: int
+    array_terms: Tuple[Tuple[Tuple[str, ...], int], ...] = ()
+
+    def evaluate(self, array_sizes: Optional[Dict[str, int]] = None) -> int:
+        """
+        Evaluate the plan for a given array-size mapping
+
+        Args:
+            array_sizes: Dictionary of array field names to their average sizes
+
+        Returns:
+            Size in bytes
+        """
+        if array_sizes is None:
+            array_sizes = {}
+
+        total_size = self.base_bytes
+        for path, coefficient in self.array_terms:
+            multiplier = 1
+            for array_name in path:
+                multiplier *= array_sizes.get(array_name, 1)
+            total_size += coefficient * multiplier
+
+        return total_size
+
+    def evaluate_batch(self, array_sizes: Optional[Dict[str, Any]] = None):
+        """
+        Evaluate the plan over NumPy arrays of array cardinalities
+
+        Args:
+            array_sizes: Dictionary of array field names to scalars or arrays
+                (arrays are broadcast against each other)
+
+        Returns:
+            NumPy array of sizes in bytes
+        """
+        _require_numpy()
+        if array_sizes is None:
+            array_sizes = {}
+
+        total_size = np.asarray(self.base_bytes)
+        for path, coefficient in self.array_terms:
+            multiplier = 1
+            for array_name in path:
+                multiplier = multiplier * np.asarray(array_sizes.get(array_name, 1))
+            total_size = total_size + coefficient * multiplier
+
+        return total_size
+
+    @property
+    def array_names(self) -> Tuple[str, ...]:
+        """Names of all array fields the plan depends on"""
+        names = []
+        for path, _ in self.array_terms:
+            for array_name in path:
+                if array_name not in names:
+                    names.append(array_name)
+        return tuple(names)
+
+
+@dataclass(frozen=True)
+class IndexSize:
+    """Estimated size and shape of a B-tree index"""
+    index: Index
+    entries: int  # Index entries (one per array element for a multikey index)
+    entry_size_bytes: int  # Key values plus record id
+    size_bytes: int  # All the pages of the index, over every shard
+    depth: int  # Levels of one shard's B-tree, root to leaf (index pages read per lookup)
+    pages_per_lookup: int  # Index pages plus document pages read per lookup
+
+
+@dataclass
+class BatchSizeResult:
+    """Document, collection and database sizes evaluated over a parameter grid"""
+    document_sizes: Dict[str, Any] = field(default_factory=dict)  # collection name -> ndarray
+    collection_sizes: Dict[str, Any] = field(default_factory=dict)  # collection name -> ndarray
+    database_size: Any = None  # ndarray
+
+
+class ProjectionSizeCache:
+    """
+    Bounded LRU cache of projection sizes
+
+    Keyed by (frozen schema, projected keys, array sizes). Schemas are keyed
+    on their interned frozen form, so equal schemas share entries and adding
+    a field to a schema never hits the entries of its previous shape. Keys
+    are stored as a sorted tuple so order does not matter but repeated keys
+    still count, exactly like the projection schemas built by the operators.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, int]" = OrderedDict()
+
+    @staticmethod
+    def make_key(schema: Schema, keys: Iterable[str],
+                 array_sizes: Optional[Dict[str, int]] = None) -> tuple:
+        """Build the cache key for a projection"""
+        frozen_keys = tuple(sorted(key for key in keys if key is not None))
+        frozen_sizes = tuple(sorted(array_sizes.items())) if array_sizes else ()
+        return (schema.freeze(), frozen_keys, frozen_sizes)
+
+    def get(self, key: tuple) -> Optional[int]:
+        """Return the cached size for `key`, or None on a miss"""
+        size = self._entries.get(key)
+        if size is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return size
+
+    def put(self, key: tuple, size: int):
+        """Store a projection size, evicting the least recently used entry"""
+        self._entries[key] = size
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> Dict[str, int]:
+        """Hit/miss counters and current size"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared by every SizeCalculator (and therefore every operator) by default
+DEFAULT_PROJECTION_CACHE = ProjectionSizeCache()
+
+
 class SizeCalculator:
     """Calculate sizes for schemas and collections"""
     
-    def __init__(self, statistics: Statistics):
+    def __init__(self, statistics: Statistics,
+                 projection_cache: Optional[ProjectionSizeCache] = None):
         self.stats = statistics
+        if projection_cache is None:
+            projection_cache = DEFAULT_PROJECTION_CACHE
+        self.projection_cache = projection_cache
     
     def calculate_document_size(self, schema: Schema, 
                                array_sizes: Optional[Dict[str, int]] = None) -> int:
@@ -25,66 +198,81 @@ class SizeCalculator:
         Returns:
             Size in bytes
         """
-        if array_sizes is None:
-            array_sizes = {}
-        
-        total_size = 0
-        
-        for field in schema.fields:
-            field_size = self._calculate_field_size(field, array_sizes)
-            total_size += field_size
-        
-        return total_size
-    
-    def _calculate_field_size(self, field: Field, 
-                             array_sizes: Dict[str, int]) -> int:
+        return self.compile_size_plan(schema).evaluate(array_sizes)
+
+    def calculate_projection_size(self, schema: Schema, keys: Iterable[str],
+                                  array_sizes: Optional[Dict[str, int]] = None) -> int:
         """
-        Compute the storage size of a single field, based on its type.
+        Calculate the size of a document projected on `keys`, through the
+        shared projection cache. Keys missing from the schema are ignored.
 
         Args:
-            field: The `Field` object describing the field's type and structure.
-            array_sizes: Dictionary of expected element counts for array fields.
+            schema: Source schema
+            keys: Keys to keep (repeated keys are counted each time)
+            array_sizes: Dictionary of array field names to their average sizes
 
         Returns:
-            Total byte size contributed by this field.
+            Size in bytes of the projected document
         """
-        # Add key-value overhead
-        size = KEY_VALUE_OVERHEAD
-        
-        # Basic types
-        if field.field_type == 'integer':
-            size += INTEGER_SIZE
-        
-        elif field.field_type == 'number':
-            size += NUMBER_SIZE
-        
-        elif field.field_type == 'string':
-            size += STRING_SIZE
+        keys = list(keys)
+        cache_key = self.projection_cache.make_key(schema, keys, array_sizes)
+        size = self.projection_cache.get(cache_key)
+        if size is None:
+            projection = Schema(name=f"{schema.name}_projection")
+            for key in keys:
+                schema_field = schema.get_field(key)
+                if schema_field:
+                    projection.add_field(schema_field)
+            size = self.calculate_document_size(projection, array_sizes)
+            self.projection_cache.put(cache_key, size)
+        return size
 
-        elif field.field_type == 'date':
-            size += DATE_SIZE
+    def compile_size_plan(self, schema: Schema) -> SizePlan:
+        """
+        Compile a schema into a flat size plan, cached on the schema
 
-        elif field.field_type == 'longstring':
-            size += LONG_STRING_SIZE
-        
-        # Nested objects
-        elif field.field_type == 'object' and field.nested_schema:
-            nested_size = self.calculate_document_size(
-                field.nested_schema, 
-                array_sizes
-            )
-            size += nested_size
-        
-        # Arrays
-        elif field.field_type == 'array' and field.array_item_schema:
-            array_count = array_sizes.get(field.name, 1)
-            item_size = self.calculate_document_size(
-                field.array_item_schema,
-                array_sizes
-            )
-            size += ARRAY_OVERHEAD + (array_count * item_size)
-        
-        return size
+        Nested schemas are compiled (and cached) first, so shared sub-schemas
+        are only walked once. The plan is invalidated when a field is added
+        to the schema; nested schemas are expected to be complete before
+        being attached to a field.
+
+        Args:
+            schema: The schema to compile
+
+        Returns:
+            SizePlan for the schema
+        """
+        plan = schema._size_plan
+        if plan is not None:
+            return plan
+
+        base_bytes = 0
+        terms: Dict[Tuple[str, ...], int] = {}
+
+        for schema_field in schema.fields:
+            # Key-value overhead and fixed-size basic types
+            base_bytes += KEY_VALUE_OVERHEAD + TYPE_SIZES.get(schema_field.field_type, 0)
+
+            # Nested objects: merged as-is
+            if schema_field.field_type == 'object' and schema_field.nested_schema:
+                nested_plan = self.compile_size_plan(schema_field.nested_schema)
+                base_bytes += nested_plan.base_bytes
+                for path, coefficient in nested_plan.array_terms:
+                    terms[path] = terms.get(path, 0) + coefficient
+
+            # Arrays: overhead once, items once per element
+            elif schema_field.field_type == 'array' and schema_field.array_item_schema:
+                base_bytes += ARRAY_OVERHEAD
+                item_plan = self.compile_size_plan(schema_field.array_item_schema)
+                item_path = (schema_field.name,)
+                terms[item_path] = terms.get(item_path, 0) + item_plan.base_bytes
+                for path, coefficient in item_plan.array_terms:
+                    nested_path = item_path + path
+                    terms[nested_path] = terms.get(nested_path, 0) + coefficient
+
+        plan = SizePlan(base_bytes=base_bytes, array_terms=tuple(terms.items()))
+        schema._size_plan = plan
+        return plan
     
     def calculate_collection_size(self, collection: Collection,
                                   array_sizes: Optional[Dict[str, int]] = None) -> int:
@@ -106,10 +294,172 @@ class SizeCalculator:
         
         return total_size
     
-    def calculate_database_size(self, database) -> int:
+    def calculate_index_size(self, collection: Collection, index: Index,
+                             array_sizes: Optional[Dict[str, int]] = None,
+                             page_size_bytes: int = PAGE_SIZE_BYTES) -> IndexSize:
         """
-        Calculate total database size in bytes
-        
+        Estimate the size and depth of a B-tree index
+
+        Each shard holds a B-tree over its documents: leaves store the key
+        values and a record id, inner nodes the key values and a child page
+        id, in pages filled at BTREE_FILL_FACTOR. A multikey index has one
+        entry per element of the arrays its keys go through.
+
+        Args:
+            collection: Indexed collection
+            index: Index of the collection
+            array_sizes: Dictionary of array field names to their average sizes
+            page_size_bytes: Storage page size
+
+        Returns:
+            IndexSize
+
+        Raises:
+            ValueError: If an index key is missing from the collection schema
+        """
+        if array_sizes is None:
+            array_sizes = {}
+        schema = collection.schema
+
+        key_bytes = 0
+        for key in index.keys:
+            key_field = schema.get_field(key)
+            if key_field is None:
+                raise ValueError(f"{collection.name} has no key {key!r} (index {index.name})")
+            sub_schema = key_field.nested_schema or key_field.array_item_schema
+            if sub_schema is not None:
+                key_bytes += self.compile_size_plan(sub_schema).evaluate(array_sizes)
+            else:
+                key_bytes += TYPE_SIZES.get(key_field.field_type, 0)
+        entry_size = key_bytes + INDEX_POINTER_SIZE
+
+        entries_per_document = 1
+        for path in index.array_paths(schema):
+            entries_per_document *= array_sizes.get(schema.get_field(path).name, 1)
+        entries = collection.document_count * entries_per_document
+
+        usable_page_bytes = page_size_bytes * BTREE_FILL_FACTOR
+        fanout = max(int(usable_page_bytes // entry_size), 2)
+
+        def tree_pages(num_entries: float) -> Tuple[int, int]:
+            """(pages, levels) of a B-tree over `num_entries` entries"""
+            level_pages = max(math.ceil(num_entries * entry_size / usable_page_bytes), 1)
+            pages, levels = level_pages, 1
+            while level_pages > 1:
+                level_pages = math.ceil(level_pages / fanout)
+                pages += level_pages
+                levels += 1
+            return pages, levels
+
+        _, depth = tree_pages(entries / max(self.stats.num_servers, 1))
+        total_pages, _ = tree_pages(entries)
+
+        document_pages = max(math.ceil(self.calculate_document_size(schema, array_sizes) / page_size_bytes), 1)
+
+        return IndexSize(
+            index=index,
+            entries=entries,
+            entry_size_bytes=entry_size,
+            size_bytes=total_pages * page_size_bytes,
+            depth=depth,
+            pages_per_lookup=depth + document_pages
+        )
+
+    def calculate_indexes_size(self, collection: Collection,
+                               array_sizes: Optional[Dict[str, int]] = None,
+                               page_size_bytes: int = PAGE_SIZE_BYTES) -> int:
+        """
+        Calculate the total size of the indexes of a collection in bytes
+
+        Args:
+            collection: Collection whose index catalog is sized
+            array_sizes: Dictionary of array field names to their average sizes
+            page_size_bytes: Storage page size
+
+        Returns:
+            Size in bytes (0 without an index catalog)
+        """
+        return sum(
+            self.calculate_index_size(collection, index, array_sizes, page_size_bytes).size_bytes
+            for index in collection.indexes
+        )
+
+    def calculate_document_size_batch(self, schema: Schema,
+                                      array_sizes: Optional[Dict[str, Any]] = None):
+        """
+        Vectorized `calculate_document_size` over arrays of array cardinalities
+
+        Args:
+            schema: The schema to calculate size for
+            array_sizes: Dictionary of array field names to NumPy arrays (or scalars)
+
+        Returns:
+            NumPy array of sizes in bytes
+        """
+        return self.compile_size_plan(schema).evaluate_batch(array_sizes)
+
+    def calculate_collection_size_batch(self, collection: Collection,
+                                        array_sizes: Optional[Dict[str, Any]] = None):
+        """
+        Vectorized `calculate_collection_size` (does not update the collection cache)
+
+        Args:
+            collection: Collection to calculate size for
+            array_sizes: Dictionary of array field names to NumPy arrays (or scalars)
+
+        Returns:
+            NumPy array of sizes in bytes
+        """
+        doc_size = self.calculate_document_size_batch(collection.schema, array_sizes)
+        return doc_size * collection.document_count
+
+    def calculate_sizes_batch(self, database,
+                              array_sizes: Optional[Dict[str, Any]] = None) -> BatchSizeResult:
+        """
+        Evaluate document, collection and database sizes over a parameter grid
+        in one vectorized pass.
+
+        Example:
+            stocks, order_lines = np.meshgrid(np.arange(50, 5001), np.arange(1, 501))
+            calc.calculate_sizes_batch(db, {"categories": 2, "stocks": stocks,
+                                            "orderLines": order_lines})
+
+        Args:
+            database: Database to evaluate
+            array_sizes: Dictionary of array field names to NumPy arrays (or scalars)
+
+        Returns:
+            BatchSizeResult whose arrays all share the broadcast grid shape
+        """
+        _require_numpy()
+        if array_sizes is None:
+            array_sizes = {}
+
+        shape = np.broadcast_shapes(*[np.shape(size) for size in array_sizes.values()])
+        result = BatchSizeResult(database_size=np.zeros(shape, dtype=np.int64))
+
+        for collection in database.collections.values():
+            doc_size = np.broadcast_to(
+                self.calculate_document_size_batch(collection.schema, array_sizes),
+                shape
+            )
+            coll_size = doc_size * collection.document_count
+            result.document_sizes[collection.name] = doc_size
+            result.collection_sizes[collection.name] = coll_size
+            result.database_size = result.database_size + coll_size
+
+        return result
+
+    def calculate_database_size(self, database,
+                                array_sizes: Optional[Dict[str, int]] = None) -> int:
+        """
+        Calculate total database size in bytes, collections and their indexes
+
+        Args:
+            database: Database to calculate size for
+            array_sizes: Dictionary of array field names to their average
+                sizes (for collections not sized yet and for multikey indexes)
+
         Returns:
             Size in bytes
         """
@@ -118,10 +468,10 @@ class SizeCalculator:
         for collection in database.collections.values():
             if collection._collection_size is None:
                 # Need to calculate collection size first
-                # Note: This is simplified - in reality you'd need array_sizes
-                self.calculate_collection_size(collection)
+                self.calculate_collection_size(collection, array_sizes)
             
             total_size += collection._collection_size
+            total_size += self.calculate_indexes_size(collection, array_sizes)
         
         return total_size
     
@@ -0,0 +1,177 @@
+"""
+Cluster hardware profiles
+Network, disk, CPU and memory of the servers, price and carbon intensities
+and server count, loadable from JSON or TOML
+"""
+
+import json
+import os
+from dataclasses import dataclass, fields, asdict, replace
+from typing import Any, Dict, Optional
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+from config.constants import (
+    BANDWIDTH_SPEED,
+    NETWORK_RTT_MS,
+    DISK_SPEED,
+    DISK_RANDOM_READ_MS,
+    PAGE_SIZE_BYTES,
+    BUFFER_CACHE_FRACTION,
+    INDEX_ACCESS_TIME_MS,
+    FULL_SCAN_TIME_PER_DOC_MS,
+    COMPARISON_TIME_MS,
+    MEMORY_PER_SERVER_BYTES,
+    COST_PER_GB_TRANSFER,
+    CARBON_PER_GB_TRANSFER,
+    COST_PER_SERVER_MS,
+    CARBON_PER_SERVER_MS,
+)
+
+
+@dataclass(frozen=True)
+class ClusterProfile:
+    """
+    Hardware and pricing of a cluster
+
+    Defaults reproduce config/constants.py. Profiles are frozen (hence
+    hashable), so cost models and their memoized costs are keyed by profile.
+    """
+    name: str = "default"
+    num_servers: Optional[int] = None  # None = keep Statistics.num_servers
+
+    # Network
+    bandwidth_bytes_per_s: float = BANDWIDTH_SPEED
+    coordinator_bandwidth_bytes_per_s: Optional[float] = None  # None = bandwidth_bytes_per_s
+    network_rtt_ms: float = NETWORK_RTT_MS
+
+    # Disk
+    disk_bytes_per_s: float = DISK_SPEED  # sequential throughput
+    disk_random_read_ms: float = DISK_RANDOM_READ_MS
+    page_size_bytes: int = PAGE_SIZE_BYTES
+
+    # CPU
+    index_access_time_ms: float = INDEX_ACCESS_TIME_MS
+    full_scan_time_per_doc_ms: float = FULL_SCAN_TIME_PER_DOC_MS
+    comparison_time_ms: float = COMPARISON_TIME_MS
+
+    # RAM
+    memory_per_server_bytes: int = MEMORY_PER_SERVER_BYTES
+    buffer_cache_fraction: float = BUFFER_CACHE_FRACTION  # share of the RAM caching pages
+
+    # Price and carbon intensities
+    cost_per_gb_transfer: float = COST_PER_GB_TRANSFER
+    carbon_per_gb_transfer: float = CARBON_PER_GB_TRANSFER
+    cost_per_server_ms: float = COST_PER_SERVER_MS
+    carbon_per_server_ms: float = CARBON_PER_SERVER_MS
+
+    def __post_init__(self):
+        if self.num_servers is not None and self.num_servers < 1:
+            raise ValueError(f"num_servers must be at least 1, got {self.num_servers}")
+        for name in ("bandwidth_bytes_per_s", "coordinator_bandwidth_bytes_per_s",
+                     "disk_bytes_per_s", "page_size_bytes", "memory_per_server_bytes"):
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive, got {value}")
+        if not 0 <= self.buffer_cache_fraction <= 1:
+            raise ValueError(f"buffer_cache_fraction must be between 0 and 1, got {self.buffer_cache_fraction}")
+
+    @property
+    def bandwidth_bytes_per_ms(self) -> float:
+        """Server link bandwidth in bytes per millisecond"""
+        return self.bandwidth_bytes_per_s / 1000
+
+    @property
+    def coordinator_bandwidth_bytes_per_ms(self) -> float:
+        """Coordinator link bandwidth in bytes per millisecond"""
+        if self.coordinator_bandwidth_bytes_per_s is None:
+            return self.bandwidth_bytes_per_ms
+        return self.coordinator_bandwidth_bytes_per_s / 1000
+
+    @property
+    def disk_bytes_per_ms(self) -> float:
+        """Sequential disk throughput in bytes per millisecond"""
+        return self.disk_bytes_per_s / 1000
+
+    @property
+    def buffer_cache_bytes(self) -> float:
+        """Buffer cache of one server in bytes"""
+        return self.memory_per_server_bytes * self.buffer_cache_fraction
+
+    def apply_to(self, statistics):
+        """
+        Statistics with the server count of the profile
+
+        Args:
+            statistics: Database statistics
+
+        Returns:
+            `statistics` itself if the profile keeps its server count,
+            otherwise a copy with num_servers replaced
+        """
+        if self.num_servers is None or self.num_servers == statistics.num_servers:
+            return statistics
+        return replace(statistics, num_servers=self.num_servers)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Profile as a dict (inverse of from_dict)"""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], name: Optional[str] = None) -> 'ClusterProfile':
+        """
+        Build a profile from a dict; missing keys keep their defaults
+
+        Args:
+            data: Profile fields, e.g. {"bandwidth_bytes_per_s": 125000000}
+            name: Profile name if `data` has none
+
+        Returns:
+            ClusterProfile
+
+        Raises:
+            ValueError: If `data` has unknown keys
+        """
+        known = {f.name for f in fields(cls)}
+        unknown = sorted(set(data) - known)
+        if unknown:
+            raise ValueError(f"Unknown cluster profile keys: {', '.join(unknown)}")
+        values = dict(data)
+        if name is not None:
+            values.setdefault("name", name)
+        return cls(**values)
+
+    @classmethod
+    def from_file(cls, filepath: str) -> 'ClusterProfile':
+        """
+        Load a profile from a .json or .toml file (named after the file
+        unless it sets `name`)
+
+        Args:
+            filepath: Path to the profile file
+
+        Returns:
+            ClusterProfile
+        """
+        stem, extension = os.path.splitext(os.path.basename(filepath))
+        extension = extension.lower()
+        if extension == ".json":
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        elif extension == ".toml":
+            if tomllib is None:
+                raise ImportError("Reading TOML profiles requires Python 3.11+ or tomli (pip install tomli)")
+            with open(filepath, 'rb') as f:
+                data = tomllib.load(f)
+        else:
+            raise ValueError(f"Unsupported cluster profile format {extension!r} (expected .json or .toml)")
+        return cls.from_dict(data, name=stem)
+
+
+DEFAULT_PROFILE = ClusterProfile()
@@ -23,6 +23,9 @@ TYPE_SIZES = {
 # Network and query execution constants
 BANDWIDTH_SPEED = 15_000_000  #bytes per second
 BANDWIDTH_SPEED_BYTES_PER_MS = BANDWIDTH_SPEED / 1000  # bytes per millisecond
+COORDINATOR_BANDWIDTH_SPEED = BANDWIDTH_SPEED  # bytes per second into / out of the coordinator
+COORDINATOR_BANDWIDTH_SPEED_BYTES_PER_MS = COORDINATOR_BANDWIDTH_SPEED / 1000  # bytes per millisecond
+NETWORK_RTT_MS = 0.5  # round-trip latency of one request (servers contacted in parallel)
 
 # Cost constants
 COST_PER_GB_TRANSFER = 0.01  # USD per GB transferred
@@ -33,4 +36,21 @@ CARBON_PER_SERVER_MS = 0.001  # gCO2 per server millisecond
 # Query execution constants
 INDEX_ACCESS_TIME_MS = 0.1  # milliseconds per index access
 FULL_SCAN_TIME_PER_DOC_MS = 0.001  # milliseconds per document in full scan
-COMPARISON_TIME_MS = 0.0001  # milliseconds per comparison operation
\ No newline at end of file
+COMPARISON_TIME_MS = 0.0001  # milliseconds per comparison operation
+
+# Join memory and disk constants
+MEMORY_PER_SERVER_BYTES = 8 * 1024 ** 3  # RAM available to a join on one server
+HASH_TABLE_OVERHEAD = 1.5  # hash table bytes per byte of build documents
+DISK_SPEED = 200_000_000  # bytes per second (sequential spill write/read)
+DISK_SPEED_BYTES_PER_MS = DISK_SPEED / 1000  # bytes per millisecond
+DISK_RANDOM_READ_MS = 0.1  # milliseconds per random page read (SSD)
+PAGE_SIZE_BYTES = 4096  # storage page size
+INDEX_POINTER_SIZE = 8  # bytes of the record id (leaf) or child page id (inner node) of a B-tree entry
+BTREE_FILL_FACTOR = 0.7  # average fill of B-tree pages (~ln 2 under random inserts)
+BUFFER_CACHE_FRACTION = 0.5  # share of a server's RAM caching collection pages
+BROADCAST_MAX_BYTES = 64 * 1024 ** 2  # largest side the optimizer will broadcast
+SORT_BUFFER_BYTES = 64 * 1024 ** 2  # buffer per sorted run during a k-way merge
+
+# Schema parsing cache
+SCHEMA_CACHE_DIRNAME = "__schemacache__"  # created next to the parsed JSON files
+SCHEMA_CACHE_VERSION = 4  # bump when the cached JSON schema format changes
@@ -419,9 +419,13 @@ def main():
         try:
             db_num = int(db_choice)
             if db_num == 0:
-                for i in range(1, 6):
-                    db = SchemaParser.build_db_from_json(i, stats, f"schemas/db{i}.json")
-                    print_db_analysis(db, i, stats, size_calc, shard_calc)
+                loaded = SchemaParser.build_dbs_from_directory("schemas", stats)
+                for load in loaded:
+                    print_db_analysis(load.database, load.db_index, stats, size_calc, shard_calc)
+
+                print("\n### Parse Times ###\n")
+                for load in loaded:
+                    print(f"{load.file_path}: {load.parse_time_ms:.2f} ms")
             elif 1 <= db_num <= 5:
                 db = SchemaParser.build_db_from_json(db_num, stats, f"schemas/db{db_num}.json")
                 print_db_analysis(db, db_num, stats, size_calc, shard_calc)
@@ -2,8 +2,27 @@
 Representation of JSON Schema and related metadata
 """
 
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, field
+import weakref
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+from dataclasses import dataclass, field, FrozenInstanceError
+
+
+def _build_path_index(fields: Iterable[Any]) -> Dict[str, Any]:
+    """
+    Build a dotted path -> field index over a list of fields and their
+    nested / array item schemas (first field wins on duplicate names)
+    """
+    index: Dict[str, Any] = {}
+    for f in fields:
+        if f.name in index:
+            continue
+        index[f.name] = f
+        sub_schema = f.nested_schema or f.array_item_schema
+        if sub_schema is not None:
+            for path, sub_field in sub_schema.path_index.items():
+                index.setdefault(f"{f.name}.{path}", sub_field)
+    return index
+
 
 @dataclass
 class Field:
@@ -13,24 +32,137 @@ class Field:
     is_required: bool = True
     nested_schema: Optional['Schema'] = None
     array_item_schema: Optional['Schema'] = None
+
+    def freeze(self) -> 'FrozenField':
+        """Return the interned immutable counterpart of this field"""
+        return FrozenField(
+            name=self.name,
+            field_type=self.field_type,
+            is_required=self.is_required,
+            nested_schema=self.nested_schema.freeze() if self.nested_schema else None,
+            array_item_schema=self.array_item_schema.freeze() if self.array_item_schema else None
+        )
     
 @dataclass
 class Schema:
     """Represents a JSON Schema with Multiple Fields"""
     name: str
     fields: List[Field] = field(default_factory=list)
+
+    def __post_init__(self):
+        # Name -> Field index (first field wins, as with a linear scan)
+        self._field_index: Dict[str, Field] = {}
+        for f in self.fields:
+            self._field_index.setdefault(f.name, f)
+
+        # Dotted path -> Field index, built on first nested lookup
+        self._path_index: Optional[Dict[str, Field]] = None
+
+        # Cached size plan (compiled by SizeCalculator)
+        self._size_plan = None
+
+        # Cached interned counterpart (built by freeze)
+        self._frozen: Optional['FrozenSchema'] = None
     
     def add_field(self, field: Field):
         """Add a field to the schema"""
         self.fields.append(field)
+        self._field_index.setdefault(field.name, field)
+        self._path_index = None
+        self._size_plan = None
+        self._frozen = None
     
     def get_field(self, name: str) -> Optional[Field]:
-        """Get a field by name"""
-        for field in self.fields:
-            if field.name == name:
-                return field
-        return None
+        """
+        Get a field by name or by dotted path through nested objects and
+        array items (e.g. "price.amount", "orderLines.IDP")
+        """
+        found = self._field_index.get(name)
+        if found is None and name and '.' in name:
+            found = self.path_index.get(name)
+        return found
+
+    @property
+    def path_index(self) -> Dict[str, Field]:
+        """Dotted path -> Field index over the whole schema tree"""
+        if self._path_index is None:
+            self._path_index = _build_path_index(self.fields)
+        return self._path_index
+
+    def freeze(self) -> 'FrozenSchema':
+        """
+        Return the interned immutable counterpart of this schema, cached
+        until a field is added (nested schemas are expected to be complete
+        before being attached to a field)
+        """
+        if self._frozen is None:
+            self._frozen = FrozenSchema(
+                name=self.name,
+                fields=tuple(f.freeze() for f in self.fields)
+            )
+        return self._frozen
     
+@dataclass(frozen=True)
+class Index:
+    """
+    B-tree index on one key (single) or several keys (compound) of a
+    collection, e.g. Index(("IDP", "IDW")). Keys may be dotted paths; an
+    index on a key inside an array (e.g. "categories", "orderLines.IDC")
+    is multikey and holds one entry per array element.
+    """
+    keys: Tuple[str, ...]
+    name: str = ""  # Defaults to "IDP_1_IDW_1"
+    unique: bool = False
+
+    def __post_init__(self):
+        keys = (self.keys,) if isinstance(self.keys, str) else tuple(self.keys)
+        if not keys:
+            raise ValueError("An index needs at least one key")
+        object.__setattr__(self, 'keys', keys)
+        if not self.name:
+            object.__setattr__(self, 'name', "_".join(f"{key}_1" for key in keys))
+
+    def array_paths(self, schema: Any) -> Tuple[str, ...]:
+        """Dotted paths of the array fields the keys go through (none unless multikey)"""
+        paths: List[str] = []
+        for key in self.keys:
+            parts = key.split('.')
+            for i in range(1, len(parts) + 1):
+                path = '.'.join(parts[:i])
+                found = schema.get_field(path)
+                if found is not None and found.field_type == 'array' and path not in paths:
+                    paths.append(path)
+        return tuple(paths)
+
+    def is_multikey(self, schema: Any) -> bool:
+        """Whether a key goes through an array field"""
+        return bool(self.array_paths(schema))
+
+    def prefix_length(self, keys: Iterable[str]) -> int:
+        """Number of leading index keys found in `keys` (usable for equality lookups)"""
+        keys = set(keys)
+        length = 0
+        for key in self.keys:
+            if key not in keys:
+                break
+            length += 1
+        return length
+
+
+def _find_index(indexes: Iterable[Index], keys: Iterable[str]) -> Optional[Index]:
+    """
+    Index serving equality predicates on `keys`: the longest key prefix
+    wins, then the index with the fewest keys (the smallest one)
+    """
+    keys = set(keys or ())
+    best, best_length = None, 0
+    for index in indexes:
+        length = index.prefix_length(keys)
+        if length > best_length or (length and length == best_length and len(index.keys) < len(best.keys)):
+            best, best_length = index, length
+    return best
+
+
 @dataclass
 class Collection:
     """Represents a collection with schema and statistics"""
@@ -39,12 +171,70 @@ class Collection:
     document_count: int
     sharding_key: Optional[str] = None
     distinct_shard_values: Optional[int] = None
+    indexes: List[Index] = field(default_factory=list)  # Index catalog (empty = not declared)
     
     def __post_init__(self):
         # Calculated fields
         self._doc_size: Optional[int] = None
         self._collection_size: Optional[int] = None
 
+    def add_index(self, keys: Iterable[str], name: Optional[str] = None, unique: bool = False) -> Index:
+        """
+        Declare a B-tree index (replaces an index of the same name)
+
+        Example:
+            stock.add_index(["IDP", "IDW"], unique=True)
+            product.add_index("categories.title")  # multikey
+
+        Args:
+            keys: Key or keys of the index, in order
+            name: Index name (default: "IDP_1_IDW_1")
+            unique: Whether the indexed values are unique
+
+        Returns:
+            The Index added to the catalog
+
+        Raises:
+            ValueError: If a key is missing from the schema, or if keys go
+                through two parallel arrays (one entry per pair is not indexed)
+        """
+        index = Index(keys=keys, name=name or "", unique=unique)
+        for key in index.keys:
+            if self.schema.get_field(key) is None:
+                raise ValueError(f"{self.name} has no key {key!r}")
+        paths = sorted(index.array_paths(self.schema), key=len)
+        for outer, inner in zip(paths, paths[1:]):
+            if not inner.startswith(outer + '.'):
+                raise ValueError(f"Cannot index parallel arrays {outer!r} and {inner!r} of {self.name}")
+        self.indexes = [i for i in self.indexes if i.name != index.name] + [index]
+        return index
+
+    def find_index(self, keys: Iterable[str]) -> Optional[Index]:
+        """Catalog index serving equality predicates on `keys` (None if there is none)"""
+        return _find_index(self.indexes, keys)
+
+    def freeze(self) -> 'FrozenCollection':
+        """Return the interned immutable counterpart of this collection"""
+        return FrozenCollection(
+            name=self.name,
+            schema=self.schema.freeze(),
+            document_count=self.document_count,
+            sharding_key=self.sharding_key,
+            distinct_shard_values=self.distinct_shard_values,
+            indexes=tuple(self.indexes)
+        )
+
+@dataclass
+class MaterializedView(Collection):
+    """
+    Collection storing a pre-aggregated GROUP BY of another collection,
+    e.g. ProductSales{IDP, NB} = SELECT IDP, SUM(quantity) AS NB FROM OrderLine GROUP BY IDP
+    """
+    source_collection: str = ""
+    group_by_keys: Tuple[str, ...] = ()
+    aggregates: Dict[str, str] = field(default_factory=dict)  # output key -> "SUM(quantity)"
+
+
 @dataclass
 class Database:
     """Represents a complete database with multiple collections"""
@@ -58,3 +248,149 @@ class Database:
     def get_collection(self, name: str) -> Optional['Collection']:
         """Get a collection by name"""
         return self.collections.get(name)
+
+    @property
+    def views(self) -> Dict[str, 'MaterializedView']:
+        """Materialized views declared among the collections"""
+        return {name: c for name, c in self.collections.items() if isinstance(c, MaterializedView)}
+
+
+# Interning table: structural key -> canonical frozen instance.
+# Keys only reference (already interned) children, so an entry disappears
+# as soon as its instance is no longer used anywhere.
+_INTERNED: "weakref.WeakValueDictionary[tuple, _Frozen]" = weakref.WeakValueDictionary()
+
+
+class _Frozen:
+    """
+    Base for the slotted, immutable, interned model variants.
+
+    Instances are built through `_intern`, so structurally equal objects are
+    the same object: identical subtrees (e.g. `supplier`) are shared across
+    schemas and hashing/equality are O(1).
+    """
+    __slots__ = ('_hash', '__weakref__')
+    _FIELDS: Tuple[str, ...] = ()
+    _CACHE_SLOTS: Tuple[str, ...] = ()  # derived data, excluded from identity
+
+    @classmethod
+    def _intern(cls, values: tuple) -> Any:
+        key = (cls,) + values
+        instance = _INTERNED.get(key)
+        if instance is None:
+            instance = object.__new__(cls)
+            for name, value in zip(cls._FIELDS, values):
+                object.__setattr__(instance, name, value)
+            for name in cls._CACHE_SLOTS:
+                object.__setattr__(instance, name, None)
+            object.__setattr__(instance, '_hash', hash(key))
+            _INTERNED[key] = instance
+        return instance
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._FIELDS)
+
+    def __setattr__(self, name: str, value: Any):
+        if name in self._CACHE_SLOTS:
+            object.__setattr__(self, name, value)
+        else:
+            raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name: str):
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
+        if type(self) is not type(other):
+            return NotImplemented
+        return self._hash == other._hash and self._values() == other._values()
+
+    def __reduce__(self):
+        # Re-intern on unpickling / copying
+        return (type(self), self._values())
+
+    def __repr__(self) -> str:
+        args = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._FIELDS)
+        return f"{type(self).__name__}({args})"
+
+
+class FrozenField(_Frozen):
+    """Immutable, slotted and structurally hashable variant of `Field`"""
+    __slots__ = ('name', 'field_type', 'is_required', 'nested_schema', 'array_item_schema')
+    _FIELDS = ('name', 'field_type', 'is_required', 'nested_schema', 'array_item_schema')
+
+    def __new__(cls, name: str, field_type: str, is_required: bool = True,
+                nested_schema: Optional['FrozenSchema'] = None,
+                array_item_schema: Optional['FrozenSchema'] = None) -> 'FrozenField':
+        if isinstance(nested_schema, Schema):
+            nested_schema = nested_schema.freeze()
+        if isinstance(array_item_schema, Schema):
+            array_item_schema = array_item_schema.freeze()
+        return cls._intern((name, field_type, is_required, nested_schema, array_item_schema))
+
+    def freeze(self) -> 'FrozenField':
+        return self
+
+
+class FrozenSchema(_Frozen):
+    """Immutable, slotted and structurally hashable variant of `Schema`"""
+    __slots__ = ('name', 'fields', '_field_index', '_path_index', '_size_plan')
+    _FIELDS = ('name', 'fields')
+    _CACHE_SLOTS = ('_field_index', '_path_index', '_size_plan')
+
+    def __new__(cls, name: str, fields: Iterable[Any] = ()) -> 'FrozenSchema':
+        fields = tuple(f.freeze() if isinstance(f, Field) else f for f in fields)
+        return cls._intern((name, fields))
+
+    def with_field(self, field: Any) -> 'FrozenSchema':
+        """Return a new schema with `field` appended"""
+        return FrozenSchema(self.name, self.fields + (field,))
+
+    def get_field(self, name: str) -> Optional[FrozenField]:
+        """Get a field by name or by dotted path (see `Schema.get_field`)"""
+        if self._field_index is None:
+            index: Dict[str, FrozenField] = {}
+            for f in self.fields:
+                index.setdefault(f.name, f)
+            self._field_index = index
+        found = self._field_index.get(name)
+        if found is None and name and '.' in name:
+            found = self.path_index.get(name)
+        return found
+
+    @property
+    def path_index(self) -> Dict[str, FrozenField]:
+        """Dotted path -> FrozenField index over the whole schema tree"""
+        if self._path_index is None:
+            self._path_index = _build_path_index(self.fields)
+        return self._path_index
+
+    def freeze(self) -> 'FrozenSchema':
+        return self
+
+
+class FrozenCollection(_Frozen):
+    """Immutable, slotted and structurally hashable variant of `Collection`"""
+    __slots__ = ('name', 'schema', 'document_count', 'sharding_key',
+                 'distinct_shard_values', 'indexes', '_doc_size', '_collection_size')
+    _FIELDS = ('name', 'schema', 'document_count', 'sharding_key', 'distinct_shard_values', 'indexes')
+    _CACHE_SLOTS = ('_doc_size', '_collection_size')
+
+    def __new__(cls, name: str, schema: Any, document_count: int,
+                sharding_key: Optional[str] = None,
+                distinct_shard_values: Optional[int] = None,
+                indexes: Iterable[Index] = ()) -> 'FrozenCollection':
+        if isinstance(schema, Schema):
+            schema = schema.freeze()
+        return cls._intern((name, schema, document_count, sharding_key, distinct_shard_values, tuple(indexes)))
+
+    def find_index(self, keys: Iterable[str]) -> Optional[Index]:
+        """Catalog index serving equality predicates on `keys` (see `Collection.find_index`)"""
+        return _find_index(self.indexes, keys)
+
+    def freeze(self) -> 'FrozenCollection':
+        return self
@@ -37,4 +37,15 @@ class Statistics:
         """Get a statistic by key"""
         if hasattr(self, key):
             return getattr(self, key)
-        return self.custom_stats.get(key, 0)
\ No newline at end of file
+        return self.custom_stats.get(key, 0)
+
+    def default_array_sizes(self) -> Dict[str, int]:
+        """
+        Average array cardinalities derived from the statistics
+        (array field name -> average size), used when none are given
+        """
+        return {
+            "categories": self.categories_per_product_avg,
+            "stocks": self.num_stock_entries // self.num_products,
+            "orderLines": self.avg_order_lines_per_product
+        }
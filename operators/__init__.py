@@ -4,15 +4,49 @@ Query operators for filter and join operations
 
 from .filter_operator import FilterOperator, FilterResult
 from .join_operator import NestedLoopJoinOperator, JoinResult
-from .cost_model import CostModel, QueryCost
+from .hash_join_operator import HashJoinOperator, HashJoinResult
+from .distributed_join_operator import CoLocatedJoinOperator, BroadcastJoinOperator, DistributedJoinResult
+from .sort_merge_join_operator import SortMergeJoinOperator, SortMergeJoinResult, SortMergePhase
+from .top_k_operator import TopKAggregateOperator, TopKAggregateResult
+from .cost_model import CostModel, QueryCost, QueryCostBatch
 from .query_executor import QueryExecutor
+from .query_spec import QuerySpec, CompiledQuery, parse_sql, compile_query, load_query_specs
+from .optimizer import QueryOptimizer, OptimizedPlan, PlanStep
+from .materialized_view import MaterializedViewPlanner, ViewPlan, ViewWorkloadComparison, define_materialized_view
+from .workload import WorkloadEntry, WorkloadQueryResult, WorkloadResult
 
 __all__ = [
     'FilterOperator',
     'FilterResult',
     'NestedLoopJoinOperator',
     'JoinResult',
+    'HashJoinOperator',
+    'HashJoinResult',
+    'CoLocatedJoinOperator',
+    'BroadcastJoinOperator',
+    'DistributedJoinResult',
+    'SortMergeJoinOperator',
+    'SortMergeJoinResult',
+    'SortMergePhase',
+    'TopKAggregateOperator',
+    'TopKAggregateResult',
     'CostModel',
     'QueryCost',
-    'QueryExecutor'
+    'QueryCostBatch',
+    'QueryExecutor',
+    'QuerySpec',
+    'CompiledQuery',
+    'parse_sql',
+    'compile_query',
+    'load_query_specs',
+    'QueryOptimizer',
+    'OptimizedPlan',
+    'PlanStep',
+    'MaterializedViewPlanner',
+    'ViewPlan',
+    'ViewWorkloadComparison',
+    'define_materialized_view',
+    'WorkloadEntry',
+    'WorkloadQueryResult',
+    'WorkloadResult'
 ]
@@ -3,13 +3,17 @@ Aggregate operator for query execution
 Supports joins with and without sharding
 """
 
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional
 from dataclasses import dataclass
-from models.schema import Collection, Schema, Field
+from models.schema import Collection
 from models.statistics import Statistics
 from calculators.size_calculator import SizeCalculator
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
 from .cost_model import CostModel, QueryCost
-from .filter_operator import FilterOperator, FilterResult
+from .filter_operator import FilterOperator
+
+
+AGGREGATION_MODES = ("single", "repartition", "two_phase")
 
 
 @dataclass
@@ -38,22 +42,39 @@ class AggregateResult:
     c1_volume_bytes: int = 0  # C1 = #S1 * size(S1) + #O1 * size(O1)
     c2_volume_bytes: int = 0  # C2 = #S2 * size(S2) + #O2 * size(O2)
 
+    aggregation: str = "single"  # 'single', 'repartition' or 'two_phase' (local combiner, then final reducer)
+    group_input_docs1: int = 0  # Documents entering the right GROUP BY (before aggregation)
+    group_input_docs2: int = 0  # Documents entering the left GROUP BY (before aggregation)
+    partials1: int = 0  # Partial aggregates produced by the right combiners (two_phase)
+    partials2: int = 0  # Partial aggregates produced by the left combiners (two_phase)
+
+    storage_cost: Optional[QueryCost] = None  # Pages read from disk (included in cost)
+    pages_read1: int = 0  # Pages read by each inside (right) server
+    pages_read2: int = 0  # Pages read by each outside (left) server, per loop
+    cache_hit_ratio1: float = 1.0  # Fraction of the inside pages found in the buffer cache
+    cache_hit_ratio2: float = 1.0  # Fraction of the outside pages found in the buffer cache
+    index_name1: Optional[str] = None  # Catalog index of the inside lookups (None: scan or undeclared index)
+    index_name2: Optional[str] = None  # Catalog index of the outside lookups
+
 
 class AggregateOperator:
     """
     Aggregate operator for executing join queries
     """
 
-    def __init__(self, statistics: Statistics):
+    def __init__(self, statistics: Statistics, profile: Optional[ClusterProfile] = None):
         """
         Initialize the Aggregate operator
 
         Args:
             statistics: Database statistics
+            profile: Cluster hardware profile (default: DEFAULT_PROFILE)
         """
-        self.statistics = statistics
-        self.size_calculator = SizeCalculator(statistics)
-        self.filter_operator = FilterOperator(statistics)
+        self.profile = profile or DEFAULT_PROFILE
+        self.statistics = self.profile.apply_to(statistics)
+        self.size_calculator = SizeCalculator(self.statistics)
+        self.cost_model = CostModel.for_profile(self.profile)
+        self.filter_operator = FilterOperator(statistics, self.profile)
     
     def calculate_aggregate_input_size(
         self,
@@ -74,26 +95,9 @@ class AggregateOperator:
         Returns:
             Size in bytes of output document
         """
-        # Create a schema with only the output keys
-        output_schema = Schema(name=f"{collection.schema.name}_output")
-
-        for key in output_keys:
-            field = collection.schema.get_field(key)
-            if field:
-                output_schema.add_field(field)
-
-        if filter_keys :
-            for key in filter_keys:
-                field = collection.schema.get_field(key)
-                if field:
-                    output_schema.add_field(field)
-        
-        field = collection.schema.get_field(join_key)
-        if field:
-            output_schema.add_field(field)
-
-        # Calculate size
-        return self.size_calculator.calculate_document_size(output_schema, {})
+        # Size of a projection on the output, filter and join keys (cached)
+        input_keys = list(output_keys) + list(filter_keys or []) + [join_key]
+        return self.size_calculator.calculate_projection_size(collection.schema, input_keys)
     
     def calculate_aggregate_output_size(
         self,
@@ -112,16 +116,8 @@ class AggregateOperator:
         Returns:
             Size in bytes of output document
         """
-        # Create a schema with only the output keys
-        output_schema = Schema(name=f"{collection.schema.name}_output")
-
-        for key in output_keys:
-            field = collection.schema.get_field(key)
-            if field:
-                output_schema.add_field(field)
-
-        # Calculate size
-        return self.size_calculator.calculate_document_size(output_schema, {})
+        # Size of a projection on the output keys (cached)
+        return self.size_calculator.calculate_projection_size(collection.schema, output_keys)
     
     def calculate_aggregate_shuffle_size(
         self,
@@ -140,16 +136,24 @@ class AggregateOperator:
         Returns:
             Size in bytes of output document
         """
+        # Size of a projection on the group_by key (cached)
+        return self.size_calculator.calculate_projection_size(collection.schema, [group_by_key])
 
-        output_schema = Schema(name=f"{collection.schema.name}_output")
-        
-        # Create a schema with only the group_by key
-        field = collection.schema.get_field(group_by_key)
-        if field:
-            output_schema.add_field(field)
+    @staticmethod
+    def calculate_partials(num_groups: int, group_input_docs: int, num_servers: int) -> int:
+        """
+        Calculate the partial aggregates produced by local combiners
 
-        # Calculate size
-        return self.size_calculator.calculate_document_size(output_schema, {})
+        Args:
+            num_groups: Groups produced by the GROUP BY
+            group_input_docs: Documents entering the GROUP BY
+            num_servers: Servers running a combiner
+
+        Returns:
+            Number of partials: each server emits at most
+            min(#groups, #documents on the server) partials
+        """
+        return min(num_groups * num_servers, group_input_docs)
 
     def aggregator(
         self,
@@ -167,7 +171,12 @@ class AggregateOperator:
         right_group_by_key: Optional[List[str]] = None,
         left_filter_selectivity: Optional[float] = None,
         right_filter_selectivity: Optional[float] = None,
-        array_sizes: Optional[Dict[str, int]] = None
+        array_sizes: Optional[Dict[str, int]] = None,
+        aggregation: str = "single",
+        left_group_input_selectivity: Optional[float] = None,
+        right_group_input_selectivity: Optional[float] = None,
+        right_output_docs: Optional[int] = None,
+        use_index: bool = True
     ) -> AggregateResult:
         """
         Execute a Aggregate with optional sharding optimization
@@ -182,10 +191,27 @@ class AggregateOperator:
             left_filter_key: Filter keys on left collection (if any)
             left_filter_selectivity: Filter selectivity on left collection
             array_sizes: Average sizes for arrays
+            aggregation: 'single' (default) keeps the historical estimate of
+                one shuffled document per group and server (o * (s-1));
+                'repartition' (opt-in) shuffles every document entering the
+                GROUP BY to the server owning its group, without any
+                pre-aggregation (group_input_docs * (s-1) / s);
+                'two_phase' pre-aggregates on each shard and only shuffles
+                the partials to the server owning their group
+            left_group_input_selectivity, right_group_input_selectivity:
+                Fraction of documents entering the GROUP BY, before aggregation
+                (default: every accessed document)
+            right_output_docs: Inside groups sent to the coordinator (default:
+                o1, every group; fewer with a top-K pushdown)
+            use_index: Whether the outside collection has an index on the
+                join key when the catalog declares none
 
         Returns:
             AggregateResult with output metrics and costs
         """
+        if aggregation not in AGGREGATION_MODES:
+            raise ValueError(f"aggregation must be one of {AGGREGATION_MODES}, got {aggregation!r}")
+
         # Determine if sharding is used
         use_sharding = bool(left_sharding_key and right_sharding_key)
 
@@ -211,19 +237,44 @@ class AggregateOperator:
         # Compute effective outside documents after filter
         o2 = int(left_collection.document_count * left_filter_selectivity)
 
+        # Documents entering each GROUP BY, before aggregation
+        if right_group_input_selectivity is None:
+            group_input_docs1 = int(total_document_accessed_inside)
+        else:
+            group_input_docs1 = int(right_collection.document_count * right_group_input_selectivity)
+        if left_group_input_selectivity is None:
+            group_input_docs2 = int(total_document_accessed_outside)
+        else:
+            group_input_docs2 = int(left_collection.document_count * left_group_input_selectivity)
+
+        # Two-phase: partials computed by the combiners of each shard
+        partials1 = partials2 = 0
+        if aggregation == "two_phase":
+            partials1 = self.calculate_partials(o1, group_input_docs1, s1)
+            partials2 = self.calculate_partials(o2, group_input_docs2, s2)
+
         # Compute the Shuffle 1
         if not(right_group_by_key) or (use_sharding and right_group_by_key and right_sharding_key == right_group_by_key) : 
             shuffle1 = 0
+        elif aggregation == "two_phase":
+            # Partials not already on the server owning their group
+            shuffle1 = int(partials1 * (s1-1) / s1)
+        elif aggregation == "repartition":
+            # Every document entering the GROUP BY goes to the server owning
+            # its group (it stays put with probability 1/S1)
+            shuffle1 = int(group_input_docs1 * (s1-1) / s1)
         else:
-            # ATTENTION PAS SURE DU S1
             shuffle1 = o1 * (s1-1)
 
         # Compute the Shuffle 2
         if not(left_group_by_key) or (use_sharding and left_group_by_key and left_sharding_key == left_group_by_key) : 
             shuffle2 = 0
+        elif aggregation == "two_phase":
+            shuffle2 = int(partials2 * (s2-1) / s2)
+        elif aggregation == "repartition":
+            shuffle2 = int(group_input_docs2 * (s2-1) / s2)
         else:
-            # ATTENTION PAS SURE DU S2
-            shuffle2 = o2 * (s2-1) 
+            shuffle2 = o2 * (s2-1)
         
 
         #Compute document size
@@ -236,7 +287,8 @@ class AggregateOperator:
         shuffle_doc_size_2 = self.calculate_aggregate_shuffle_size(left_collection,left_group_by_key)
 
         # Compute c1 and c2 volume
-        c1_volume = s1 * input_doc_size_1 + o1 * output_doc_size_1 + shuffle1* shuffle_doc_size_1
+        sent1 = o1 if right_output_docs is None else right_output_docs
+        c1_volume = s1 * input_doc_size_1 + sent1 * output_doc_size_1 + shuffle1* shuffle_doc_size_1
         c2_volume = s2 * input_doc_size_2 + o2 * output_doc_size_2 + shuffle2*shuffle_doc_size_2
 
         if limit: num_loops=limit
@@ -244,7 +296,7 @@ class AggregateOperator:
 
         #Compute cost
 
-        cost = CostModel.calculate_nested_loop_join_cost(
+        cost = self.cost_model.calculate_nested_loop_join_cost(
             total_document_accessed_left=total_document_accessed_outside,
             total_document_accessed_right=total_document_accessed_inside,
             doc_size_bytes_left=input_doc_size_1,
@@ -254,9 +306,23 @@ class AggregateOperator:
             num_loops=num_loops,
             use_index=False,
             num_servers_s1=s1,
-            num_servers_s2=s2
+            num_servers_s2=s2,
+            c1_shuffle_bytes=shuffle1 * shuffle_doc_size_1,
+            c2_shuffle_bytes=shuffle2 * shuffle_doc_size_2
         )
 
+        # Storage: the inside collection is read once (through an index on its
+        # filter keys if the catalog has one); every loop looks its outside
+        # documents up through the join key index (if any, or `use_index`)
+        storage_inside, pages_read1, cache_hit_ratio1, index1 = self.filter_operator.calculate_read_cost(
+            right_collection, right_filter_keys, total_document_accessed_inside, group_input_docs1, s1,
+            array_sizes=array_sizes)
+        storage_outside, pages_read2, cache_hit_ratio2, index2 = self.filter_operator.calculate_read_cost(
+            left_collection, [join_key] + list(left_filter_keys or []), total_document_accessed_outside, o2, s2,
+            assume_index=use_index, array_sizes=array_sizes)
+        storage_cost = storage_inside + storage_outside.scale(num_loops)
+        cost = cost + storage_cost
+
         return AggregateResult(
             output_size_bytes1=output_doc_size_1,
             input_size_bytes1=input_doc_size_1,
@@ -279,4 +345,16 @@ class AggregateOperator:
             shuffle2=shuffle2,
             c1_volume_bytes=c1_volume,
             c2_volume_bytes=c2_volume,
+            aggregation=aggregation,
+            group_input_docs1=group_input_docs1,
+            group_input_docs2=group_input_docs2,
+            partials1=partials1,
+            partials2=partials2,
+            storage_cost=storage_cost,
+            pages_read1=pages_read1,
+            pages_read2=pages_read2,
+            cache_hit_ratio1=cache_hit_ratio1,
+            cache_hit_ratio2=cache_hit_ratio2,
+            index_name1=index1.name if index1 else None,
+            index_name2=index2.name if index2 else None,
         )
\ No newline at end of file
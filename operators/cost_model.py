@@ -3,22 +3,89 @@ Cost model for query operations
 Calculates time, carbon footprint, and price costs
 """
 
-from dataclasses import dataclass
-from typing import Dict, Optional, Tuple
-from config.constants import (
-    BANDWIDTH_SPEED_BYTES_PER_MS,
-    COST_PER_GB_TRANSFER,
-    CARBON_PER_GB_TRANSFER,
-    COST_PER_SERVER_MS,
-    CARBON_PER_SERVER_MS,
-    INDEX_ACCESS_TIME_MS,
-    FULL_SCAN_TIME_PER_DOC_MS,
-)
+import copy
+import math
+import types
+import functools
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from typing import Dict, Optional, Tuple, Any
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for the batch APIs
+    np = None
+
+
+def _require_numpy():
+    """Raise a clear error when a batch API is used without NumPy"""
+    if np is None:
+        raise ImportError("NumPy is required for batch cost evaluation (pip install numpy)")
+
+
+def _copy_cost(result: Any) -> Any:
+    """Copy a memoized result so callers never share a mutable QueryCost"""
+    if isinstance(result, tuple):
+        return tuple(copy.copy(item) for item in result)
+    return copy.copy(result)
+
+
+class _CostMethod:
+    """
+    Cost method callable on a model or on the `CostModel` class
+
+    On an instance it is bound to that model. On the class it is bound to
+    the shared model of the default profile, so the historical static calls
+    (`CostModel.calculate_scan_cost(...)`) keep working.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        functools.update_wrapper(self, method)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            instance = owner.for_profile()
+        return types.MethodType(self.method, instance)
+
+
+def _memoized(method):
+    """
+    Memoize a CostModel method on its arguments, in the model's LRU memo
+
+    The cost model is bound to one profile, so equal arguments always give
+    the same cost. Every call returns its own copy of the cost. Calls with
+    unhashable arguments are not memoized.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            result = self._memo.get(key)
+        except TypeError:
+            return method(self, *args, **kwargs)
+        if result is not None:
+            self._memo.move_to_end(key)
+            self.memo_hits += 1
+            return _copy_cost(result)
+        self.memo_misses += 1
+        result = method(self, *args, **kwargs)
+        self._memo[key] = result
+        if len(self._memo) > self.memo_maxsize:
+            self._memo.popitem(last=False)
+        return _copy_cost(result)
+    return _CostMethod(wrapper)
+
 
 @dataclass
 class QueryCost:
     """
     Represents the cost of a query operation
+
+    time_ms is the aggregate resource time (every byte over one link, every
+    document scanned by one server); latency_ms is the wall-clock time with
+    servers working in parallel.
     """
     time_ms: float  # Time in milliseconds
     carbon_gco2: float  # Carbon footprint in gCO2
@@ -28,6 +95,7 @@ class QueryCost:
     data_volume_bytes: int = 0  # Total data transferred
     num_documents: int = 0  # Number of documents processed
     num_servers_involved: int = 0  # Number of servers involved
+    latency_ms: float = 0.0  # Wall-clock latency in milliseconds
 
     def __add__(self, other: 'QueryCost') -> 'QueryCost':
         """Add two query costs together"""
@@ -37,7 +105,20 @@ class QueryCost:
             price_usd=self.price_usd + other.price_usd,
             data_volume_bytes=self.data_volume_bytes + other.data_volume_bytes,
             num_documents=self.num_documents + other.num_documents,
-            num_servers_involved=max(self.num_servers_involved, other.num_servers_involved)
+            num_servers_involved=max(self.num_servers_involved, other.num_servers_involved),
+            latency_ms=self.latency_ms + other.latency_ms
+        )
+
+    def scale(self, factor: float) -> 'QueryCost':
+        """Multiply every additive metric by `factor` (e.g. loops or a frequency)"""
+        return QueryCost(
+            time_ms=self.time_ms * factor,
+            carbon_gco2=self.carbon_gco2 * factor,
+            price_usd=self.price_usd * factor,
+            data_volume_bytes=self.data_volume_bytes * factor,
+            num_documents=self.num_documents * factor,
+            num_servers_involved=self.num_servers_involved,
+            latency_ms=self.latency_ms * factor
         )
 
     def __str__(self) -> str:
@@ -45,6 +126,7 @@ class QueryCost:
         return (
             f"QueryCost(\n"
             f"  Communication time: {self.time_ms:.3f} ms ({self.time_ms/1000:.3f} s)\n"
+            f"  Wall-clock latency: {self.latency_ms:.3f} ms ({self.latency_ms/1000:.3f} s)\n"
             f"  Carbon: {self.carbon_gco2:.2f} gCO2\n"
             f"  Price: ${self.price_usd:.6f} USD\n"
             f"  Data Volume: {self.data_volume_bytes:,} bytes ({self.data_volume_bytes/1024/1024:.2f} MB)\n"
@@ -54,16 +136,122 @@ class QueryCost:
         )
 
 
+@dataclass
+class QueryCostBatch:
+    """
+    Struct-of-arrays counterpart of QueryCost: every field is a NumPy array
+    (all broadcast to the same shape), element i being the QueryCost of
+    the i-th set of inputs
+    """
+    time_ms: Any
+    carbon_gco2: Any
+    price_usd: Any
+    data_volume_bytes: Any = 0
+    num_documents: Any = 0
+    num_servers_involved: Any = 0
+    latency_ms: Any = 0.0
+
+    def __post_init__(self):
+        _require_numpy()
+        names = [f.name for f in fields(self)]
+        arrays = np.broadcast_arrays(*[np.asarray(getattr(self, name)) for name in names])
+        for name, array in zip(names, arrays):
+            object.__setattr__(self, name, array)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """Shape of the evaluated grid"""
+        return self.time_ms.shape
+
+    def __add__(self, other: 'QueryCostBatch') -> 'QueryCostBatch':
+        """Add two batches element-wise (as QueryCost.__add__)"""
+        return QueryCostBatch(
+            time_ms=self.time_ms + other.time_ms,
+            carbon_gco2=self.carbon_gco2 + other.carbon_gco2,
+            price_usd=self.price_usd + other.price_usd,
+            data_volume_bytes=self.data_volume_bytes + other.data_volume_bytes,
+            num_documents=self.num_documents + other.num_documents,
+            num_servers_involved=np.maximum(self.num_servers_involved, other.num_servers_involved),
+            latency_ms=self.latency_ms + other.latency_ms
+        )
+
+    def scale(self, factor: Any) -> 'QueryCostBatch':
+        """Multiply every additive metric by `factor` (scalar or array)"""
+        return QueryCostBatch(
+            time_ms=self.time_ms * factor,
+            carbon_gco2=self.carbon_gco2 * factor,
+            price_usd=self.price_usd * factor,
+            data_volume_bytes=self.data_volume_bytes * factor,
+            num_documents=self.num_documents * factor,
+            num_servers_involved=self.num_servers_involved,
+            latency_ms=self.latency_ms * factor
+        )
+
+    def __getitem__(self, index) -> Any:
+        """QueryCost of one element, or a QueryCostBatch for a slice"""
+        values = {f.name: getattr(self, f.name)[index] for f in fields(self)}
+        if np.ndim(values["time_ms"]) == 0:
+            return QueryCost(**{name: value.item() for name, value in values.items()})
+        return QueryCostBatch(**values)
+
+
 class CostModel:
     """
     Cost model for calculating query execution costs
+
+    Bound to a ClusterProfile (bandwidths, disk, CPU, price and carbon
+    intensities). Scalar costs are memoized per model; `for_profile`
+    shares one model per profile, so operators built with the same
+    profile share the memo. Cost methods can also be called on the class
+    (`CostModel.calculate_filter_cost(...)`), with the default profile.
     """
 
-    @staticmethod
+    _instances: Dict[ClusterProfile, 'CostModel'] = {}
+
+    def __init__(self, profile: Optional[ClusterProfile] = None, memo_maxsize: int = 4096):
+        """
+        Args:
+            profile: Cluster hardware profile (default: DEFAULT_PROFILE)
+            memo_maxsize: Costs kept in the LRU memo
+        """
+        self.profile = profile or DEFAULT_PROFILE
+        self.memo_maxsize = memo_maxsize
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self._memo: "OrderedDict[tuple, Any]" = OrderedDict()
+
+    @classmethod
+    def for_profile(cls, profile: Optional[ClusterProfile] = None) -> 'CostModel':
+        """Shared cost model of a profile (created on first use)"""
+        profile = profile or DEFAULT_PROFILE
+        model = cls._instances.get(profile)
+        if model is None:
+            model = cls._instances[profile] = cls(profile)
+        return model
+
+    def memo_info(self) -> Dict[str, int]:
+        """Hit/miss counters and current size of the memo"""
+        return {
+            'hits': self.memo_hits,
+            'misses': self.memo_misses,
+            'size': len(self._memo),
+            'maxsize': self.memo_maxsize
+        }
+
+    def clear_memo(self):
+        """Drop memoized costs and reset the counters"""
+        self._memo.clear()
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+    @_memoized
     def calculate_communication_cost(
+        self,
         data_volume_bytes: int,
         num_servers_involved: int = 1000,
-        num_documents: int = 0
+        num_documents: int = 0,
+        coordinator_bytes: Optional[int] = None,
+        num_round_trips: int = 1
     ) -> QueryCost:
         """
         Calculate the cost of data communication/transfer
@@ -72,23 +260,37 @@ class CostModel:
             data_volume_bytes: Total volume of data transferred in bytes
             num_servers: Number of servers involved in the operation
             num_documents: Number of documents accessed
+            coordinator_bytes: Part of the volume sent to or from the coordinator
+                (default: all of it; shuffled bytes only move between servers)
+            num_round_trips: Sequential request round trips
 
         Returns:
             QueryCost object with calculated costs
         """
         # Communication time based on bandwidth
-        time_ms = data_volume_bytes / BANDWIDTH_SPEED_BYTES_PER_MS
+        time_ms = data_volume_bytes / self.profile.bandwidth_bytes_per_ms
+
+        # Latency: servers transfer their share in parallel, but everything
+        # sent to or from the coordinator crosses its link
+        if coordinator_bytes is None:
+            coordinator_bytes = data_volume_bytes
+        latency_ms = max(
+            data_volume_bytes / max(num_servers_involved, 1) / self.profile.bandwidth_bytes_per_ms,
+            coordinator_bytes / self.profile.coordinator_bandwidth_bytes_per_ms
+        )
+        if data_volume_bytes:
+            latency_ms += num_round_trips * self.profile.network_rtt_ms
 
         # Convert to GB for cost calculation
         data_volume_gb = data_volume_bytes / (1024 ** 3)
 
         # Calculate costs
-        carbon = data_volume_gb * CARBON_PER_GB_TRANSFER
-        price = data_volume_gb * COST_PER_GB_TRANSFER
+        carbon = data_volume_gb * self.profile.carbon_per_gb_transfer
+        price = data_volume_gb * self.profile.cost_per_gb_transfer
 
         # Add server processing cost
-        server_carbon = time_ms * CARBON_PER_SERVER_MS * num_servers_involved
-        server_price = time_ms * COST_PER_SERVER_MS * num_servers_involved
+        server_carbon = time_ms * self.profile.carbon_per_server_ms * num_servers_involved
+        server_price = time_ms * self.profile.cost_per_server_ms * num_servers_involved
 
         return QueryCost(
             time_ms=time_ms,
@@ -96,11 +298,13 @@ class CostModel:
             price_usd=price + server_price,
             data_volume_bytes=data_volume_bytes,
             num_documents=num_documents,
-            num_servers_involved=num_servers_involved
+            num_servers_involved=num_servers_involved,
+            latency_ms=latency_ms
         )
 
-    @staticmethod
+    @_memoized
     def calculate_scan_cost(
+        self,
         num_documents: int,
         doc_size_bytes: int,
         use_index: bool = False,
@@ -121,17 +325,17 @@ class CostModel:
         # Time calculation
         if use_index:
             # Index access time per document
-            time_ms = num_documents * INDEX_ACCESS_TIME_MS
+            time_ms = num_documents * self.profile.index_access_time_ms
         else:
             # Full scan time per document
-            time_ms = num_documents * FULL_SCAN_TIME_PER_DOC_MS
+            time_ms = num_documents * self.profile.full_scan_time_per_doc_ms
 
         # Data volume
         data_volume_bytes = num_documents * doc_size_bytes
 
         # Server processing cost
-        carbon = time_ms * CARBON_PER_SERVER_MS * num_servers_involved
-        price = time_ms * COST_PER_SERVER_MS * num_servers_involved
+        carbon = time_ms * self.profile.carbon_per_server_ms * num_servers_involved
+        price = time_ms * self.profile.cost_per_server_ms * num_servers_involved
 
         return QueryCost(
             time_ms=time_ms,
@@ -139,11 +343,14 @@ class CostModel:
             price_usd=price,
             data_volume_bytes=data_volume_bytes,
             num_documents=num_documents,
-            num_servers_involved=num_servers_involved
+            num_servers_involved=num_servers_involved,
+            # Each server scans its share in parallel
+            latency_ms=time_ms / max(num_servers_involved, 1)
         )
 
-    @staticmethod
+    @_memoized
     def calculate_filter_cost(
+        self,
         total_document_accessed: int,
         doc_size_bytes: int,
         c1: int,
@@ -153,26 +360,21 @@ class CostModel:
         """
         Calculate the cost of a filter operation
 
+        Only the gathering of the results is counted here: reading the
+        documents is costed by the operators with `calculate_storage_cost`.
+
         Args:
             total_document_accessed: Total number of documents to access
-            doc_size_bytes: Size of input documents
+            doc_size_bytes: Size of input documents (kept for compatibility)
             c1: C1 volume: #S1 * size(S1) + #O1 * size(O1)
-            use_index: Whether an index is used
+            use_index: Whether an index is used (kept for compatibility)
             num_servers_involved: Number of servers in cluster
 
         Returns:
             QueryCost object with calculated costs
         """
-        # Each server scans its portion
-        scan_cost = CostModel.calculate_scan_cost(
-            num_documents=total_document_accessed,
-            doc_size_bytes=doc_size_bytes,
-            use_index=use_index,
-            num_servers_involved=num_servers_involved
-        )
-
         # Communication cost for gathering results
-        comm_cost = CostModel.calculate_communication_cost(
+        comm_cost = self.calculate_communication_cost(
             data_volume_bytes=c1,
             num_servers_involved=num_servers_involved,
             num_documents=total_document_accessed
@@ -180,8 +382,9 @@ class CostModel:
 
         return comm_cost
 
-    @staticmethod
+    @_memoized
     def calculate_nested_loop_join_cost(
+        self,
         total_document_accessed_left: int,
         total_document_accessed_right: int,
         doc_size_bytes_left: int,
@@ -192,6 +395,8 @@ class CostModel:
         use_index: bool = False,
         num_servers_s1: int = 1000,  # Server Involved for the left part of the query
         num_servers_s2: int = 1000,  # Server Involved for the right part of the query
+        c1_shuffle_bytes: int = 0,
+        c2_shuffle_bytes: int = 0
     ) -> Tuple[QueryCost, int]:
         """
         Calculate the cost of a nested loop join operation
@@ -206,13 +411,15 @@ class CostModel:
             use_index: Whether an index is used
             num_servers_s1: Number of servers in cluster for left part
             num_servers_s2: Number of servers in cluster for right part
+            c1_shuffle_bytes, c2_shuffle_bytes: Part of C1 / C2 exchanged between
+                servers rather than with the coordinator (GROUP BY shuffles)
 
         Returns:
             Tuple of (QueryCost object, num_messages)
         """
 
         # Scan cost for accessing documents for the left part of the query
-        scan_cost_1 = CostModel.calculate_scan_cost(
+        scan_cost_1 = self.calculate_scan_cost(
             num_documents=total_document_accessed_left,
             doc_size_bytes=doc_size_bytes_left,
             use_index=use_index,
@@ -221,7 +428,7 @@ class CostModel:
 
         # Scan cost for accessing documents for the right part of the query
 
-        scan_cost_2_single = CostModel.calculate_scan_cost(
+        scan_cost_2_single = self.calculate_scan_cost(
             num_documents=total_document_accessed_right,
             doc_size_bytes=doc_size_bytes_right,
             use_index=use_index,
@@ -234,21 +441,24 @@ class CostModel:
             price_usd=scan_cost_2_single.price_usd * num_loops,
             data_volume_bytes=scan_cost_2_single.data_volume_bytes * num_loops,
             num_documents=scan_cost_2_single.num_documents * num_loops,
-            num_servers_involved=num_servers_s2
+            num_servers_involved=num_servers_s2,
+            latency_ms=scan_cost_2_single.latency_ms * num_loops
         )
 
         # Communication cost for C1
-        c1_cost = CostModel.calculate_communication_cost(
+        c1_cost = self.calculate_communication_cost(
             data_volume_bytes=c1,
             num_servers_involved=num_servers_s1,
-            num_documents=total_document_accessed_left
+            num_documents=total_document_accessed_left,
+            coordinator_bytes=c1 - c1_shuffle_bytes
         )
 
         # Communication cost for C2 (multiplied by num_loops)
-        c2_cost_single = CostModel.calculate_communication_cost(
+        c2_cost_single = self.calculate_communication_cost(
             data_volume_bytes=c2,
             num_servers_involved=num_servers_s2,
-            num_documents=total_document_accessed_right
+            num_documents=total_document_accessed_right,
+            coordinator_bytes=c2 - c2_shuffle_bytes
         )
 
         c2_cost_total = QueryCost(
@@ -257,7 +467,9 @@ class CostModel:
             price_usd=c2_cost_single.price_usd * num_loops,
             data_volume_bytes=c2_cost_single.data_volume_bytes * num_loops,
             num_documents=c2_cost_single.num_documents * num_loops,
-            num_servers_involved=num_servers_s2
+            num_servers_involved=num_servers_s2,
+            # One round trip per loop
+            latency_ms=c2_cost_single.latency_ms * num_loops
         )
 
         # Total cost
@@ -266,3 +478,576 @@ class CostModel:
         return total_comm_cost
 
 
+
+    @_memoized
+    def calculate_spill_cost(
+        self,
+        spill_bytes: int,
+        num_servers_involved: int = 1
+    ) -> QueryCost:
+        """
+        Calculate the cost of spilling data to disk and reading it back
+
+        Args:
+            spill_bytes: Bytes written to disk (each byte is written and read once)
+            num_servers_involved: Number of servers spilling
+
+        Returns:
+            QueryCost object with calculated costs
+        """
+        return self.calculate_disk_io_cost(2 * spill_bytes, num_servers_involved)
+
+    @_memoized
+    def calculate_disk_io_cost(
+        self,
+        io_bytes: int,
+        num_servers_involved: int = 1
+    ) -> QueryCost:
+        """
+        Calculate the cost of sequential disk reads and writes
+
+        Args:
+            io_bytes: Bytes read or written by each server (servers work in parallel)
+            num_servers_involved: Number of servers doing the I/O
+
+        Returns:
+            QueryCost object with calculated costs
+        """
+        time_ms = io_bytes / self.profile.disk_bytes_per_ms
+
+        return QueryCost(
+            time_ms=time_ms,
+            carbon_gco2=time_ms * self.profile.carbon_per_server_ms * num_servers_involved,
+            price_usd=time_ms * self.profile.cost_per_server_ms * num_servers_involved,
+            num_servers_involved=num_servers_involved,
+            latency_ms=time_ms
+        )
+
+    @_memoized
+    def calculate_storage_cost(
+        self,
+        collection_documents: float,
+        doc_size_bytes: int,
+        documents_read: float,
+        num_servers_involved: int = 1,
+        num_servers_total: int = 1000,
+        random_access: bool = False,
+        index_depth: int = 0,
+        index_size_bytes: float = 0
+    ) -> Tuple[QueryCost, int, float]:
+        """
+        Calculate the cost of reading a collection through the buffer cache
+
+        The collection's share of each server (and of its index, if read) is
+        its working set; the buffer cache holds part of it (cache hit ratio =
+        cache / working set) and only the missing pages are read from disk,
+        at the sequential disk speed for a scan or one random read per page
+        for index lookups.
+
+        Args:
+            collection_documents: Documents in the collection
+            doc_size_bytes: Stored document size
+            documents_read: Documents read, over all the servers involved
+            num_servers_involved: Servers reading their share in parallel
+            num_servers_total: Servers the collection is spread over
+            random_access: True for index lookups (the B-tree pages, then the
+                document pages), False for a sequential scan
+            index_depth: B-tree levels walked per lookup (0 = index of unknown
+                shape, only the document pages are read)
+            index_size_bytes: Size of the index over all the servers
+
+        Returns:
+            Tuple of (QueryCost object, pages read per server, cache hit ratio)
+        """
+        page_size = self.profile.page_size_bytes
+        data_bytes = collection_documents / max(num_servers_total, 1) * doc_size_bytes
+        index_bytes = index_size_bytes / max(num_servers_total, 1)
+        working_set_bytes = data_bytes + index_bytes
+        collection_pages = math.ceil(data_bytes / page_size)
+        if working_set_bytes:
+            cache_hit_ratio = min(1.0, self.profile.buffer_cache_bytes / working_set_bytes)
+        else:
+            cache_hit_ratio = 1.0
+
+        documents_per_server = documents_read / max(num_servers_involved, 1)
+        if random_access:
+            pages_per_document = max(math.ceil(doc_size_bytes / page_size), 1)
+            lookups = math.ceil(documents_per_server)
+            pages_read = (
+                min(lookups * pages_per_document, collection_pages)
+                # Inner pages are shared by the lookups: at most the whole index
+                + min(lookups * index_depth, max(math.ceil(index_bytes / page_size), index_depth))
+            )
+            time_ms = pages_read * (1 - cache_hit_ratio) * self.profile.disk_random_read_ms
+        else:
+            pages_read = min(math.ceil(documents_per_server * doc_size_bytes / page_size), collection_pages)
+            time_ms = pages_read * (1 - cache_hit_ratio) * page_size / self.profile.disk_bytes_per_ms
+
+        return QueryCost(
+            time_ms=time_ms * num_servers_involved,
+            carbon_gco2=time_ms * self.profile.carbon_per_server_ms * num_servers_involved,
+            price_usd=time_ms * self.profile.cost_per_server_ms * num_servers_involved,
+            num_servers_involved=num_servers_involved,
+            # Each server reads its share in parallel
+            latency_ms=time_ms
+        ), pages_read, cache_hit_ratio
+
+    @_memoized
+    def calculate_hash_join_cost(
+        self,
+        total_document_accessed_build: int,
+        total_document_accessed_probe: int,
+        c_build: int,
+        c_probe: int,
+        spill_bytes: int = 0,
+        num_servers_build: int = 1000,
+        num_servers_probe: int = 1000,
+        num_join_servers: int = 1,
+        bloom_filter_bytes: int = 0
+    ) -> QueryCost:
+        """
+        Calculate the cost of a hash join operation
+
+        Unlike the nested loop join, each side is transferred once: the
+        build side fills the hash table, then the probe side is streamed
+        through it.
+
+        Args:
+            total_document_accessed_build: Documents accessed on the build side
+            total_document_accessed_probe: Documents accessed on the probe side
+            c_build: Build volume: #S_build * size(S_build) + #O_build * size(O_build)
+            c_probe: Probe volume: #S_probe * size(S_probe) + #O_probe * size(O_probe)
+            spill_bytes: Bytes spilled to disk when the hash table does not fit in memory
+            num_servers_build: Number of servers in cluster for the build side
+            num_servers_probe: Number of servers in cluster for the probe side
+            num_join_servers: Number of servers holding the hash table
+            bloom_filter_bytes: Bloom filter of the build keys sent to every
+                probe server (semi-join reduction of the probe side)
+
+        Returns:
+            QueryCost object with calculated costs
+        """
+        build_cost = self.calculate_communication_cost(
+            data_volume_bytes=c_build,
+            num_servers_involved=num_servers_build,
+            num_documents=total_document_accessed_build
+        )
+
+        probe_cost = self.calculate_communication_cost(
+            data_volume_bytes=c_probe,
+            num_servers_involved=num_servers_probe,
+            num_documents=total_document_accessed_probe
+        )
+
+        total_cost = build_cost + probe_cost
+        if bloom_filter_bytes:
+            total_cost = total_cost + self.calculate_communication_cost(
+                data_volume_bytes=bloom_filter_bytes * num_servers_probe,
+                num_servers_involved=num_servers_probe
+            )
+        if spill_bytes:
+            total_cost = total_cost + self.calculate_spill_cost(spill_bytes, num_join_servers)
+
+        return total_cost
+
+    @_memoized
+    def calculate_co_located_join_cost(
+        self,
+        total_document_accessed: int,
+        c1: int,
+        c_result: int,
+        num_servers_involved: int = 1000
+    ) -> QueryCost:
+        """
+        Calculate the cost of a co-located join (both sides sharded on the
+        join key): each shard joins locally, with no per-loop traffic
+
+        Args:
+            total_document_accessed: Documents accessed on both sides
+            c1: Request volume: #S * (size(S1) + size(S2))
+            c_result: Joined documents returned: #output * (size(O1) + size(O2))
+            num_servers_involved: Number of shards joining
+
+        Returns:
+            QueryCost object with calculated costs
+        """
+        return self.calculate_communication_cost(
+            data_volume_bytes=c1 + c_result,
+            num_servers_involved=num_servers_involved,
+            num_documents=total_document_accessed
+        )
+
+    @_memoized
+    def calculate_broadcast_join_cost(
+        self,
+        total_document_accessed_small: int,
+        total_document_accessed_large: int,
+        c_gather: int,
+        c_broadcast: int,
+        c_result: int,
+        num_servers_small: int = 1000,
+        num_servers_large: int = 1000
+    ) -> QueryCost:
+        """
+        Calculate the cost of a broadcast join: the small side is gathered,
+        sent once to every server of the large side, which join locally
+
+        Args:
+            total_document_accessed_small: Documents accessed on the small side
+            total_document_accessed_large: Documents accessed on the large side
+            c_gather: #S_small * size(S_small) + #O_small * size(O_small)
+            c_broadcast: #S_large * (size(S_large) + #O_small * size(O_small))
+            c_result: Joined documents returned: #output * (size(O1) + size(O2))
+            num_servers_small: Number of servers of the small side
+            num_servers_large: Number of servers receiving the broadcast
+
+        Returns:
+            QueryCost object with calculated costs
+        """
+        gather_cost = self.calculate_communication_cost(
+            data_volume_bytes=c_gather,
+            num_servers_involved=num_servers_small,
+            num_documents=total_document_accessed_small
+        )
+
+        broadcast_cost = self.calculate_communication_cost(
+            data_volume_bytes=c_broadcast + c_result,
+            num_servers_involved=num_servers_large,
+            num_documents=total_document_accessed_large
+        )
+
+        return gather_cost + broadcast_cost
+
+    @_memoized
+    def calculate_external_sort_cost(
+        self,
+        bytes_per_server: int,
+        memory_bytes: int,
+        merge_fan_in: int,
+        num_servers_involved: int = 1000
+    ) -> Tuple[QueryCost, int, int]:
+        """
+        Calculate the cost of an external merge sort run on every server
+
+        Runs of `memory_bytes` are sorted in memory and written to disk,
+        then merged `merge_fan_in` at a time. Every pass but the last
+        reads and writes the data; the last pass only reads it (its output
+        streams into the merge join).
+
+        Args:
+            bytes_per_server: Data sorted by each server
+            memory_bytes: Memory available for sorting on each server
+            merge_fan_in: Runs merged per pass
+            num_servers_involved: Number of servers sorting in parallel
+
+        Returns:
+            Tuple of (QueryCost object, number of runs, number of merge passes)
+        """
+        num_runs = max(math.ceil(bytes_per_server / memory_bytes), 1)
+        if num_runs == 1:
+            # Fits in memory: no disk I/O
+            return QueryCost(time_ms=0, carbon_gco2=0, price_usd=0,
+                             num_servers_involved=num_servers_involved), 1, 0
+
+        merge_passes = 0
+        runs = num_runs
+        while runs > 1:
+            runs = math.ceil(runs / merge_fan_in)
+            merge_passes += 1
+        # Write runs, (read + write) per intermediate pass, read during the last pass
+        io_bytes = bytes_per_server + 2 * bytes_per_server * (merge_passes - 1) + bytes_per_server
+
+        return self.calculate_disk_io_cost(io_bytes, num_servers_involved), num_runs, merge_passes
+
+    @_memoized
+    def calculate_top_k_merge_cost(self, num_candidates: int, k: int) -> QueryCost:
+        """
+        Calculate the cost of merging top-K candidates at the coordinator
+
+        Args:
+            num_candidates: Candidates received from the shards
+            k: Number of results kept
+
+        Returns:
+            QueryCost of a bounded heap: log2(K) comparisons per candidate
+        """
+        comparisons = num_candidates * max(math.ceil(math.log2(k)), 1) if k > 0 else 0
+        time_ms = comparisons * self.profile.comparison_time_ms
+        return QueryCost(
+            time_ms=time_ms,
+            carbon_gco2=time_ms * self.profile.carbon_per_server_ms,
+            price_usd=time_ms * self.profile.cost_per_server_ms,
+            num_documents=num_candidates,
+            num_servers_involved=1,
+            latency_ms=time_ms
+        )
+
+    @_memoized
+    def calculate_view_maintenance_cost(
+        self,
+        update_size_bytes: int,
+        num_servers_involved: int = 1,
+        use_index: bool = True
+    ) -> QueryCost:
+        """
+        Calculate the cost of maintaining one materialized view after an
+        insert into its source collection (incremental upsert of one group)
+
+        Args:
+            update_size_bytes: Size of the update sent to each server (a view document)
+            num_servers_involved: 1 if the view is sharded on a GROUP BY key,
+                otherwise every server looks the group up
+            use_index: Whether the group is found through an index
+
+        Returns:
+            QueryCost of one view update
+        """
+        lookup_cost = self.calculate_scan_cost(
+            num_documents=num_servers_involved,
+            doc_size_bytes=update_size_bytes,
+            use_index=use_index,
+            num_servers_involved=num_servers_involved
+        )
+        update_cost = self.calculate_communication_cost(
+            data_volume_bytes=update_size_bytes * num_servers_involved,
+            num_servers_involved=num_servers_involved,
+            num_documents=1
+        )
+        return lookup_cost + update_cost
+
+    @staticmethod
+    def calculate_bloom_filter_size(num_keys: int, false_positive_rate: float) -> int:
+        """
+        Calculate the size of a Bloom filter
+
+        Args:
+            num_keys: Number of keys inserted
+            false_positive_rate: Target false-positive rate
+
+        Returns:
+            Size in bytes: m = -n * ln(p) / ln(2)^2 bits
+        """
+        if num_keys <= 0:
+            return 0
+        bits = math.ceil(-num_keys * math.log(false_positive_rate) / math.log(2) ** 2)
+        return math.ceil(bits / 8)
+
+    @_memoized
+    def calculate_semi_join_cost(
+        self,
+        total_document_accessed_left: int,
+        total_document_accessed_right: int,
+        c1: int,
+        bloom_filter_bytes: int,
+        c2: int,
+        num_servers_s1: int = 1000,
+        num_servers_s2: int = 1000
+    ) -> QueryCost:
+        """
+        Calculate the cost of a Bloom-filter semi-join: the outer side is
+        gathered, its join keys are broadcast once as a Bloom filter and the
+        right servers return only the documents passing it
+
+        Args:
+            total_document_accessed_left: Documents accessed on the left side
+            total_document_accessed_right: Documents accessed on the right side
+            c1: C1 volume: #S1 * size(S1) + #O1 * size(O1)
+            bloom_filter_bytes: Bloom filter size, sent to each right server
+            c2: Reduced C2 volume: #S2 * size(S2) + (#matches + #false positives) * size(O2)
+            num_servers_s1: Number of servers for the left part
+            num_servers_s2: Number of servers receiving the Bloom filter
+
+        Returns:
+            QueryCost object with calculated costs
+        """
+        c1_cost = self.calculate_communication_cost(
+            data_volume_bytes=c1,
+            num_servers_involved=num_servers_s1,
+            num_documents=total_document_accessed_left
+        )
+
+        bloom_cost = self.calculate_communication_cost(
+            data_volume_bytes=bloom_filter_bytes * num_servers_s2,
+            num_servers_involved=num_servers_s2
+        )
+
+        c2_cost = self.calculate_communication_cost(
+            data_volume_bytes=c2,
+            num_servers_involved=num_servers_s2,
+            num_documents=total_document_accessed_right
+        )
+
+        return c1_cost + bloom_cost + c2_cost
+
+    def calculate_communication_cost_batch(
+        self,
+        data_volume_bytes: Any,
+        num_servers_involved: Any = 1000,
+        num_documents: Any = 0,
+        coordinator_bytes: Any = None,
+        num_round_trips: Any = 1,
+        bandwidth_bytes_per_ms: Any = None,
+        coordinator_bandwidth_bytes_per_ms: Any = None
+    ) -> QueryCostBatch:
+        """
+        Vectorized `calculate_communication_cost` over arrays of inputs
+
+        Args:
+            data_volume_bytes, num_servers_involved, num_documents,
+            coordinator_bytes, num_round_trips: Scalars or arrays (broadcast
+                against each other), as in calculate_communication_cost
+            bandwidth_bytes_per_ms: Link bandwidth (scalar or array, for sweeps;
+                default: the profile's)
+            coordinator_bandwidth_bytes_per_ms: Coordinator link bandwidth (default: the profile's)
+
+        Returns:
+            QueryCostBatch, element-wise equal to the scalar results
+        """
+        _require_numpy()
+        if bandwidth_bytes_per_ms is None:
+            bandwidth_bytes_per_ms = self.profile.bandwidth_bytes_per_ms
+        if coordinator_bandwidth_bytes_per_ms is None:
+            coordinator_bandwidth_bytes_per_ms = self.profile.coordinator_bandwidth_bytes_per_ms
+        data_volume_bytes = np.asarray(data_volume_bytes)
+        num_servers_involved = np.asarray(num_servers_involved)
+
+        time_ms = data_volume_bytes / bandwidth_bytes_per_ms
+        data_volume_gb = data_volume_bytes / (1024 ** 3)
+        carbon = data_volume_gb * self.profile.carbon_per_gb_transfer
+        price = data_volume_gb * self.profile.cost_per_gb_transfer
+        server_carbon = time_ms * self.profile.carbon_per_server_ms * num_servers_involved
+        server_price = time_ms * self.profile.cost_per_server_ms * num_servers_involved
+
+        if coordinator_bytes is None:
+            coordinator_bytes = data_volume_bytes
+        latency_ms = np.maximum(
+            data_volume_bytes / np.maximum(num_servers_involved, 1) / bandwidth_bytes_per_ms,
+            np.asarray(coordinator_bytes) / coordinator_bandwidth_bytes_per_ms
+        )
+        latency_ms = np.where(data_volume_bytes != 0, latency_ms + num_round_trips * self.profile.network_rtt_ms, latency_ms)
+
+        return QueryCostBatch(
+            time_ms=time_ms,
+            carbon_gco2=carbon + server_carbon,
+            price_usd=price + server_price,
+            data_volume_bytes=data_volume_bytes,
+            num_documents=num_documents,
+            num_servers_involved=num_servers_involved,
+            latency_ms=latency_ms
+        )
+
+    def calculate_scan_cost_batch(
+        self,
+        num_documents: Any,
+        doc_size_bytes: Any,
+        use_index: Any = False,
+        num_servers_involved: Any = 1
+    ) -> QueryCostBatch:
+        """
+        Vectorized `calculate_scan_cost` over arrays of inputs
+
+        Args:
+            num_documents, doc_size_bytes, use_index, num_servers_involved:
+                Scalars or arrays (broadcast against each other), as in calculate_scan_cost
+
+        Returns:
+            QueryCostBatch, element-wise equal to the scalar results
+        """
+        _require_numpy()
+        num_documents = np.asarray(num_documents)
+        num_servers_involved = np.asarray(num_servers_involved)
+
+        time_ms = np.where(
+            use_index,
+            num_documents * self.profile.index_access_time_ms,
+            num_documents * self.profile.full_scan_time_per_doc_ms
+        )
+        data_volume_bytes = num_documents * np.asarray(doc_size_bytes)
+        carbon = time_ms * self.profile.carbon_per_server_ms * num_servers_involved
+        price = time_ms * self.profile.cost_per_server_ms * num_servers_involved
+
+        return QueryCostBatch(
+            time_ms=time_ms,
+            carbon_gco2=carbon,
+            price_usd=price,
+            data_volume_bytes=data_volume_bytes,
+            num_documents=num_documents,
+            num_servers_involved=num_servers_involved,
+            latency_ms=time_ms / np.maximum(num_servers_involved, 1)
+        )
+
+    def calculate_filter_cost_batch(
+        self,
+        total_document_accessed: Any,
+        doc_size_bytes: Any,
+        c1: Any,
+        use_index: Any = False,
+        num_servers_involved: Any = 1000,
+        bandwidth_bytes_per_ms: Any = None
+    ) -> QueryCostBatch:
+        """
+        Vectorized `calculate_filter_cost` over arrays of inputs
+
+        Args:
+            total_document_accessed, doc_size_bytes, c1, use_index,
+            num_servers_involved: Scalars or arrays, as in calculate_filter_cost
+            bandwidth_bytes_per_ms: Link bandwidth (scalar or array, for sweeps;
+                default: the profile's)
+
+        Returns:
+            QueryCostBatch, element-wise equal to the scalar results
+        """
+        # As in the scalar path, only the communication cost is counted
+        return self.calculate_communication_cost_batch(
+            data_volume_bytes=c1,
+            num_servers_involved=num_servers_involved,
+            num_documents=total_document_accessed,
+            bandwidth_bytes_per_ms=bandwidth_bytes_per_ms
+        )
+
+    def calculate_nested_loop_join_cost_batch(
+        self,
+        total_document_accessed_left: Any,
+        total_document_accessed_right: Any,
+        doc_size_bytes_left: Any,
+        doc_size_bytes_right: Any,
+        c1: Any,
+        c2: Any,
+        num_loops: Any,
+        use_index: Any = False,
+        num_servers_s1: Any = 1000,
+        num_servers_s2: Any = 1000,
+        c1_shuffle_bytes: Any = 0,
+        c2_shuffle_bytes: Any = 0,
+        bandwidth_bytes_per_ms: Any = None
+    ) -> QueryCostBatch:
+        """
+        Vectorized `calculate_nested_loop_join_cost` over arrays of inputs
+
+        Args:
+            Same as calculate_nested_loop_join_cost (scalars or arrays,
+            broadcast against each other), plus
+            bandwidth_bytes_per_ms: Link bandwidth (scalar or array, for sweeps;
+                default: the profile's)
+
+        Returns:
+            QueryCostBatch, element-wise equal to the scalar results
+        """
+        _require_numpy()
+        c1_cost = self.calculate_communication_cost_batch(
+            data_volume_bytes=c1,
+            num_servers_involved=num_servers_s1,
+            num_documents=total_document_accessed_left,
+            coordinator_bytes=np.asarray(c1) - c1_shuffle_bytes,
+            bandwidth_bytes_per_ms=bandwidth_bytes_per_ms
+        )
+        c2_cost_single = self.calculate_communication_cost_batch(
+            data_volume_bytes=c2,
+            num_servers_involved=num_servers_s2,
+            num_documents=total_document_accessed_right,
+            coordinator_bytes=np.asarray(c2) - c2_shuffle_bytes,
+            bandwidth_bytes_per_ms=bandwidth_bytes_per_ms
+        )
+        c2_cost_total = c2_cost_single.scale(np.asarray(num_loops))
+
+        return c1_cost + c2_cost_total
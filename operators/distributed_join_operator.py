@@ -0,0 +1,355 @@
+"""
+Shard-aware join operators for query execution
+Co-located joins (both sides sharded on the join key) and broadcast joins
+(the small side is sent once to every server holding the large side)
+"""
+
+import math
+from typing import List, Dict, Optional
+from dataclasses import dataclass
+from models.schema import Collection
+from models.statistics import Statistics
+from calculators.size_calculator import SizeCalculator
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
+from .cost_model import CostModel
+from .filter_operator import FilterOperator
+from .join_operator import JoinResult, NestedLoopJoinOperator
+
+
+@dataclass
+class DistributedJoinResult(JoinResult):
+    """
+    Result of a co-located or broadcast join
+
+    Same fields as JoinResult; o1 / o2 are the total filtered documents of
+    each side and num_loops is 1 (no per-document round trip).
+    """
+    join_strategy: str = ""  # 'co_located' or 'broadcast'
+    broadcast_side: Optional[str] = None  # 'left' or 'right' for broadcast joins
+    broadcast_bytes: int = 0  # Size of the broadcast documents (sent once per target server)
+    output_docs: int = 0  # Joined documents returned to the coordinator
+    result_volume_bytes: int = 0  # output_docs * (size(O1) + size(O2))
+
+
+class _ShardJoinOperator:
+    """Size helpers shared by the shard-aware join operators"""
+
+    def __init__(self, statistics: Statistics, profile: Optional[ClusterProfile] = None):
+        """
+        Args:
+            statistics: Database statistics
+            profile: Cluster hardware profile (default: DEFAULT_PROFILE)
+        """
+        self.profile = profile or DEFAULT_PROFILE
+        self.statistics = self.profile.apply_to(statistics)
+        self.size_calculator = SizeCalculator(self.statistics)
+        self.cost_model = CostModel.for_profile(self.profile)
+        self.filter_operator = FilterOperator(statistics, self.profile)
+
+    def calculate_join_input_size(self, collection: Collection, join_key: str,
+                                  output_keys: List[str], filter_keys: Optional[List[str]] = None) -> int:
+        """Size of a projection on the output, filter and join keys (cached)"""
+        input_keys = list(output_keys) + list(filter_keys or []) + [join_key]
+        return self.size_calculator.calculate_projection_size(collection.schema, input_keys)
+
+    def calculate_join_output_size(self, collection: Collection, output_keys: List[str]) -> int:
+        """Size of a projection on the output keys (cached)"""
+        return self.size_calculator.calculate_projection_size(collection.schema, output_keys)
+
+    def _targeted(self, sharding_key: Optional[str], filter_keys: Optional[List[str]]) -> bool:
+        """True if a filter on the sharding key sends the query to a single server"""
+        return bool(sharding_key and filter_keys and sharding_key in filter_keys)
+
+
+class CoLocatedJoinOperator(_ShardJoinOperator):
+    """
+    Join of two collections sharded on the join key: matching documents
+    live on the same shard, so each shard joins locally and only the joined
+    documents travel to the coordinator.
+    """
+
+    @staticmethod
+    def applies(left_collection: Collection, right_collection: Collection,
+                join_key: str, sharding_strategy: Dict[str, str]) -> bool:
+        """True if both collections are sharded on the join key"""
+        return (sharding_strategy.get(left_collection.name) == join_key
+                and sharding_strategy.get(right_collection.name) == join_key)
+
+    def co_located_join(
+        self,
+        left_collection: Collection,
+        right_collection: Collection,
+        join_key: str,
+        left_output_keys: Optional[List[str]],
+        right_output_keys: Optional[List[str]],
+        sharding_strategy: Dict[str, str],
+        left_filter_keys: Optional[List[str]] = None,
+        right_filter_keys: Optional[List[str]] = None,
+        left_filter_selectivity: float = 1.0,
+        right_filter_selectivity: float = 1.0,
+        join_key_distinct_values: Optional[int] = None,
+        array_sizes: Optional[Dict[str, int]] = None
+    ) -> DistributedJoinResult:
+        """
+        Execute a co-located join
+
+        Args:
+            left_collection, right_collection: Collections to join
+            join_key: Key to join on (the sharding key of both collections)
+            left_output_keys, right_output_keys: Keys to include in output (None: no keys)
+            sharding_strategy: Dict mapping collection names to sharding keys
+            left_filter_keys, right_filter_keys: Filter keys (if any)
+            left_filter_selectivity, right_filter_selectivity: Fraction of
+                documents passing each filter
+            join_key_distinct_values: Distinct join key values on the right side
+                (default: right document count, i.e. a unique key)
+            array_sizes: Average sizes for arrays
+
+        Returns:
+            DistributedJoinResult with output metrics and costs
+
+        Raises:
+            ValueError: If the collections are not both sharded on the join key
+        """
+        if not self.applies(left_collection, right_collection, join_key, sharding_strategy):
+            raise ValueError(
+                f"Co-located join requires {left_collection.name} and {right_collection.name} "
+                f"to be sharded on {join_key}"
+            )
+
+        num_servers = self.statistics.num_servers
+        left_output_keys = list(left_output_keys or [])
+        right_output_keys = list(right_output_keys or [])
+
+        # A filter on the join key targets the single shard holding that key on both sides
+        if self._targeted(join_key, left_filter_keys) or self._targeted(join_key, right_filter_keys):
+            servers = 1
+        else:
+            servers = num_servers
+        total_document_accessed = (
+            (left_collection.document_count + right_collection.document_count) * servers / num_servers
+        )
+
+        o1 = int(left_collection.document_count * left_filter_selectivity)
+        o2 = int(right_collection.document_count * right_filter_selectivity)
+        output_docs = int(o1 * o2 / (join_key_distinct_values or right_collection.document_count))
+
+        input_doc_size_1 = self.calculate_join_input_size(left_collection, join_key, left_output_keys, left_filter_keys)
+        output_doc_size_1 = self.calculate_join_output_size(left_collection, left_output_keys)
+        input_doc_size_2 = self.calculate_join_input_size(right_collection, join_key, right_output_keys, right_filter_keys)
+        output_doc_size_2 = self.calculate_join_output_size(right_collection, right_output_keys)
+
+        # One request per shard describing both sides; no traffic between shards
+        c1_volume = servers * (input_doc_size_1 + input_doc_size_2)
+        result_volume = output_docs * (output_doc_size_1 + output_doc_size_2)
+
+        cost = self.cost_model.calculate_co_located_join_cost(
+            total_document_accessed=total_document_accessed,
+            c1=c1_volume,
+            c_result=result_volume,
+            num_servers_involved=servers
+        )
+
+        # Storage: each shard reads its share of both sides (through an index
+        # on the filter keys if the catalog has one, otherwise a scan)
+        accessed_left = left_collection.document_count * servers / num_servers
+        accessed_right = right_collection.document_count * servers / num_servers
+        storage_left, pages_read1, cache_hit_ratio1, index1 = self.filter_operator.calculate_read_cost(
+            left_collection, left_filter_keys, accessed_left, min(o1, accessed_left), servers,
+            array_sizes=array_sizes)
+        storage_right, pages_read2, cache_hit_ratio2, index2 = self.filter_operator.calculate_read_cost(
+            right_collection, right_filter_keys, accessed_right, min(o2, accessed_right), servers,
+            array_sizes=array_sizes)
+        storage_cost = storage_left + storage_right
+
+        return DistributedJoinResult(
+            output_size_bytes1=output_doc_size_1,
+            input_size_bytes1=input_doc_size_1,
+            output_size_bytes2=output_doc_size_2,
+            input_size_bytes2=input_doc_size_2,
+            cost=cost + storage_cost,
+            left_sharding_key=join_key,
+            right_sharding_key=join_key,
+            join_key=join_key,
+            num_loops=1,
+            s1=servers,
+            o1=o1,
+            s2=servers,
+            o2=o2,
+            c1_volume_bytes=c1_volume,
+            c2_volume_bytes=0,
+            num_messages=servers,
+            join_strategy="co_located",
+            output_docs=output_docs,
+            result_volume_bytes=result_volume,
+            storage_cost=storage_cost,
+            pages_read1=pages_read1,
+            pages_read2=pages_read2,
+            cache_hit_ratio1=cache_hit_ratio1,
+            cache_hit_ratio2=cache_hit_ratio2,
+            index_name1=index1.name if index1 else None,
+            index_name2=index2.name if index2 else None,
+        )
+
+
+class BroadcastJoinOperator(_ShardJoinOperator):
+    """
+    Join where the small side is gathered once and broadcast to the servers
+    holding the large side, which join locally.
+    """
+
+    def __init__(self, statistics: Statistics, profile: Optional[ClusterProfile] = None):
+        super().__init__(statistics, profile)
+        self.join_operator = NestedLoopJoinOperator(statistics, self.profile)
+
+    def broadcast_join(
+        self,
+        left_collection: Collection,
+        right_collection: Collection,
+        join_key: str,
+        left_output_keys: Optional[List[str]],
+        right_output_keys: Optional[List[str]],
+        sharding_strategy: Dict[str, str],
+        left_filter_keys: Optional[List[str]] = None,
+        right_filter_keys: Optional[List[str]] = None,
+        left_filter_selectivity: float = 1.0,
+        right_filter_selectivity: float = 1.0,
+        join_key_distinct_values: Optional[int] = None,
+        broadcast_side: Optional[str] = None,
+        array_sizes: Optional[Dict[str, int]] = None
+    ) -> DistributedJoinResult:
+        """
+        Execute a broadcast join
+
+        Args:
+            left_collection, right_collection: Collections to join
+            join_key: Key to join on
+            left_output_keys, right_output_keys: Keys to include in output (None: no keys)
+            sharding_strategy: Dict mapping collection names to sharding keys
+            left_filter_keys, right_filter_keys: Filter keys (if any)
+            left_filter_selectivity, right_filter_selectivity: Fraction of
+                documents passing each filter
+            join_key_distinct_values: Distinct join key values on the right side
+                (default: right document count, i.e. a unique key)
+            broadcast_side: 'left' or 'right'; defaults to the smaller filtered side
+            array_sizes: Average sizes for arrays
+
+        Returns:
+            DistributedJoinResult with output metrics and costs
+        """
+        num_servers = self.statistics.num_servers
+        left_sharding_key = sharding_strategy.get(left_collection.name)
+        right_sharding_key = sharding_strategy.get(right_collection.name)
+        left_output_keys = list(left_output_keys or [])
+        right_output_keys = list(right_output_keys or [])
+
+        o1 = int(left_collection.document_count * left_filter_selectivity)
+        o2 = int(right_collection.document_count * right_filter_selectivity)
+        output_docs = int(o1 * o2 / (join_key_distinct_values or right_collection.document_count))
+
+        input_doc_size_1 = self.calculate_join_input_size(left_collection, join_key, left_output_keys, left_filter_keys)
+        output_doc_size_1 = self.calculate_join_output_size(left_collection, left_output_keys)
+        input_doc_size_2 = self.calculate_join_input_size(right_collection, join_key, right_output_keys, right_filter_keys)
+        output_doc_size_2 = self.calculate_join_output_size(right_collection, right_output_keys)
+
+        if broadcast_side is None:
+            broadcast_side = "left" if o1 * output_doc_size_1 <= o2 * output_doc_size_2 else "right"
+        if broadcast_side not in ("left", "right"):
+            raise ValueError(f"broadcast_side must be 'left' or 'right', got {broadcast_side!r}")
+
+        if broadcast_side == "left":
+            small, large = left_collection, right_collection
+            small_key, large_key = left_sharding_key, right_sharding_key
+            small_filters, large_filters = left_filter_keys, right_filter_keys
+            o_small, input_small, output_small = o1, input_doc_size_1, output_doc_size_1
+            input_large = input_doc_size_2
+        else:
+            small, large = right_collection, left_collection
+            small_key, large_key = right_sharding_key, left_sharding_key
+            small_filters, large_filters = right_filter_keys, left_filter_keys
+            o_small, input_small, output_small = o2, input_doc_size_2, output_doc_size_2
+            input_large = input_doc_size_1
+
+        # Gather the small side at the coordinator
+        s_small = 1 if self._targeted(small_key, small_filters) else num_servers
+        accessed_small = small.document_count * s_small / num_servers
+        c_gather = s_small * input_small + o_small * output_small
+
+        # Send it to the servers holding the large side: one server if the large
+        # side is filtered on its sharding key, only the shards holding the
+        # broadcast keys if it is sharded on the join key, otherwise all servers
+        if self._targeted(large_key, large_filters):
+            s_large = 1
+        elif large_key == join_key:
+            s_large = math.ceil(round(self.join_operator.expected_shards_per_batch(
+                max(o_small, 1), large.document_count), 9))
+        else:
+            s_large = num_servers
+        accessed_large = large.document_count * s_large / num_servers
+        broadcast_bytes = o_small * output_small
+        c_broadcast = s_large * (input_large + broadcast_bytes)
+
+        result_volume = output_docs * (output_doc_size_1 + output_doc_size_2)
+
+        cost = self.cost_model.calculate_broadcast_join_cost(
+            total_document_accessed_small=accessed_small,
+            total_document_accessed_large=accessed_large,
+            c_gather=c_gather,
+            c_broadcast=c_broadcast,
+            c_result=result_volume,
+            num_servers_small=s_small,
+            num_servers_large=s_large
+        )
+
+        # Storage: each side is read once on the servers it is read from
+        # (through an index on its filter keys if the catalog has one)
+        o_large = o2 if broadcast_side == "left" else o1
+        storage_small, pages_small, cache_hit_small, index_small = self.filter_operator.calculate_read_cost(
+            small, small_filters, accessed_small, min(o_small, accessed_small), s_small,
+            array_sizes=array_sizes)
+        storage_large, pages_large, cache_hit_large, index_large = self.filter_operator.calculate_read_cost(
+            large, large_filters, accessed_large, min(o_large, accessed_large), s_large,
+            array_sizes=array_sizes)
+        storage_cost = storage_small + storage_large
+
+        if broadcast_side == "left":
+            s1, s2, c1_volume, c2_volume = s_small, s_large, c_gather, c_broadcast
+            pages_read1, pages_read2 = pages_small, pages_large
+            cache_hit_ratio1, cache_hit_ratio2 = cache_hit_small, cache_hit_large
+            index1, index2 = index_small, index_large
+        else:
+            s1, s2, c1_volume, c2_volume = s_large, s_small, c_broadcast, c_gather
+            pages_read1, pages_read2 = pages_large, pages_small
+            cache_hit_ratio1, cache_hit_ratio2 = cache_hit_large, cache_hit_small
+            index1, index2 = index_large, index_small
+
+        return DistributedJoinResult(
+            output_size_bytes1=output_doc_size_1,
+            input_size_bytes1=input_doc_size_1,
+            output_size_bytes2=output_doc_size_2,
+            input_size_bytes2=input_doc_size_2,
+            cost=cost + storage_cost,
+            left_sharding_key=left_sharding_key,
+            right_sharding_key=right_sharding_key,
+            join_key=join_key,
+            num_loops=1,
+            s1=s1,
+            o1=o1,
+            s2=s2,
+            o2=o2,
+            c1_volume_bytes=c1_volume,
+            c2_volume_bytes=c2_volume,
+            num_messages=s_small + s_large,
+            join_strategy="broadcast",
+            broadcast_side=broadcast_side,
+            broadcast_bytes=broadcast_bytes,
+            output_docs=output_docs,
+            result_volume_bytes=result_volume,
+            storage_cost=storage_cost,
+            pages_read1=pages_read1,
+            pages_read2=pages_read2,
+            cache_hit_ratio1=cache_hit_ratio1,
+            cache_hit_ratio2=cache_hit_ratio2,
+            index_name1=index1.name if index1 else None,
+            index_name2=index2.name if index2 else None,
+        )
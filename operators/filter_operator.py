@@ -3,11 +3,12 @@ Filter operator for query execution
 Supports filtering with and without sharding
 """
 
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Tuple, Iterable
 from dataclasses import dataclass
-from models.schema import Collection, Schema, Field
+from models.schema import Collection, Index
 from models.statistics import Statistics
 from calculators.size_calculator import SizeCalculator
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
 from .cost_model import CostModel, QueryCost
 
 
@@ -26,7 +27,11 @@ class FilterResult:
     c1_volume_bytes: int = 0  # C1 = #S1 * size(S1) + #O1 * size(O1)
     num_servers_accessed: int = 1  # Number of servers accessed
     sharding_key: Optional[str] = None
-    index_used: bool = False
+    index_used: bool = False  # Matching documents looked up through an index (catalog or assumed)
+    storage_cost: Optional[QueryCost] = None  # Pages read from disk (included in cost)
+    pages_read: int = 0  # Pages read by each server
+    cache_hit_ratio: float = 1.0  # Fraction of the pages found in the buffer cache
+    index_name: Optional[str] = None  # Catalog index of the lookups (None: scan or undeclared index)
     
     
 
@@ -36,15 +41,18 @@ class FilterOperator:
     Filter operator for executing filter queries on collections
     """
 
-    def __init__(self, statistics: Statistics):
+    def __init__(self, statistics: Statistics, profile: Optional[ClusterProfile] = None):
         """
         Initialize the filter operator
 
         Args:
             statistics: Database statistics
+            profile: Cluster hardware profile (default: DEFAULT_PROFILE)
         """
-        self.statistics = statistics
-        self.size_calculator = SizeCalculator(statistics)
+        self.profile = profile or DEFAULT_PROFILE
+        self.statistics = self.profile.apply_to(statistics)
+        self.size_calculator = SizeCalculator(self.statistics)
+        self.cost_model = CostModel.for_profile(self.profile)
 
     def calculate_output_size(
         self,
@@ -63,16 +71,8 @@ class FilterOperator:
         Returns:
             Size in bytes of output document
         """
-        # Create a schema with only the output keys
-        output_schema = Schema(name=f"{collection.schema.name}_output")
-
-        for key in output_keys:
-            field = collection.schema.get_field(key)
-            if field:
-                output_schema.add_field(field)
-
-        # Calculate size
-        return self.size_calculator.calculate_document_size(output_schema, {})
+        # Size of a projection on the output keys (cached)
+        return self.size_calculator.calculate_projection_size(collection.schema, output_keys)
     
     def calculate_input_size(
         self,
@@ -93,21 +93,124 @@ class FilterOperator:
         Returns:
             Size in bytes of input document
         """
-        # Create a schema with only the output keys
-        input_schema = Schema(name=f"{collection.schema.name}_input")
-
-        for key in output_keys:
-            field = collection.schema.get_field(key)
-            if field:
-                input_schema.add_field(field)
-        
-        for key in filter_keys:
-            field = collection.schema.get_field(key)
-            if field:
-                input_schema.add_field(field)
-
-        # Calculate size
-        return self.size_calculator.calculate_document_size(input_schema, {})
+        # Size of a projection on the output and filter keys (cached)
+        input_keys = list(output_keys) + list(filter_keys)
+        return self.size_calculator.calculate_projection_size(collection.schema, input_keys)
+
+    def calculate_storage_cost(
+        self,
+        collection: Collection,
+        documents_read: float,
+        num_servers_involved: int,
+        random_access: bool = False,
+        array_sizes: Optional[Dict[str, int]] = None,
+        index: Optional[Index] = None
+    ) -> Tuple[QueryCost, int, float]:
+        """
+        Calculate the cost of reading documents of a collection from storage
+
+        Args:
+            collection: Collection read
+            documents_read: Documents read, over all the servers involved
+            num_servers_involved: Servers reading in parallel
+            random_access: True for index lookups, False for a scan
+            array_sizes: Average sizes for arrays; arrays missing from it take
+                the statistics defaults (Statistics.default_array_sizes), so
+                embedded arrays are never counted as a single element
+            index: Catalog index of the lookups (its depth and size are
+                estimated); None for a scan or an index of unknown shape
+
+        Returns:
+            Tuple of (QueryCost object, pages read per server, cache hit ratio)
+        """
+        array_sizes = {**self.statistics.default_array_sizes(), **(array_sizes or {})}
+        index_depth, index_size_bytes = 0, 0
+        if index is not None:
+            index_size = self.size_calculator.calculate_index_size(
+                collection, index, array_sizes, self.profile.page_size_bytes)
+            index_depth, index_size_bytes = index_size.depth, index_size.size_bytes
+        return self.cost_model.calculate_storage_cost(
+            collection_documents=collection.document_count,
+            doc_size_bytes=self.size_calculator.calculate_document_size(collection.schema, array_sizes),
+            documents_read=documents_read,
+            num_servers_involved=num_servers_involved,
+            num_servers_total=self.statistics.num_servers,
+            random_access=random_access,
+            index_depth=index_depth,
+            index_size_bytes=index_size_bytes
+        )
+
+    def select_index(
+        self,
+        collection: Collection,
+        lookup_keys: Optional[Iterable[str]],
+        assume_index: bool = False
+    ) -> Tuple[bool, Optional[Index]]:
+        """
+        Choose how the documents matching equality predicates are read
+
+        The catalog index serving `lookup_keys` is used if there is one. A
+        collection without an index catalog is assumed to have an index (of
+        unknown depth) on the lookup keys if `assume_index`.
+
+        Args:
+            collection: Collection read
+            lookup_keys: Keys of the equality predicates (filter or join keys)
+            assume_index: Whether an index exists on `lookup_keys` when the
+                collection declares no index catalog
+
+        Returns:
+            Tuple of (whether the documents are looked up through an index,
+            catalog index used or None)
+        """
+        lookup_keys = list(lookup_keys or [])
+        if collection.indexes:
+            index = collection.find_index(lookup_keys)
+            return index is not None, index
+        return assume_index and bool(lookup_keys), None
+
+    def calculate_read_cost(
+        self,
+        collection: Collection,
+        lookup_keys: Optional[Iterable[str]],
+        documents_accessed: float,
+        documents_matched: float,
+        num_servers_involved: int,
+        assume_index: bool = False,
+        array_sizes: Optional[Dict[str, int]] = None
+    ) -> Tuple[QueryCost, int, float, Optional[Index]]:
+        """
+        Calculate the cost of reading the documents an operator needs
+
+        The documents matching equality predicates on `lookup_keys` are
+        looked up through the index chosen by `select_index`; without one,
+        every document accessed is scanned.
+
+        Args:
+            collection: Collection read
+            lookup_keys: Keys of the equality predicates (filter or join keys)
+            documents_accessed: Documents scanned without an index
+            documents_matched: Documents looked up with an index
+            num_servers_involved: Servers reading in parallel
+            assume_index: Whether an index exists on `lookup_keys` when the
+                collection declares no index catalog
+            array_sizes: Average sizes for arrays (missing arrays take the
+                statistics defaults, see calculate_storage_cost)
+
+        Returns:
+            Tuple of (QueryCost object, pages read per server, cache hit
+            ratio, catalog index used or None)
+        """
+        indexed, index = self.select_index(collection, lookup_keys, assume_index)
+        cost, pages_read, cache_hit_ratio = self.calculate_storage_cost(
+            collection,
+            documents_read=documents_matched if indexed else documents_accessed,
+            num_servers_involved=num_servers_involved,
+            random_access=indexed,
+            array_sizes=array_sizes,
+            index=index
+        )
+        return cost, pages_read, cache_hit_ratio, index
 
     def filter(
         self,
@@ -128,7 +231,8 @@ class FilterOperator:
             output_keys: Keys to include in output
             sharding_key: Sharding key for the collection
             selectivity: Filter selectivity (fraction of documents matching)
-            use_index: Whether an index exists on the filter key
+            use_index: Whether an index exists on the filter key, for a
+                collection without an index catalog (otherwise the catalog decides)
             array_sizes: Average sizes for arrays
 
         Returns:
@@ -158,7 +262,7 @@ class FilterOperator:
         c1_volume = s1 * input_doc_size + o1 * output_doc_size
 
         # Calculate cost
-        cost = CostModel.calculate_filter_cost(
+        cost = self.cost_model.calculate_filter_cost(
             total_document_accessed=total_document_accessed,
             doc_size_bytes=input_doc_size,
             c1 = c1_volume,
@@ -166,16 +270,31 @@ class FilterOperator:
             num_servers_involved=s1,
         )
 
-        
+        # Storage: index lookups of the matching documents, otherwise a scan
+        # of every document accessed
+        index_used, index = self.select_index(collection, filter_keys, assume_index=use_index)
+        storage_cost, pages_read, cache_hit_ratio = self.calculate_storage_cost(
+            collection,
+            documents_read=o1 if index_used else total_document_accessed,
+            num_servers_involved=s1,
+            random_access=index_used,
+            array_sizes=array_sizes,
+            index=index
+        )
+        cost = cost + storage_cost
 
         return FilterResult(
             output_size_bytes=output_doc_size,
             input_doc_size_bytes =input_doc_size,
             cost=cost,
             sharding_key=sharding_key,
-            index_used=use_index and (sharding_key in filter_keys), # First condition to return false if no sharding
+            index_used=index_used,
             s1=s1,
             o1=o1,
-            c1_volume_bytes=c1_volume
+            c1_volume_bytes=c1_volume,
+            storage_cost=storage_cost,
+            pages_read=pages_read,
+            cache_hit_ratio=cache_hit_ratio,
+            index_name=index.name if index else None
         )
 
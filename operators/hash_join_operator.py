@@ -0,0 +1,261 @@
+"""
+Hash join operator for query execution
+Builds a hash table on the smaller filtered side and streams the other side once
+"""
+
+import math
+from typing import List, Dict, Optional
+from dataclasses import dataclass
+from models.schema import Collection
+from models.statistics import Statistics
+from calculators.size_calculator import SizeCalculator
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
+from config.constants import HASH_TABLE_OVERHEAD
+from .cost_model import CostModel
+from .filter_operator import FilterOperator
+from .join_operator import JoinResult
+
+
+@dataclass
+class HashJoinResult(JoinResult):
+    """
+    Result of a hash join operation
+
+    Same fields as JoinResult, except that o1 / o2 are the total filtered
+    documents of each side and num_loops is 1 (each side is sent once).
+    """
+    build_side: str = "right"  # 'left' or 'right'
+    hash_table_bytes: int = 0  # In-memory size of the build side
+    memory_bytes: int = 0  # Memory available on the join servers
+    spill_bytes: int = 0  # Bytes written to disk (and read back) when the table does not fit
+    num_partitions: int = 1  # Grace hash join partitions (1 = fully in memory)
+
+
+class HashJoinOperator:
+    """
+    Hash join operator for executing join queries
+    """
+
+    def __init__(self, statistics: Statistics,
+                 memory_per_server_bytes: Optional[int] = None,
+                 num_join_servers: int = 1,
+                 profile: Optional[ClusterProfile] = None):
+        """
+        Initialize the hash join operator
+
+        Args:
+            statistics: Database statistics
+            memory_per_server_bytes: RAM available to the hash table on each join
+                server (default: the profile's RAM per server)
+            num_join_servers: Servers sharing the hash table (1 = the coordinator)
+            profile: Cluster hardware profile (default: DEFAULT_PROFILE)
+        """
+        self.profile = profile or DEFAULT_PROFILE
+        self.statistics = self.profile.apply_to(statistics)
+        self.size_calculator = SizeCalculator(self.statistics)
+        self.cost_model = CostModel.for_profile(self.profile)
+        self.memory_per_server_bytes = memory_per_server_bytes or self.profile.memory_per_server_bytes
+        self.num_join_servers = num_join_servers
+        self.filter_operator = FilterOperator(statistics, self.profile)
+
+    def calculate_join_input_size(
+        self,
+        collection: Collection,
+        join_key: str,
+        output_keys: List[str],
+        filter_keys: Optional[List[str]] = None
+    ) -> int:
+        """Size of a projection on the output, filter and join keys (cached)"""
+        input_keys = list(output_keys) + list(filter_keys or []) + [join_key]
+        return self.size_calculator.calculate_projection_size(collection.schema, input_keys)
+
+    def calculate_join_output_size(self, collection: Collection, output_keys: List[str]) -> int:
+        """Size of a projection on the output keys (cached)"""
+        return self.size_calculator.calculate_projection_size(collection.schema, output_keys)
+
+    def _servers_accessed(self, collection: Collection, sharding_key: Optional[str],
+                          filter_keys: Optional[List[str]]):
+        """Servers reached by one side and documents they access"""
+        if sharding_key and filter_keys and sharding_key in filter_keys:
+            return 1, collection.document_count / self.statistics.num_servers
+        return self.statistics.num_servers, collection.document_count
+
+    def hash_join(
+        self,
+        left_collection: Collection,
+        right_collection: Collection,
+        join_key: str,
+        left_output_keys: Optional[List[str]],
+        right_output_keys: Optional[List[str]],
+        left_sharding_key: Optional[str] = None,
+        right_sharding_key: Optional[str] = None,
+        left_filter_keys: Optional[List[str]] = None,
+        right_filter_keys: Optional[List[str]] = None,
+        left_filter_selectivity: float = 1.0,
+        right_filter_selectivity: float = 1.0,
+        build_side: Optional[str] = None,
+        array_sizes: Optional[Dict[str, int]] = None,
+        semi_join_fpr: Optional[float] = None,
+        join_key_distinct_values: Optional[int] = None,
+        use_index: bool = False
+    ) -> HashJoinResult:
+        """
+        Execute a hash join
+
+        Args:
+            left_collection: Left collection in join
+            right_collection: Right collection in join
+            join_key: Key to join on
+            left_output_keys, right_output_keys: Keys to include in output (None: no keys)
+            left_sharding_key, right_sharding_key: Sharding keys (if any)
+            left_filter_keys, right_filter_keys: Filter keys (if any)
+            left_filter_selectivity: Fraction of left documents passing the filter
+            right_filter_selectivity: Fraction of right documents passing the filter
+                (unlike nested_loop_join, not divided by the join key cardinality)
+            build_side: 'left' or 'right'; defaults to the smaller filtered side
+            array_sizes: Average sizes for arrays
+            semi_join_fpr: Bloom filter false-positive rate: if set, a Bloom
+                filter of the build keys is sent to the probe servers, which
+                only return the probe documents passing it
+            join_key_distinct_values: Distinct join key values, used to estimate
+                the probe documents with a match (default: the smaller
+                collection's document count)
+            use_index: Whether each side is read through an index on its
+                filter keys when the catalog declares none
+
+        Returns:
+            HashJoinResult with output metrics and costs
+        """
+        if semi_join_fpr is not None and not 0 < semi_join_fpr < 1:
+            raise ValueError(f"semi_join_fpr must be between 0 and 1, got {semi_join_fpr}")
+
+        left_output_keys = list(left_output_keys or [])
+        right_output_keys = list(right_output_keys or [])
+
+        s1, total_document_accessed_left = self._servers_accessed(
+            left_collection, left_sharding_key, left_filter_keys)
+        s2, total_document_accessed_right = self._servers_accessed(
+            right_collection, right_sharding_key, right_filter_keys)
+
+        # Documents of each side after filter
+        o1 = int(left_collection.document_count * left_filter_selectivity)
+        o2 = int(right_collection.document_count * right_filter_selectivity)
+
+        # Compute document size
+        input_doc_size_1 = self.calculate_join_input_size(left_collection, join_key, left_output_keys, left_filter_keys)
+        output_doc_size_1 = self.calculate_join_output_size(left_collection, left_output_keys)
+
+        input_doc_size_2 = self.calculate_join_input_size(right_collection, join_key, right_output_keys, right_filter_keys)
+        output_doc_size_2 = self.calculate_join_output_size(right_collection, right_output_keys)
+
+        # Each side is sent once (the join key travels with the documents)
+        c1_volume = s1 * input_doc_size_1 + o1 * output_doc_size_1
+        c2_volume = s2 * input_doc_size_2 + o2 * output_doc_size_2
+
+        if build_side is None:
+            build_side = "left" if o1 * output_doc_size_1 <= o2 * output_doc_size_2 else "right"
+        if build_side not in ("left", "right"):
+            raise ValueError(f"build_side must be 'left' or 'right', got {build_side!r}")
+
+        if build_side == "left":
+            build_bytes, probe_bytes = o1 * output_doc_size_1, o2 * output_doc_size_2
+        else:
+            build_bytes, probe_bytes = o2 * output_doc_size_2, o1 * output_doc_size_1
+
+        bloom_filter_bytes = 0
+        false_positive_docs = 0
+        if semi_join_fpr is not None:
+            # Only probe documents matching a build key (or false positives) are sent
+            o_build, o_probe = (o1, o2) if build_side == "left" else (o2, o1)
+            domain = join_key_distinct_values or min(left_collection.document_count,
+                                                     right_collection.document_count)
+            matches = int(o_probe * min(1, o_build / domain)) if domain else 0
+            false_positive_docs = int(semi_join_fpr * (o_probe - matches))
+            bloom_filter_bytes = CostModel.calculate_bloom_filter_size(o_build, semi_join_fpr)
+            o_probe = matches + false_positive_docs
+            if build_side == "left":
+                c2_volume = s2 * input_doc_size_2 + o_probe * output_doc_size_2
+                probe_bytes = o_probe * output_doc_size_2
+            else:
+                c1_volume = s1 * input_doc_size_1 + o_probe * output_doc_size_1
+                probe_bytes = o_probe * output_doc_size_1
+
+        # Grace hash join: partitions that do not fit are spilled with their probe documents
+        hash_table_bytes = int(build_bytes * HASH_TABLE_OVERHEAD)
+        memory_bytes = self.memory_per_server_bytes * self.num_join_servers
+        if hash_table_bytes > memory_bytes:
+            num_partitions = math.ceil(hash_table_bytes / memory_bytes)
+            spilled_fraction = 1 - memory_bytes / hash_table_bytes
+            spill_bytes = int(spilled_fraction * (build_bytes + probe_bytes))
+        else:
+            num_partitions = 1
+            spill_bytes = 0
+
+        if build_side == "left":
+            cost = self.cost_model.calculate_hash_join_cost(
+                total_document_accessed_build=total_document_accessed_left,
+                total_document_accessed_probe=total_document_accessed_right,
+                c_build=c1_volume,
+                c_probe=c2_volume,
+                spill_bytes=spill_bytes,
+                num_servers_build=s1,
+                num_servers_probe=s2,
+                num_join_servers=self.num_join_servers,
+                bloom_filter_bytes=bloom_filter_bytes
+            )
+        else:
+            cost = self.cost_model.calculate_hash_join_cost(
+                total_document_accessed_build=total_document_accessed_right,
+                total_document_accessed_probe=total_document_accessed_left,
+                c_build=c2_volume,
+                c_probe=c1_volume,
+                spill_bytes=spill_bytes,
+                num_servers_build=s2,
+                num_servers_probe=s1,
+                num_join_servers=self.num_join_servers,
+                bloom_filter_bytes=bloom_filter_bytes
+            )
+
+        # Storage: each side is read once (through an index on its filter keys
+        # if the catalog has one or `use_index`, otherwise scanned)
+        storage_left, pages_read1, cache_hit_ratio1, index1 = self.filter_operator.calculate_read_cost(
+            left_collection, left_filter_keys, total_document_accessed_left, o1, s1,
+            assume_index=use_index, array_sizes=array_sizes)
+        storage_right, pages_read2, cache_hit_ratio2, index2 = self.filter_operator.calculate_read_cost(
+            right_collection, right_filter_keys, total_document_accessed_right, o2, s2,
+            assume_index=use_index, array_sizes=array_sizes)
+        storage_cost = storage_left + storage_right
+
+        return HashJoinResult(
+            output_size_bytes1=output_doc_size_1,
+            input_size_bytes1=input_doc_size_1,
+            output_size_bytes2=output_doc_size_2,
+            input_size_bytes2=input_doc_size_2,
+            cost=cost + storage_cost,
+            left_sharding_key=left_sharding_key,
+            right_sharding_key=right_sharding_key,
+            join_key=join_key,
+            num_loops=1,
+            num_messages=s1 + s2,
+            s1=s1,
+            o1=o1,
+            s2=s2,
+            o2=o2,
+            c1_volume_bytes=c1_volume,
+            c2_volume_bytes=c2_volume,
+            build_side=build_side,
+            hash_table_bytes=hash_table_bytes,
+            memory_bytes=memory_bytes,
+            spill_bytes=spill_bytes,
+            num_partitions=num_partitions,
+            semi_join_fpr=semi_join_fpr,
+            bloom_filter_bytes=bloom_filter_bytes,
+            false_positive_docs=false_positive_docs,
+            storage_cost=storage_cost,
+            pages_read1=pages_read1,
+            pages_read2=pages_read2,
+            cache_hit_ratio1=cache_hit_ratio1,
+            cache_hit_ratio2=cache_hit_ratio2,
+            index_name1=index1.name if index1 else None,
+            index_name2=index2.name if index2 else None,
+        )
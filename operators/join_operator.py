@@ -3,13 +3,15 @@ Nested loop join operator for query execution
 Supports joins with and without sharding
 """
 
-from typing import List, Dict, Optional, Tuple
+import math
+from typing import List, Dict, Optional
 from dataclasses import dataclass
-from models.schema import Collection, Schema, Field
+from models.schema import Collection
 from models.statistics import Statistics
 from calculators.size_calculator import SizeCalculator
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
 from .cost_model import CostModel, QueryCost
-from .filter_operator import FilterOperator, FilterResult
+from .filter_operator import FilterOperator
 
 
 @dataclass
@@ -32,22 +34,40 @@ class JoinResult:
     c1_volume_bytes: int = 0  # C1 = #S1 * size(S1) + #O1 * size(O1)
     c2_volume_bytes: int = 0  # C2 = #S2 * size(S2) + #O2 * size(O2)
 
+    batch_size: int = 1  # Outer keys sent per $in request (num_loops counts batches)
+    shards_per_batch: float = 0  # Expected right shards targeted by one batch
+    num_messages: int = 0  # Requests sent: S1 + num_loops * S2
+
+    semi_join_fpr: Optional[float] = None  # Bloom filter false-positive rate (semi-join mode)
+    bloom_filter_bytes: int = 0  # Size of the Bloom filter sent to each right server
+    false_positive_docs: int = 0  # Non-matching right documents passing the Bloom filter
+    storage_cost: Optional[QueryCost] = None  # Pages read from disk (included in cost)
+    pages_read1: int = 0  # Pages read by each left server
+    pages_read2: int = 0  # Pages read by each right server (per loop)
+    cache_hit_ratio1: float = 1.0  # Fraction of the left pages found in the buffer cache
+    cache_hit_ratio2: float = 1.0  # Fraction of the right pages found in the buffer cache
+    index_name1: Optional[str] = None  # Catalog index of the left lookups (None: scan or undeclared index)
+    index_name2: Optional[str] = None  # Catalog index of the right lookups
+
 
 class NestedLoopJoinOperator:
     """
     Nested loop join operator for executing join queries
     """
 
-    def __init__(self, statistics: Statistics):
+    def __init__(self, statistics: Statistics, profile: Optional[ClusterProfile] = None):
         """
         Initialize the nested loop join operator
 
         Args:
             statistics: Database statistics
+            profile: Cluster hardware profile (default: DEFAULT_PROFILE)
         """
-        self.statistics = statistics
-        self.size_calculator = SizeCalculator(statistics)
-        self.filter_operator = FilterOperator(statistics)
+        self.profile = profile or DEFAULT_PROFILE
+        self.statistics = self.profile.apply_to(statistics)
+        self.size_calculator = SizeCalculator(self.statistics)
+        self.cost_model = CostModel.for_profile(self.profile)
+        self.filter_operator = FilterOperator(statistics, self.profile)
     
     def calculate_join_input_size(
         self,
@@ -68,26 +88,9 @@ class NestedLoopJoinOperator:
         Returns:
             Size in bytes of output document
         """
-        # Create a schema with only the output keys
-        output_schema = Schema(name=f"{collection.schema.name}_output")
-
-        for key in output_keys:
-            field = collection.schema.get_field(key)
-            if field:
-                output_schema.add_field(field)
-
-        if filter_keys :
-            for key in filter_keys:
-                field = collection.schema.get_field(key)
-                if field:
-                    output_schema.add_field(field)
-        
-        field = collection.schema.get_field(join_key)
-        if field:
-            output_schema.add_field(field)
-
-        # Calculate size
-        return self.size_calculator.calculate_document_size(output_schema, {})
+        # Size of a projection on the output, filter and join keys (cached)
+        input_keys = list(output_keys) + list(filter_keys or []) + [join_key]
+        return self.size_calculator.calculate_projection_size(collection.schema, input_keys)
     
     def calculate_join_output_size(
         self,
@@ -106,16 +109,29 @@ class NestedLoopJoinOperator:
         Returns:
             Size in bytes of output document
         """
-        # Create a schema with only the output keys
-        output_schema = Schema(name=f"{collection.schema.name}_output")
+        # Size of a projection on the output keys (cached)
+        return self.size_calculator.calculate_projection_size(collection.schema, output_keys)
 
-        for key in output_keys:
-            field = collection.schema.get_field(key)
-            if field:
-                output_schema.add_field(field)
+    def expected_shards_per_batch(self, batch_size: int, distinct_keys: Optional[int] = None) -> float:
+        """
+        Expected number of distinct shards holding `batch_size` random join
+        keys when the right collection is sharded on the join key
+        (balls into bins: N * (1 - (1 - 1/N)^B))
 
-        # Calculate size
-        return self.size_calculator.calculate_document_size(output_schema, {})
+        Args:
+            batch_size: Number of keys in one $in request
+            distinct_keys: Number of distinct join key values (caps the shards holding data)
+
+        Returns:
+            Expected number of shards targeted by one batch
+        """
+        num_servers = self.statistics.num_servers
+        if batch_size <= 1:
+            return 1
+        expected = num_servers * (1 - (1 - 1 / num_servers) ** batch_size)
+        if distinct_keys:
+            expected = min(expected, distinct_keys)
+        return min(expected, batch_size, num_servers)
 
     def nested_loop_join(
         self,
@@ -130,7 +146,10 @@ class NestedLoopJoinOperator:
         right_filter_keys: Optional[List[str]] = None,
         left_filter_selectivity: Optional[float] = None,
         right_filter_selectivity: Optional[float] = None,
-        array_sizes: Optional[Dict[str, int]] = None
+        array_sizes: Optional[Dict[str, int]] = None,
+        batch_size: Optional[int] = None,
+        semi_join_fpr: Optional[float] = None,
+        use_index: bool = True
     ) -> JoinResult:
         """
         Execute a nested loop join with optional sharding optimization
@@ -145,10 +164,26 @@ class NestedLoopJoinOperator:
             left_filter_key: Filter keys on left collection (if any)
             left_filter_selectivity: Filter selectivity on left collection
             array_sizes: Average sizes for arrays
+            batch_size: Outer join keys sent per right request ($in batching).
+                None or 1 sends one request per outer document
+            semi_join_fpr: Bloom filter false-positive rate for a semi-join:
+                a Bloom filter of the outer join keys is sent once to the right
+                servers, which return their matching documents in one transfer
+            use_index: Whether the right collection has an index on the join
+                key, for a collection without an index catalog (otherwise
+                the catalog decides)
 
         Returns:
             JoinResult with output metrics and costs
         """
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        if semi_join_fpr is not None:
+            if not 0 < semi_join_fpr < 1:
+                raise ValueError(f"semi_join_fpr must be between 0 and 1, got {semi_join_fpr}")
+            if batch_size not in (None, 1):
+                raise ValueError("batch_size and semi_join_fpr cannot be combined")
+
         # Determine if sharding is used
         use_sharding = bool(left_sharding_key and right_sharding_key)
 
@@ -160,17 +195,34 @@ class NestedLoopJoinOperator:
             s1 = self.statistics.num_servers
             total_document_accessed_left = left_collection.document_count
         
+        # Compute effective left documents after filter
+        o1 = int(left_collection.document_count * left_filter_selectivity)
+
+        # Outer keys per right request (the last batch may be partial);
+        # a semi-join sends every outer key at once
+        if semi_join_fpr is not None:
+            batch_size = max(o1, 1)
+        else:
+            batch_size = max(min(batch_size or 1, o1), 1)
+
         #compute to how much server the left part of the join is sent
-        if use_sharding and ((right_filter_keys and right_sharding_key in right_filter_keys) or right_sharding_key == join_key): 
+        if use_sharding and right_filter_keys and right_sharding_key in right_filter_keys:
+            routed = True
+            shards_per_batch = 1
             s2 = 1
             total_document_accessed_right = right_collection.document_count/self.statistics.num_servers
+        elif use_sharding and right_sharding_key == join_key:
+            # Each key of a batch is routed to the shard holding it
+            routed = True
+            shards_per_batch = self.expected_shards_per_batch(batch_size, right_collection.document_count)
+            s2 = math.ceil(round(shards_per_batch, 9))
+            total_document_accessed_right = right_collection.document_count * s2 / self.statistics.num_servers
         else:
+            routed = False
+            shards_per_batch = self.statistics.num_servers
             s2 = self.statistics.num_servers
             total_document_accessed_right = right_collection.document_count
 
-        # Compute effective left documents after filter
-        o1 = int(left_collection.document_count * left_filter_selectivity)
-
         # Compute effective right left documents
         o2 = int(right_collection.document_count * right_filter_selectivity)
         
@@ -188,20 +240,70 @@ class NestedLoopJoinOperator:
 
         num_loops = o1
 
+        bloom_filter_bytes = 0
+        false_positive_docs = 0
+
+        if semi_join_fpr is not None:
+            # The right servers test their documents against the Bloom filter
+            # and return the matches, plus false positives, in a single transfer
+            bloom_filter_bytes = CostModel.calculate_bloom_filter_size(o1, semi_join_fpr)
+            matches = o1 * o2
+            false_positive_docs = int(semi_join_fpr * max(total_document_accessed_right - matches, 0))
+            c2_volume = s2 * input_doc_size_2 + (matches + false_positive_docs) * output_doc_size_2
+            num_loops = 1
+        elif batch_size > 1:
+            # One request per batch: each targeted shard receives the request
+            # with its share of the $in keys, and answers for every key of the batch
+            key_size = self.size_calculator.calculate_projection_size(right_collection.schema, [join_key])
+            if routed:
+                extra_keys = batch_size - s2  # the keys are split between the targeted shards
+            else:
+                extra_keys = s2 * (batch_size - 1)  # broadcast: every shard gets the whole list
+            c2_volume = s2 * input_doc_size_2 + extra_keys * key_size + batch_size * o2 * output_doc_size_2
+            num_loops = math.ceil(o1 / batch_size)
+
         #Compute cost
 
-        cost = CostModel.calculate_nested_loop_join_cost(
-            total_document_accessed_left=total_document_accessed_left,
-            total_document_accessed_right=total_document_accessed_right,
-            doc_size_bytes_left=input_doc_size_1,
-            doc_size_bytes_right=input_doc_size_2,
-            c1=c1_volume,
-            c2=c2_volume,
-            num_loops=num_loops,
-            use_index=False,
-            num_servers_s1=s1,
-            num_servers_s2=s2
-        )
+        if semi_join_fpr is not None:
+            cost = self.cost_model.calculate_semi_join_cost(
+                total_document_accessed_left=total_document_accessed_left,
+                total_document_accessed_right=total_document_accessed_right,
+                c1=c1_volume,
+                bloom_filter_bytes=bloom_filter_bytes,
+                c2=c2_volume,
+                num_servers_s1=s1,
+                num_servers_s2=s2
+            )
+        else:
+            cost = self.cost_model.calculate_nested_loop_join_cost(
+                total_document_accessed_left=total_document_accessed_left,
+                total_document_accessed_right=total_document_accessed_right,
+                doc_size_bytes_left=input_doc_size_1,
+                doc_size_bytes_right=input_doc_size_2,
+                c1=c1_volume,
+                c2=c2_volume,
+                num_loops=num_loops,
+                use_index=False,
+                num_servers_s1=s1,
+                num_servers_s2=s2
+            )
+
+        # Storage: the left side is read once (through an index on its filter
+        # keys if the catalog has one); every loop looks its right documents
+        # up through the join key index (a semi-join scans the right side
+        # once instead)
+        storage_left, pages_read1, cache_hit_ratio1, index1 = self.filter_operator.calculate_read_cost(
+            left_collection, left_filter_keys, total_document_accessed_left, o1, s1, array_sizes=array_sizes)
+        if semi_join_fpr is not None:
+            index2 = None
+            storage_right, pages_read2, cache_hit_ratio2 = self.filter_operator.calculate_storage_cost(
+                right_collection, total_document_accessed_right, s2, array_sizes=array_sizes)
+        else:
+            storage_right, pages_read2, cache_hit_ratio2, index2 = self.filter_operator.calculate_read_cost(
+                right_collection, [join_key] + list(right_filter_keys or []), total_document_accessed_right,
+                batch_size * o2, s2, assume_index=use_index, array_sizes=array_sizes)
+        storage_cost = storage_left + storage_right.scale(num_loops)
+        cost = cost + storage_cost
 
         return JoinResult(
             output_size_bytes1=output_doc_size_1,
@@ -219,4 +321,17 @@ class NestedLoopJoinOperator:
             o2=o2,  
             c1_volume_bytes=c1_volume,
             c2_volume_bytes=c2_volume,
+            batch_size=batch_size,
+            shards_per_batch=shards_per_batch,
+            num_messages=s1 + num_loops * s2,
+            semi_join_fpr=semi_join_fpr,
+            bloom_filter_bytes=bloom_filter_bytes,
+            false_positive_docs=false_positive_docs,
+            storage_cost=storage_cost,
+            pages_read1=pages_read1,
+            pages_read2=pages_read2,
+            cache_hit_ratio1=cache_hit_ratio1,
+            cache_hit_ratio2=cache_hit_ratio2,
+            index_name1=index1.name if index1 else None,
+            index_name2=index2.name if index2 else None,
         )
\ No newline at end of file
@@ -0,0 +1,336 @@
+"""
+Materialized views for pre-aggregated queries
+Declares GROUP BY results as extra collections of a Database, rewrites the
+aggregate queries they answer and prices their maintenance per source insert
+"""
+
+import os
+import re
+from typing import Dict, List, Any, Optional, Tuple, Union, Iterable
+from dataclasses import dataclass, replace
+from models.schema import Database, MaterializedView, Schema, Field
+from models.statistics import Statistics
+from calculators.size_calculator import SizeCalculator
+from .cost_model import QueryCost
+from .query_spec import (
+    QuerySpec, CompiledQuery, SelectivityEstimator, CORRELATED_DISTINCT_STATS, compile_query, load_query_specs
+)
+from .workload import WorkloadEntry, WorkloadResult
+
+# Plans of the hand-written query ids (execute_q1 ... execute_q8)
+_TD2_QUERIES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "queries", "td2.json")
+_AGGREGATE_PATTERN = re.compile(r"\s*(SUM|COUNT|AVG|MIN|MAX)\s*\(\s*([\w.]+|\*)\s*\)\s*", re.IGNORECASE)
+
+
+def _normalize_aggregate(expression: str) -> str:
+    """'sum( quantity )' -> 'SUM(quantity)'"""
+    match = _AGGREGATE_PATTERN.fullmatch(expression)
+    if not match:
+        raise ValueError(f"Invalid aggregate {expression!r}, expected e.g. 'SUM(quantity)'")
+    return f"{match.group(1).upper()}({match.group(2)})"
+
+
+def define_materialized_view(
+    database: Database,
+    statistics: Statistics,
+    name: str,
+    source: str,
+    group_by_keys: Iterable[str],
+    aggregates: Dict[str, str],
+    sharding_key: Optional[str] = None,
+    document_count: Optional[int] = None
+) -> MaterializedView:
+    """
+    Declare a materialized view and add it to the database
+
+    Example:
+        define_materialized_view(db, stats, "ProductSales", "OrderLine",
+                                 ["IDP"], {"NB": "SUM(quantity)"}, sharding_key="IDP")
+
+    Args:
+        database: Database holding the source collection
+        statistics: Database statistics
+        name: View (collection) name
+        source: Source collection name
+        group_by_keys: GROUP BY keys of the view
+        aggregates: Output key -> aggregate of a source key, e.g. {"NB": "SUM(quantity)"}
+        sharding_key: Sharding key of the view (if any)
+        document_count: Number of groups (default: estimated from the statistics)
+
+    Returns:
+        The MaterializedView added to the database
+    """
+    source_collection = database.get_collection(source)
+    if not source_collection:
+        raise ValueError(f"{source} collection not found")
+    group_by_keys = tuple(group_by_keys)
+
+    fields: List[Field] = []
+    for key in group_by_keys:
+        source_field = source_collection.schema.get_field(key)
+        if source_field is None:
+            raise ValueError(f"{source} has no key {key!r}")
+        fields.append(Field(name=key, field_type=source_field.field_type))
+
+    normalized = {}
+    for key, expression in aggregates.items():
+        normalized[key] = _normalize_aggregate(expression)
+        function, argument = normalized[key][:-1].split("(")
+        source_field = source_collection.schema.get_field(argument)
+        if function == "COUNT":
+            field_type = "integer"
+        elif function in ("SUM", "MIN", "MAX") and source_field is not None:
+            field_type = source_field.field_type
+        else:
+            field_type = "number"
+        fields.append(Field(name=key, field_type=field_type))
+
+    if document_count is None:
+        # One document per group; a key correlated with another GROUP BY key
+        # only contributes its values per value of that key
+        estimator = SelectivityEstimator(statistics)
+        document_count = 1
+        for key in group_by_keys:
+            correlated = [
+                getattr(statistics, CORRELATED_DISTINCT_STATS[(other, key)])
+                for other in group_by_keys if (other, key) in CORRELATED_DISTINCT_STATS
+            ]
+            document_count *= min(correlated) if correlated else estimator.distinct_values(source_collection, key)
+        document_count = min(document_count, source_collection.document_count)
+
+    view = MaterializedView(
+        name=name,
+        schema=Schema(name=name, fields=fields),
+        document_count=document_count,
+        sharding_key=sharding_key,
+        source_collection=source,
+        group_by_keys=group_by_keys,
+        aggregates=normalized
+    )
+    database.add_collection(view)
+    return view
+
+
+@dataclass
+class ViewPlan:
+    """Plan chosen for a query: the cheapest of the original plan and its view rewrites"""
+    view: Optional[str]  # Materialized view read, None for the original plan
+    compiled: Optional[CompiledQuery]  # None for a hand-written query run by id
+    result: Any  # FilterResult, JoinResult or AggregateResult
+
+
+@dataclass
+class ViewWorkloadComparison:
+    """Workload cost without views versus with views and their maintenance"""
+    without_views: WorkloadResult
+    with_views: WorkloadResult
+    maintenance_cost_per_insert: QueryCost  # Every view of the source collection
+    inserts_per_s: float
+
+    @property
+    def maintenance_cost_per_s(self) -> QueryCost:
+        """View maintenance cost per second at the insert rate"""
+        return self.maintenance_cost_per_insert.scale(self.inserts_per_s)
+
+    @property
+    def total_cost_per_s(self) -> QueryCost:
+        """Reads with views plus view maintenance, per second"""
+        return self.with_views.total_cost_per_s + self.maintenance_cost_per_s
+
+    @property
+    def saved_time_ms_per_s(self) -> float:
+        """Time saved per second of workload (negative if the views do not pay off)"""
+        return self.without_views.total_cost_per_s.time_ms - self.total_cost_per_s.time_ms
+
+    def __str__(self) -> str:
+        """String representation of the comparison"""
+        return (
+            f"Without views: {self.without_views.total_cost_per_s.time_ms:,.3f} ms/s\n"
+            f"With views:    {self.with_views.total_cost_per_s.time_ms:,.3f} ms/s reads"
+            f" + {self.maintenance_cost_per_s.time_ms:,.3f} ms/s maintenance"
+            f" ({self.inserts_per_s:,.2f} inserts/s)"
+            f" = {self.total_cost_per_s.time_ms:,.3f} ms/s\n"
+            f"Saved:         {self.saved_time_ms_per_s:,.3f} ms/s"
+        )
+
+
+class MaterializedViewPlanner:
+    """
+    Rewrites aggregate queries onto the materialized views of the database
+
+    A view answers a grouped sub-query when it aggregates the same source
+    collection, its GROUP BY keys are the query's GROUP BY key plus keys
+    fixed by equality predicates, and it holds every selected aggregate.
+    """
+
+    def __init__(self, executor, query_specs: Optional[Dict[str, CompiledQuery]] = None):
+        """
+        Args:
+            executor: QueryExecutor providing the database, statistics and operators
+            query_specs: Compiled plans of the query ids, on top of those of
+                queries/td2.json (a query id needs a plan to be rewritten)
+        """
+        self.executor = executor
+        self.database = executor.database
+        self.statistics = executor.statistics
+        self.size_calculator = SizeCalculator(executor.statistics)
+        self.query_specs = load_query_specs(_TD2_QUERIES)
+        self.query_specs.update(query_specs or {})
+
+    def rewrite(self, compiled: CompiledQuery) -> List[Tuple[MaterializedView, CompiledQuery]]:
+        """
+        Rewrite an aggregate plan onto every view able to answer it
+
+        Args:
+            compiled: Compiled query
+
+        Returns:
+            List of (view, rewritten plan); empty if no view applies
+        """
+        if compiled.kind != "aggregate" or compiled.group_by_key is None:
+            return []
+        inner = next(
+            table.subquery for table in (compiled.spec.source,) + tuple(j.table for j in compiled.spec.joins)
+            if table.subquery is not None
+        )
+        if any(predicate.op != "=" for predicate in compiled.right_predicates):
+            return []
+        fixed_keys = {predicate.column.name for predicate in compiled.right_predicates}
+
+        rewrites = []
+        for view in self.database.views.values():
+            group_by_keys = set(view.group_by_keys)
+            if (view.source_collection != compiled.right_collection
+                    or compiled.group_by_key not in group_by_keys
+                    or not fixed_keys <= group_by_keys
+                    or group_by_keys - fixed_keys - {compiled.group_by_key}):
+                continue
+            available = {expression: key for key, expression in view.aggregates.items()}
+            output_keys = []
+            for item in inner.select:
+                if item.aggregate:
+                    output_keys.append(available.get(f"{item.aggregate.upper()}({item.column.name})"))
+                else:
+                    output_keys.append(item.column.name if item.column.name in group_by_keys else None)
+            if None in output_keys:
+                continue
+            rewrites.append((view, replace(
+                compiled,
+                right_collection=view.name,
+                right_output_keys=tuple(output_keys),
+                group_by_key=None
+            )))
+        return rewrites
+
+    def plan(
+        self,
+        query: Union[str, Dict[str, Any], QuerySpec],
+        sharding_strategy: Dict[str, str],
+        array_sizes: Optional[Dict[str, int]] = None,
+        **params: Any
+    ) -> ViewPlan:
+        """
+        Price a query and its view rewrites and keep the cheapest (by time)
+
+        Args:
+            query: Query id ("Q6"), SQL text, dict spec or QuerySpec
+            sharding_strategy: Dict mapping collection names to sharding keys
+                (views default to their own sharding key)
+            array_sizes: Average array sizes
+            **params: Values of the $parameters
+
+        Returns:
+            ViewPlan with the chosen view (if any) and its result
+
+        Raises:
+            ValueError: If a query id has no compiled plan to rewrite
+        """
+        strategy = self._strategy(sharding_strategy)
+        query_id = WorkloadEntry(query=query, frequency_per_s=0).query_id if isinstance(query, str) else None
+
+        if query_id is not None and re.fullmatch(r"Q\d+", query_id):
+            compiled = self.query_specs.get(query_id)
+            if compiled is None:
+                raise ValueError(f"No query spec for {query_id}: pass its plan in query_specs")
+            best = ViewPlan(None, None, self.executor.execute_query(query_id, strategy, array_sizes, **params))
+        else:
+            compiled = compile_query(query)
+            best = ViewPlan(None, compiled, compiled.execute(self.executor, strategy, array_sizes, **params))
+
+        for view, rewritten in (self.rewrite(compiled) if compiled else []):
+            result = rewritten.execute(self.executor, strategy, array_sizes, **params)
+            if result.cost.time_ms < best.result.cost.time_ms:
+                best = ViewPlan(view.name, rewritten, result)
+        return best
+
+    def execute(
+        self,
+        query: Union[str, Dict[str, Any], QuerySpec],
+        sharding_strategy: Dict[str, str],
+        array_sizes: Optional[Dict[str, int]] = None,
+        **params: Any
+    ):
+        """Execute a query through the cheapest plan (see `plan`)"""
+        return self.plan(query, sharding_strategy, array_sizes, **params).result
+
+    def maintenance_cost(self, source: str, sharding_strategy: Dict[str, str]) -> QueryCost:
+        """
+        Cost of maintaining every view of a source collection after one insert
+
+        Args:
+            source: Source collection name (e.g. "OrderLine")
+            sharding_strategy: Dict mapping collection names to sharding keys
+
+        Returns:
+            QueryCost of the view updates triggered by one inserted document
+        """
+        strategy = self._strategy(sharding_strategy)
+        total = QueryCost(time_ms=0, carbon_gco2=0, price_usd=0)
+        for view in self.database.views.values():
+            if view.source_collection != source:
+                continue
+            # The inserted document holds every GROUP BY key, so an update is
+            # routed to one server if the view is sharded on one of them
+            servers = 1 if strategy.get(view.name) in view.group_by_keys else self.statistics.num_servers
+            total = total + self.executor.cost_model.calculate_view_maintenance_cost(
+                update_size_bytes=self.size_calculator.calculate_document_size(view.schema),
+                num_servers_involved=servers
+            )
+        return total
+
+    def compare_workload(
+        self,
+        workload: Iterable[Union[WorkloadEntry, Tuple[str, Dict[str, Any], float]]],
+        sharding_strategy: Dict[str, str],
+        inserts_per_s: float,
+        source: str = "OrderLine",
+        array_sizes: Optional[Dict[str, int]] = None
+    ) -> ViewWorkloadComparison:
+        """
+        Compare a workload without views to the same workload reading the
+        views, plus their maintenance at the insert rate of the source
+
+        Args:
+            workload: WorkloadEntry objects or (query, params, frequency_per_s) tuples
+            sharding_strategy: Dict mapping collection names to sharding keys
+            inserts_per_s: Documents inserted into the source collection per second
+            source: Source collection of the views
+            array_sizes: Average array sizes
+
+        Returns:
+            ViewWorkloadComparison
+        """
+        workload = list(workload)
+        return ViewWorkloadComparison(
+            without_views=self.executor.execute_workload(workload, sharding_strategy, array_sizes),
+            with_views=self.executor.execute_workload(workload, sharding_strategy, array_sizes,
+                                                      execute=self.execute),
+            maintenance_cost_per_insert=self.maintenance_cost(source, sharding_strategy),
+            inserts_per_s=inserts_per_s
+        )
+
+    def _strategy(self, sharding_strategy: Dict[str, str]) -> Dict[str, str]:
+        """Sharding strategy completed with the sharding keys of the views"""
+        strategy = {name: view.sharding_key for name, view in self.database.views.items() if view.sharding_key}
+        strategy.update(sharding_strategy)
+        return strategy
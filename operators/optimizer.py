@@ -0,0 +1,537 @@
+"""
+Cost-based query optimizer
+Enumerates join orders, join operators and sharding keys for a declarative
+query, prices every alternative with the CostModel and keeps the cheapest
+"""
+
+import functools
+import itertools
+from dataclasses import dataclass, replace
+from fractions import Fraction
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Union, Callable
+
+from models.schema import Collection, FrozenSchema
+from config.constants import BROADCAST_MAX_BYTES
+from .cost_model import QueryCost
+from .query_spec import (
+    QuerySpec,
+    Predicate,
+    SelectivityEstimator,
+    compile_query,
+    parse_sql,
+    spec_from_dict,
+    _check_aliases,
+    _get_collection,
+    _predicates_for,
+    _projected_keys,
+)
+
+OBJECTIVES = ("time_ms", "latency_ms", "carbon_gco2", "price_usd")
+
+
+@dataclass
+class PlanStep:
+    """One operator of a physical plan"""
+    operator: str  # 'filter', 'aggregate' or a join method name ('nested_loop', 'hash', ...)
+    left: str  # Outer input: collection name or intermediate result
+    right: Optional[str] = None  # Inner collection of a join
+    join_key: Optional[str] = None
+    result: Any = None  # FilterResult, JoinResult or AggregateResult
+    output_rows: float = 0  # Estimated documents produced by the step
+
+
+@dataclass
+class OptimizedPlan:
+    """Cheapest plan found for a query"""
+    steps: List[PlanStep]
+    cost: QueryCost  # Sum of the step costs
+    sharding_strategy: Dict[str, str]
+    join_order: Tuple[str, ...] = ()  # Table aliases, outermost first
+    objective: str = "time_ms"
+    plans_considered: int = 0  # Complete plans priced
+    plans_pruned: int = 0  # Partial plans cut by branch-and-bound
+
+    def __str__(self) -> str:
+        lines = [f"OptimizedPlan ({self.objective}: {getattr(self.cost, self.objective):,.6f})"]
+        for i, step in enumerate(self.steps, 1):
+            if step.right:
+                lines.append(
+                    f"  {i}. {step.operator}: {step.left} JOIN {step.right} ON {step.join_key}"
+                    f"  -> {step.output_rows:,.0f} docs, {step.result.cost.time_ms:,.3f} ms"
+                )
+            else:
+                lines.append(f"  {i}. {step.operator}: {step.left}  {step.result.cost.time_ms:,.3f} ms")
+        lines.append(f"  Sharding: {self.sharding_strategy}")
+        lines.append(f"  Plans considered: {self.plans_considered}, pruned: {self.plans_pruned}")
+        return "\n".join(lines)
+
+
+@dataclass
+class _Relation:
+    """Input of a join step: a filtered collection or an intermediate result"""
+    name: str
+    aliases: Tuple[str, ...]
+    collection: Collection
+    output_keys: Tuple[str, ...]
+    predicates: Tuple[Predicate, ...] = ()
+    selectivity: Fraction = Fraction(1)
+    sharding_key: Optional[str] = None
+    intermediate: bool = False  # Result of a previous join step
+    use_index: bool = False  # Read through indexes (the query's use_index; intermediates have none)
+
+    @property
+    def rows(self) -> Fraction:
+        return self.collection.document_count * self.selectivity
+
+    @property
+    def filter_keys(self) -> Optional[List[str]]:
+        return [predicate.column.name for predicate in self.predicates] or None
+
+
+@dataclass
+class _Search:
+    """Mutable state shared by the branch-and-bound search"""
+    relations: Dict[str, Tuple[str, Tuple[str, ...], Tuple[Predicate, ...]]]
+    edges: List[Tuple[str, str, str]]
+    array_sizes: Optional[Dict[str, int]]
+    params: Dict[str, Any]
+    use_index: bool = True
+    best: Optional[OptimizedPlan] = None
+    considered: int = 0
+    pruned: int = 0
+
+
+class QueryOptimizer:
+    """
+    Cost-based optimizer over a QueryExecutor
+
+    Joins are planned left-deep: the first relation is the outer loop and
+    each step joins one more collection connected by a join predicate.
+    Every join order, join method and candidate sharding key is priced
+    with the operators; a partial plan is abandoned as soon as its cost
+    reaches the cheapest complete plan found so far (costs only grow as
+    steps are added), and relations producing fewer documents are tried
+    first so that a good bound is found early.
+    """
+
+    def __init__(self, executor, objective: str = "time_ms", batch_sizes: Sequence[int] = (),
+                 semi_join_fprs: Sequence[float] = ()):
+        """
+        Args:
+            executor: QueryExecutor providing the database, statistics and operators
+            objective: QueryCost metric to minimize ('time_ms', 'latency_ms', 'carbon_gco2' or 'price_usd')
+            batch_sizes: $in batch sizes tried as extra nested loop join methods
+            semi_join_fprs: Bloom filter false-positive rates tried as extra
+                semi-join variants of the nested loop and hash joins
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective {objective!r}, expected one of {OBJECTIVES}")
+        self.executor = executor
+        self.objective = objective
+        self.estimator = SelectivityEstimator(executor.statistics)
+
+        # Join method name -> callable(outer, inner, join_key, array_sizes) -> JoinResult,
+        # or None when the method does not apply to the step
+        self.join_methods: Dict[str, Callable[..., Any]] = {
+            "nested_loop": self._nested_loop_join,
+            "hash": self._hash_join,
+            "co_located": self._co_located_join,
+            "broadcast": self._broadcast_join,
+            "sort_merge": self._sort_merge_join,
+        }
+        for batch_size in batch_sizes:
+            self.join_methods[f"nested_loop[$in {batch_size}]"] = functools.partial(
+                self._nested_loop_join, batch_size=batch_size)
+        for fpr in semi_join_fprs:
+            self.join_methods[f"nested_loop[bloom {fpr:g}]"] = functools.partial(
+                self._nested_loop_join, semi_join_fpr=fpr)
+            self.join_methods[f"hash[bloom {fpr:g}]"] = functools.partial(
+                self._hash_join, semi_join_fpr=fpr)
+
+    def optimize(
+        self,
+        query: Union[str, Dict[str, Any], QuerySpec],
+        sharding_strategy: Dict[str, str],
+        array_sizes: Optional[Dict[str, int]] = None,
+        sharding_candidates: Optional[Dict[str, Sequence[Optional[str]]]] = None,
+        **params: Any
+    ) -> OptimizedPlan:
+        """
+        Find the cheapest plan for a query
+
+        Args:
+            query: SQL text, JSON/YAML-style dict spec or QuerySpec
+            sharding_strategy: Dict mapping collection names to sharding keys
+            array_sizes: Average array sizes
+            sharding_candidates: Optional alternative sharding keys per collection
+                (None meaning unsharded); every combination is explored
+            **params: Values of the $parameters
+
+        Returns:
+            OptimizedPlan with the chosen steps and their total cost
+        """
+        spec = self._as_spec(query)
+        strategies = self._strategies(sharding_strategy, sharding_candidates)
+
+        if spec.group_by or not spec.joins or any(
+            table.subquery is not None for table in [spec.source] + [j.table for j in spec.joins]
+        ):
+            return self._optimize_compiled(query, strategies, array_sizes, params)
+        if spec.order_by:
+            raise ValueError("ORDER BY is only supported on a grouped sub-query with LIMIT (top-K aggregate)")
+
+        relations, edges = self._join_graph(spec)
+        search = _Search(relations=relations, edges=edges, array_sizes=array_sizes, params=params,
+                         use_index=spec.use_index)
+
+        for strategy in strategies:
+            starts = [self._base_relation(alias, search, strategy) for alias in relations]
+            for outer in sorted(starts, key=lambda relation: relation.rows):
+                self._search(search, strategy, outer, frozenset(outer.aliases),
+                             QueryCost(time_ms=0, carbon_gco2=0, price_usd=0), [], outer.aliases)
+
+        if search.best is None:
+            raise ValueError("Every table must be connected to the others by a join condition")
+        search.best.plans_considered = search.considered
+        search.best.plans_pruned = search.pruned
+        return search.best
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def _search(self, search: _Search, strategy: Dict[str, str], outer: _Relation,
+                joined: frozenset, cost: QueryCost, steps: List[PlanStep],
+                order: Tuple[str, ...]):
+        """Depth-first extension of a left-deep plan with pruning"""
+        if len(joined) == len(search.relations):
+            search.considered += 1
+            if search.best is None or self._metric(cost) < self._metric(search.best.cost):
+                search.best = OptimizedPlan(
+                    steps=list(steps),
+                    cost=cost,
+                    sharding_strategy=dict(strategy),
+                    join_order=order,
+                    objective=self.objective
+                )
+            return
+
+        candidates = []
+        for alias in search.relations:
+            if alias in joined:
+                continue
+            join_key = self._edge_key(search.edges, joined, alias)
+            if join_key is not None:  # no cartesian products
+                candidates.append((self._base_relation(alias, search, strategy), join_key))
+        candidates.sort(key=lambda candidate: candidate[0].rows)
+
+        for inner, join_key in candidates:
+            after = joined | {inner.aliases[0]}
+            carried = self._future_keys(search.edges, after)
+            step_outer = self._with_keys(outer, carried)
+            if outer.intermediate:
+                # The coordinator holds the intermediate result and routes each probe by its join key
+                step_outer = replace(step_outer, sharding_key=join_key)
+            step_inner = self._with_keys(inner, carried)
+
+            for method_name, method in self.join_methods.items():
+                result = method(step_outer, step_inner, join_key, search.array_sizes)
+                if result is None:
+                    continue
+                total = cost + result.cost
+                if search.best is not None and self._metric(total) >= self._metric(search.best.cost):
+                    search.pruned += 1
+                    continue
+
+                rows = outer.rows * self._match_rows(inner, join_key)
+                step = PlanStep(
+                    operator=method_name,
+                    left=outer.name,
+                    right=inner.name,
+                    join_key=join_key,
+                    result=result,
+                    output_rows=float(rows)
+                )
+                intermediate = self._intermediate(step_outer, step_inner, rows)
+                self._search(search, strategy, intermediate, after, total,
+                             steps + [step], order + inner.aliases)
+
+    def _optimize_compiled(self, query, strategies: List[Dict[str, str]],
+                           array_sizes: Optional[Dict[str, int]],
+                           params: Dict[str, Any]) -> OptimizedPlan:
+        """Filters and grouped joins have a single shape; only sharding is explored"""
+        compiled = compile_query(query)
+        best = None
+        for strategy in strategies:
+            result = compiled.execute(self.executor, strategy, array_sizes, **params)
+            if best is None or self._metric(result.cost) < self._metric(best.cost):
+                step = PlanStep(
+                    operator=compiled.kind,
+                    left=compiled.left_collection,
+                    right=compiled.right_collection,
+                    join_key=compiled.join_key,
+                    result=result
+                )
+                best = OptimizedPlan(
+                    steps=[step],
+                    cost=result.cost,
+                    sharding_strategy=dict(strategy),
+                    objective=self.objective
+                )
+        best.plans_considered = len(strategies)
+        return best
+
+    # ------------------------------------------------------------------
+    # Join methods
+    # ------------------------------------------------------------------
+
+    def _nested_loop_join(self, outer: _Relation, inner: _Relation, join_key: str,
+                          array_sizes: Optional[Dict[str, int]], batch_size: Optional[int] = None,
+                          semi_join_fpr: Optional[float] = None):
+        """Price one step with NestedLoopJoinOperator (outer = left)"""
+        return self.executor.join_op.nested_loop_join(
+            left_collection=outer.collection,
+            right_collection=inner.collection,
+            join_key=join_key,
+            left_output_keys=list(outer.output_keys),
+            right_output_keys=list(inner.output_keys),
+            left_sharding_key=outer.sharding_key,
+            right_sharding_key=inner.sharding_key,
+            left_filter_keys=outer.filter_keys,
+            right_filter_keys=inner.filter_keys,
+            left_filter_selectivity=float(outer.selectivity),
+            right_filter_selectivity=float(
+                inner.selectivity / self.estimator.distinct_values(inner.collection, join_key)
+            ),
+            array_sizes=array_sizes,
+            use_index=inner.use_index,
+            batch_size=batch_size,
+            semi_join_fpr=semi_join_fpr
+        )
+
+    def _hash_join(self, outer: _Relation, inner: _Relation, join_key: str,
+                   array_sizes: Optional[Dict[str, int]], semi_join_fpr: Optional[float] = None):
+        """Price one step with HashJoinOperator (build side picked by size)"""
+        join_key_distinct_values = None
+        if semi_join_fpr is not None:
+            join_key_distinct_values = int(max(
+                self.estimator.distinct_values(outer.collection, join_key),
+                self.estimator.distinct_values(inner.collection, join_key)))
+        return self.executor.hash_join_op.hash_join(
+            left_collection=outer.collection,
+            right_collection=inner.collection,
+            join_key=join_key,
+            left_output_keys=list(outer.output_keys),
+            right_output_keys=list(inner.output_keys),
+            left_sharding_key=outer.sharding_key,
+            right_sharding_key=inner.sharding_key,
+            left_filter_keys=outer.filter_keys,
+            right_filter_keys=inner.filter_keys,
+            left_filter_selectivity=float(outer.selectivity),
+            right_filter_selectivity=float(inner.selectivity),
+            array_sizes=array_sizes,
+            semi_join_fpr=semi_join_fpr,
+            join_key_distinct_values=join_key_distinct_values,
+            # Only base relations have filter keys to look up
+            use_index=outer.use_index or inner.use_index
+        )
+
+    def _co_located_join(self, outer: _Relation, inner: _Relation, join_key: str,
+                         array_sizes: Optional[Dict[str, int]]):
+        """Price one step with CoLocatedJoinOperator, if both sides are sharded on the join key"""
+        if outer.intermediate or not (outer.sharding_key == inner.sharding_key == join_key):
+            return None
+        return self.executor.co_located_join_op.co_located_join(
+            left_collection=outer.collection,
+            right_collection=inner.collection,
+            join_key=join_key,
+            left_output_keys=list(outer.output_keys),
+            right_output_keys=list(inner.output_keys),
+            sharding_strategy=self._step_sharding(outer, inner),
+            left_filter_keys=outer.filter_keys,
+            right_filter_keys=inner.filter_keys,
+            left_filter_selectivity=float(outer.selectivity),
+            right_filter_selectivity=float(inner.selectivity),
+            join_key_distinct_values=self.estimator.distinct_values(inner.collection, join_key),
+            array_sizes=array_sizes
+        )
+
+    def _broadcast_join(self, outer: _Relation, inner: _Relation, join_key: str,
+                        array_sizes: Optional[Dict[str, int]]):
+        """Price one step with BroadcastJoinOperator, if the smaller side is small enough"""
+        result = self.executor.broadcast_join_op.broadcast_join(
+            left_collection=outer.collection,
+            right_collection=inner.collection,
+            join_key=join_key,
+            left_output_keys=list(outer.output_keys),
+            right_output_keys=list(inner.output_keys),
+            sharding_strategy=self._step_sharding(outer, inner),
+            left_filter_keys=outer.filter_keys,
+            right_filter_keys=inner.filter_keys,
+            left_filter_selectivity=float(outer.selectivity),
+            right_filter_selectivity=float(inner.selectivity),
+            join_key_distinct_values=self.estimator.distinct_values(inner.collection, join_key),
+            array_sizes=array_sizes
+        )
+        return result if result.broadcast_bytes <= BROADCAST_MAX_BYTES else None
+
+    def _sort_merge_join(self, outer: _Relation, inner: _Relation, join_key: str,
+                         array_sizes: Optional[Dict[str, int]]):
+        """Price one step with SortMergeJoinOperator"""
+        return self.executor.sort_merge_join_op.sort_merge_join(
+            left_collection=outer.collection,
+            right_collection=inner.collection,
+            join_key=join_key,
+            left_output_keys=list(outer.output_keys),
+            right_output_keys=list(inner.output_keys),
+            left_sharding_key=None if outer.intermediate else outer.sharding_key,
+            right_sharding_key=inner.sharding_key,
+            left_filter_keys=outer.filter_keys,
+            right_filter_keys=inner.filter_keys,
+            left_filter_selectivity=float(outer.selectivity),
+            right_filter_selectivity=float(inner.selectivity),
+            join_key_distinct_values=self.estimator.distinct_values(inner.collection, join_key),
+            array_sizes=array_sizes
+        )
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _metric(self, cost: QueryCost) -> float:
+        return getattr(cost, self.objective)
+
+    @staticmethod
+    def _step_sharding(outer: _Relation, inner: _Relation) -> Dict[str, str]:
+        """Sharding strategy restricted to the two inputs of a step"""
+        strategy = {}
+        if outer.sharding_key and not outer.intermediate:
+            strategy[outer.collection.name] = outer.sharding_key
+        if inner.sharding_key:
+            strategy[inner.collection.name] = inner.sharding_key
+        return strategy
+
+    @staticmethod
+    def _as_spec(query: Union[str, Dict[str, Any], QuerySpec]) -> QuerySpec:
+        if isinstance(query, QuerySpec):
+            return query
+        if isinstance(query, dict):
+            return spec_from_dict(query)
+        return parse_sql(query)
+
+    @staticmethod
+    def _strategies(sharding_strategy: Dict[str, str],
+                    sharding_candidates: Optional[Dict[str, Sequence[Optional[str]]]]
+                    ) -> List[Dict[str, str]]:
+        """Every combination of candidate sharding keys on top of the base strategy"""
+        if not sharding_candidates:
+            return [dict(sharding_strategy)]
+        names = list(sharding_candidates)
+        strategies = []
+        for keys in itertools.product(*(sharding_candidates[name] for name in names)):
+            strategy = dict(sharding_strategy)
+            for name, key in zip(names, keys):
+                if key is None:
+                    strategy.pop(name, None)
+                else:
+                    strategy[name] = key
+            strategies.append(strategy)
+        return strategies
+
+    @staticmethod
+    def _join_graph(spec: QuerySpec):
+        """
+        Returns:
+            (alias -> (collection name, output keys, predicates),
+             list of (alias, alias, join key) edges)
+        """
+        tables = [spec.source] + [join.table for join in spec.joins]
+        aliases = tuple(table.alias for table in tables)
+        if len(set(aliases)) != len(aliases):
+            raise ValueError("Table aliases must be unique")
+        _check_aliases(spec, aliases)
+
+        relations = {
+            table.alias: (
+                table.collection,
+                _projected_keys(spec.select, table.alias),
+                _predicates_for(spec.where, table.alias)
+            )
+            for table in tables
+        }
+        edges = []
+        for join in spec.joins:
+            if join.left.name != join.right.name:
+                raise ValueError(f"Join keys must have the same name: {join.left} = {join.right}")
+            if join.left.alias not in relations or join.right.alias not in relations:
+                raise ValueError(f"Join condition must use table aliases: {join.left} = {join.right}")
+            edges.append((join.left.alias, join.right.alias, join.left.name))
+        return relations, edges
+
+    def _base_relation(self, alias: str, search: _Search, strategy: Dict[str, str]) -> _Relation:
+        collection_name, output_keys, predicates = search.relations[alias]
+        collection = _get_collection(self.executor.database, collection_name)
+        return _Relation(
+            name=collection_name,
+            aliases=(alias,),
+            collection=collection,
+            output_keys=output_keys,
+            predicates=predicates,
+            selectivity=self.estimator.filter_selectivity(collection, predicates, search.params),
+            sharding_key=strategy.get(collection_name),
+            use_index=search.use_index
+        )
+
+    @staticmethod
+    def _edge_key(edges: List[Tuple[str, str, str]], joined: frozenset, alias: str) -> Optional[str]:
+        """Join key between the joined aliases and `alias`, if connected"""
+        for left, right, key in edges:
+            if (left in joined and right == alias) or (right in joined and left == alias):
+                return key
+        return None
+
+    @staticmethod
+    def _future_keys(edges: List[Tuple[str, str, str]], joined: frozenset) -> Tuple[str, ...]:
+        """Join keys still needed by relations outside `joined`"""
+        keys = []
+        for left, right, key in edges:
+            if (left in joined) != (right in joined) and key not in keys:
+                keys.append(key)
+        return tuple(keys)
+
+    @staticmethod
+    def _with_keys(relation: _Relation, keys: Tuple[str, ...]) -> _Relation:
+        """Add the join keys needed by later steps to a relation's output"""
+        extra = tuple(
+            key for key in keys
+            if key not in relation.output_keys and relation.collection.schema.get_field(key)
+        )
+        if not extra:
+            return relation
+        return replace(relation, output_keys=relation.output_keys + extra)
+
+    def _match_rows(self, inner: _Relation, join_key: str) -> Fraction:
+        """Inner documents matching one outer document"""
+        return inner.rows / self.estimator.distinct_values(inner.collection, join_key)
+
+    @staticmethod
+    def _intermediate(outer: _Relation, inner: _Relation, rows: Fraction) -> _Relation:
+        """Result of a join step, used as the outer input of the next step"""
+        fields = []
+        names = set()
+        for relation in (outer, inner):
+            for key in relation.output_keys:
+                field_def = relation.collection.schema.get_field(key)
+                if field_def is not None and field_def.name not in names:
+                    names.add(field_def.name)
+                    fields.append(field_def)
+        name = f"({outer.name} JOIN {inner.name})"
+        return _Relation(
+            name=name,
+            aliases=outer.aliases + inner.aliases,
+            collection=Collection(name=name, schema=FrozenSchema(name, fields), document_count=int(rows)),
+            output_keys=outer.output_keys + tuple(
+                key for key in inner.output_keys if key not in outer.output_keys
+            ),
+            intermediate=True
+        )
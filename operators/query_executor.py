@@ -3,12 +3,30 @@ Query executor for running predefined queries (Q1-Q7)
 Demonstrates usage of filter and join operators
 """
 
-from typing import Dict, Optional, List, Tuple
+import json
+import re
+from contextlib import contextmanager
+from typing import Dict, Optional, List, Tuple, Any, Iterable, Union, Callable
 from models.schema import Database
 from models.statistics import Statistics
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
+from .cost_model import CostModel, QueryCost
 from .filter_operator import FilterOperator, FilterResult
 from .join_operator import NestedLoopJoinOperator, JoinResult
+from .hash_join_operator import HashJoinOperator
+from .distributed_join_operator import CoLocatedJoinOperator, BroadcastJoinOperator
+from .sort_merge_join_operator import SortMergeJoinOperator
 from .aggregate_operator import AggregateOperator, AggregateResult
+from .top_k_operator import TopKAggregateOperator
+from .query_spec import QuerySpec, compile_query
+from .workload import WorkloadEntry, WorkloadQueryResult, WorkloadResult, SharedResults
+
+
+# Operators whose entry points are shared across the queries of a workload
+SHARED_OPERATORS = (
+    "filter_op", "join_op", "hash_join_op", "co_located_join_op", "broadcast_join_op",
+    "sort_merge_join_op", "aggregate_op", "top_k_op"
+)
 
 
 class QueryExecutor:
@@ -16,19 +34,29 @@ class QueryExecutor:
     Executes predefined queries on different database designs
     """
 
-    def __init__(self, database: Database, statistics: Statistics):
+    def __init__(self, database: Database, statistics: Statistics,
+                 profile: Optional[ClusterProfile] = None):
         """
         Initialize query executor
 
         Args:
             database: Database to query
             statistics: Database statistics
+            profile: Cluster hardware profile (default: DEFAULT_PROFILE); its
+                server count, if set, overrides the statistics'
         """
         self.database = database
-        self.statistics = statistics
-        self.filter_op = FilterOperator(statistics)
-        self.join_op = NestedLoopJoinOperator(statistics)
-        self.aggregate_op = AggregateOperator(statistics)
+        self.profile = profile or DEFAULT_PROFILE
+        self.statistics = self.profile.apply_to(statistics)
+        self.cost_model = CostModel.for_profile(self.profile)
+        self.filter_op = FilterOperator(self.statistics, self.profile)
+        self.join_op = NestedLoopJoinOperator(self.statistics, self.profile)
+        self.hash_join_op = HashJoinOperator(self.statistics, profile=self.profile)
+        self.co_located_join_op = CoLocatedJoinOperator(self.statistics, self.profile)
+        self.broadcast_join_op = BroadcastJoinOperator(self.statistics, self.profile)
+        self.sort_merge_join_op = SortMergeJoinOperator(self.statistics, profile=self.profile)
+        self.aggregate_op = AggregateOperator(self.statistics, self.profile)
+        self.top_k_op = TopKAggregateOperator(self.statistics, self.profile)
 
     def execute_q1(
         self,
@@ -153,7 +181,8 @@ class QueryExecutor:
     def execute_q4(
         self,
         sharding_strategy: Dict[str, str],
-        array_sizes: Optional[Dict[str, int]] = None
+        array_sizes: Optional[Dict[str, int]] = None,
+        batch_size: Optional[int] = None
     ) -> JoinResult:
         """
         Q4: Stock (list of product names, as well as their quantity) from a given warehouse
@@ -164,6 +193,7 @@ class QueryExecutor:
         Args:
             sharding_strategy: Dict mapping collection names to sharding keys
             array_sizes: Average array sizes
+            batch_size: Outer keys per $in request (None: one request per outer document)
 
         Returns:
             JoinResult
@@ -195,14 +225,16 @@ class QueryExecutor:
             left_filter_keys=["IDW"],
             left_filter_selectivity=left_filter_selectivity,
             right_filter_selectivity=right_filter_selectivity,
-            array_sizes=array_sizes
+            array_sizes=array_sizes,
+            batch_size=batch_size
         )
 
     def execute_q5(
         self,
         brand: str,
         sharding_strategy: Dict[str, str],
-        array_sizes: Optional[Dict[str, int]] = None
+        array_sizes: Optional[Dict[str, int]] = None,
+        batch_size: Optional[int] = None
     ) -> JoinResult:
         """
         Q5: Distribution of "Apple" brand products (name & price) in warehouses (IDW & quantity)
@@ -214,6 +246,7 @@ class QueryExecutor:
             brand: Brand name (e.g., "Apple")
             sharding_strategy: Dict mapping collection names to sharding keys
             array_sizes: Average array sizes
+            batch_size: Outer keys per $in request (None: one request per outer document)
 
         Returns:
             JoinResult
@@ -252,13 +285,16 @@ class QueryExecutor:
             left_filter_keys=["brand"],
             left_filter_selectivity=left_filter_selectivity,
             right_filter_selectivity=right_filter_selectivity,
-            array_sizes=array_sizes
+            array_sizes=array_sizes,
+            batch_size=batch_size
         )
 
     def execute_q6(
         self,
         sharding_strategy: Dict[str, str],
-        array_sizes: Optional[Dict[str, int]] = None
+        array_sizes: Optional[Dict[str, int]] = None,
+        aggregation: str = "single",
+        top_k_pushdown: bool = False
     ) -> Tuple[AggregateResult, JoinResult]:
         """
         Q6: The 100 most ordered product names and price (sum of quantities)
@@ -275,6 +311,9 @@ class QueryExecutor:
         Args:
             sharding_strategy: Dict mapping collection names to sharding keys
             array_sizes: Average array sizes
+            aggregation: 'single', 'repartition' (every grouped document is
+                shuffled) or 'two_phase' (pre-aggregate on each shard)
+            top_k_pushdown: Send only the K best groups of each server (TopKAggregateResult)
             
         Returns:
             AggregateResult
@@ -302,7 +341,8 @@ class QueryExecutor:
         limit = 100
         
         # GROUP BY IDP, SUM(quantity)
-        return self.aggregate_op.aggregator(
+        aggregate = self.top_k_op.top_k_aggregator if top_k_pushdown else self.aggregate_op.aggregator
+        return aggregate(
             left_collection=product_collection,
             right_collection=orderline_collection,
             join_key="IDP",
@@ -314,14 +354,18 @@ class QueryExecutor:
             right_group_by_key=right_group_by_key,
             left_filter_selectivity=left_filter_selectivity,
             right_filter_selectivity=right_filter_selectivity,
-            array_sizes=array_sizes
+            array_sizes=array_sizes,
+            aggregation=aggregation,
+            right_group_input_selectivity=1.0
         )
         
 
     def execute_q7(
         self,
         sharding_strategy: Dict[str, str],
-        array_sizes: Optional[Dict[str, int]] = None
+        array_sizes: Optional[Dict[str, int]] = None,
+        aggregation: str = "single",
+        top_k_pushdown: bool = False
     ) -> Tuple[AggregateResult, JoinResult]:
         """
         Q7: Name and price of the product most ordered by customer no. 125;
@@ -338,6 +382,9 @@ class QueryExecutor:
         Args:
             sharding_strategy: Dict mapping collection names to sharding keys
             array_sizes: Average array sizes
+            aggregation: 'single', 'repartition' (every grouped document is
+                shuffled) or 'two_phase' (pre-aggregate on each shard)
+            top_k_pushdown: Send only the K best groups of each server (TopKAggregateResult)
             
         Returns:
             AggregateResult
@@ -367,7 +414,8 @@ class QueryExecutor:
         
         
         
-        return self.aggregate_op.aggregator(
+        aggregate = self.top_k_op.top_k_aggregator if top_k_pushdown else self.aggregate_op.aggregator
+        return aggregate(
             left_collection=product_collection,
             right_collection=orderline_collection,
             join_key="IDP",
@@ -380,13 +428,16 @@ class QueryExecutor:
             right_group_by_key=right_group_by_key,
             left_filter_selectivity=left_filter_selectivity,
             right_filter_selectivity=right_filter_selectivity,
-            array_sizes=array_sizes
+            array_sizes=array_sizes,
+            aggregation=aggregation,
+            right_group_input_selectivity=1 / self.statistics.num_clients
         )
     
     def execute_q8(
         self,
         sharding_strategy: Dict[str, str],
-        array_sizes: Optional[Dict[str, int]] = None
+        array_sizes: Optional[Dict[str, int]] = None,
+        batch_size: Optional[int] = None
     ) -> JoinResult:
         """
         Q9: 
@@ -397,6 +448,7 @@ class QueryExecutor:
         Args:
             sharding_strategy: Dict mapping collection names to sharding keys
             array_sizes: Average array sizes
+            batch_size: Outer keys per $in request (None: one request per outer document)
 
         Returns:
             JoinResult
@@ -428,9 +480,154 @@ class QueryExecutor:
             left_filter_keys=["IDW"],
             left_filter_selectivity=left_filter_selectivity,
             right_filter_selectivity=right_filter_selectivity,
-            array_sizes=array_sizes
+            array_sizes=array_sizes,
+            batch_size=batch_size
         )
     
     
 
+    def execute_query(
+        self,
+        query: str,
+        sharding_strategy: Dict[str, str],
+        array_sizes: Optional[Dict[str, int]] = None,
+        **params: Any
+    ):
+        """
+        Execute a predefined query by identifier, or a SQL query
+
+        Args:
+            query: Query identifier ("Q1" ... "Q8") or SQL text
+            sharding_strategy: Dict mapping collection names to sharding keys
+            array_sizes: Average array sizes
+            **params: Query parameters (e.g. brand="Apple" for Q2/Q5)
+
+        Returns:
+            The result of the corresponding execute_qN method or compiled plan
+        """
+        query_id = WorkloadEntry(query=query, frequency_per_s=0).query_id
+        if not re.fullmatch(r"Q\d+", query_id):
+            return self.execute_spec(query, sharding_strategy, array_sizes, **params)
+        method = getattr(self, f"execute_{query_id.lower()}", None)
+        if method is None:
+            raise ValueError(f"Unknown query: {query}")
+        return method(sharding_strategy=sharding_strategy, array_sizes=array_sizes, **params)
+
+    def execute_spec(
+        self,
+        query: Union[str, Dict[str, Any], QuerySpec],
+        sharding_strategy: Dict[str, str],
+        array_sizes: Optional[Dict[str, int]] = None,
+        **params: Any
+    ):
+        """
+        Execute a declarative query: SQL text, a JSON/YAML-style dict spec
+        or a QuerySpec. Compiled plans are cached by query text.
+
+        Example:
+            executor.execute_spec(
+                "SELECT S.quantity FROM Stock S WHERE S.IDP = $IDP",
+                {"Stock": "IDP"}
+            )
+
+        Args:
+            query: Query to execute
+            sharding_strategy: Dict mapping collection names to sharding keys
+            array_sizes: Average array sizes
+            **params: Values of the $parameters
+
+        Returns:
+            FilterResult, JoinResult or AggregateResult
+        """
+        return compile_query(query).execute(self, sharding_strategy, array_sizes, **params)
+
+    @staticmethod
+    def _plan_key(query_id: str) -> Any:
+        """Memo key of a query: its identifier, or its canonical plan for SQL"""
+        if re.fullmatch(r"Q\d+", query_id):
+            return query_id
+        try:
+            return compile_query(query_id).node_key
+        except ValueError:
+            # Shapes only a custom `execute` prices, e.g. multi-way joins for QueryOptimizer
+            return query_id
+
+    @contextmanager
+    def sharing_results(self, shared: SharedResults):
+        """
+        Route the operator entry points through `shared` while the block
+        runs, so every filter, join and aggregate node is priced once
+        """
+        originals = {name: getattr(self, name) for name in SHARED_OPERATORS}
+        try:
+            for name, operator in originals.items():
+                setattr(self, name, shared.wrap(operator))
+            yield shared
+        finally:
+            for name, operator in originals.items():
+                setattr(self, name, operator)
+
+    def execute_workload(
+        self,
+        workload: Iterable[Union[WorkloadEntry, Tuple[str, Dict[str, Any], float]]],
+        sharding_strategy: Dict[str, str],
+        array_sizes: Optional[Dict[str, int]] = None,
+        execute: Optional[Callable[..., Any]] = None
+    ) -> WorkloadResult:
+        """
+        Price a workload of queries under one sharding configuration
+
+        Entries with the same plan (query id, or canonical compiled plan for
+        SQL/dict specs, independent of aliases) and the same parameters are
+        priced once. Across different queries, every filter, join and
+        aggregate node (including the steps priced by an optimizer passed as
+        `execute`) is priced once and shared through a `SharedResults`.
+
+        Args:
+            workload: WorkloadEntry objects or (query, params, frequency_per_s) tuples
+            sharding_strategy: Dict mapping collection names to sharding keys
+            array_sizes: Average array sizes
+            execute: Callable(query, sharding_strategy, array_sizes, **params)
+                running one query (default: execute_query)
+
+        Returns:
+            WorkloadResult with per-query and throughput-weighted total costs
+        """
+        execute = execute or self.execute_query
+        executed: Dict[Tuple, Any] = {}
+        queries: List[WorkloadQueryResult] = []
+        total_cost = QueryCost(time_ms=0, carbon_gco2=0, price_usd=0)
+        total_frequency = 0.0
+        reused = 0
+
+        with self.sharing_results(SharedResults()) as shared:
+            for raw_entry in workload:
+                entry = WorkloadEntry.from_any(raw_entry)
+                key = (self._plan_key(entry.query_id), _params_key(entry.params))
+
+                if key in executed:
+                    reused += 1
+                else:
+                    executed[key] = execute(
+                        entry.query_id, sharding_strategy, array_sizes, **entry.params
+                    )
+                result = executed[key]
+
+                cost_per_s = result.cost.scale(entry.frequency_per_s)
+                queries.append(WorkloadQueryResult(entry=entry, result=result, cost_per_s=cost_per_s))
+                total_cost = total_cost + cost_per_s
+                total_frequency += entry.frequency_per_s
+
+        return WorkloadResult(
+            queries=queries,
+            total_cost_per_s=total_cost,
+            total_frequency_per_s=total_frequency,
+            executions=len(executed),
+            reused=reused,
+            shared_sub_results=shared.hits
+        )
+
 
+def _params_key(params: Dict[str, Any]) -> str:
+    """Hashable form of query parameters, including unhashable values such as lists"""
+    return json.dumps(params, sort_keys=True, default=repr)
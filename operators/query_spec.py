@@ -0,0 +1,777 @@
+"""
+Declarative query specifications
+Parses a small SQL subset (or an equivalent JSON/YAML spec) and compiles it
+into calls on FilterOperator, NestedLoopJoinOperator and AggregateOperator
+"""
+
+import json
+import re
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple, Union
+from dataclasses import dataclass, replace
+from models.schema import Collection
+from models.statistics import Statistics
+
+
+# ---------------------------------------------------------------------------
+# Query specification
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Param:
+    """A query parameter placeholder such as $brand"""
+    name: str
+
+
+@dataclass(frozen=True)
+class ColumnRef:
+    """A (possibly qualified) column, e.g. P.name"""
+    alias: Optional[str]
+    name: str
+
+    def __str__(self) -> str:
+        return f"{self.alias}.{self.name}" if self.alias else self.name
+
+
+@dataclass(frozen=True)
+class SelectItem:
+    """A selected column, optionally aggregated: SUM(O.quantity) AS NB"""
+    column: ColumnRef
+    aggregate: Optional[str] = None
+    alias: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Predicate:
+    """A comparison between a column and a literal or parameter"""
+    column: ColumnRef
+    op: str
+    value: Any
+
+
+@dataclass(frozen=True)
+class TableRef:
+    """A collection or a sub-query in the FROM / JOIN clauses"""
+    alias: str
+    collection: Optional[str] = None
+    subquery: Optional['QuerySpec'] = None
+
+
+@dataclass(frozen=True)
+class JoinClause:
+    """JOIN <table> ON <left> = <right>"""
+    table: TableRef
+    left: ColumnRef
+    right: ColumnRef
+
+
+@dataclass(frozen=True)
+class QuerySpec:
+    """Parsed query: SELECT / FROM / JOIN / WHERE / GROUP BY / ORDER BY / LIMIT"""
+    select: Tuple[SelectItem, ...]
+    source: TableRef
+    joins: Tuple[JoinClause, ...] = ()
+    where: Tuple[Predicate, ...] = ()
+    group_by: Tuple[ColumnRef, ...] = ()
+    order_by: Tuple[Tuple[ColumnRef, str], ...] = ()
+    limit: Optional[int] = None
+    use_index: bool = True
+
+
+# ---------------------------------------------------------------------------
+# SQL subset parser
+# ---------------------------------------------------------------------------
+
+_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>\d+(?:\.\d+)?)
+      | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<param>\$\w+)
+      | (?P<ident>[A-Za-z_]\w*(?:\.(?:[A-Za-z_]\w*|\*))?)
+      | (?P<op><=|>=|<>|!=|[=<>(),;*])
+    )""", re.VERBOSE)
+
+_KEYWORDS = {
+    "SELECT", "FROM", "JOIN", "INNER", "ON", "WHERE", "AND", "GROUP", "ORDER",
+    "BY", "ASC", "DESC", "LIMIT", "AS"
+}
+_AGGREGATES = {"SUM", "COUNT", "AVG", "MIN", "MAX"}
+
+
+class _SqlParser:
+    """Recursive-descent parser for the supported SQL subset"""
+
+    def __init__(self, text: str):
+        self.tokens: List[Tuple[str, str]] = []
+        pos = 0
+        text = text.strip()
+        while pos < len(text):
+            match = _TOKEN_PATTERN.match(text, pos)
+            if match is None or match.end() == pos:
+                raise ValueError(f"Unexpected character in query at {pos}: {text[pos:pos + 20]!r}")
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == "ident" and value.upper() in _KEYWORDS:
+                kind, value = "keyword", value.upper()
+            self.tokens.append((kind, value))
+            pos = match.end()
+        self.pos = 0
+
+    # -- token helpers --------------------------------------------------
+
+    def _peek(self, offset: int = 0) -> Tuple[str, str]:
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else ("eof", "")
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _accept(self, *values: str) -> bool:
+        if self._peek()[1] in values and self._peek()[0] in ("keyword", "op"):
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, *values: str):
+        if not self._accept(*values):
+            raise ValueError(f"Expected {' '.join(values)}, got {self._peek()[1] or 'end of query'!r}")
+
+    def _expect_ident(self) -> str:
+        kind, value = self._next()
+        if kind != "ident":
+            raise ValueError(f"Expected an identifier, got {value or 'end of query'!r}")
+        return value
+
+    def at_end(self) -> bool:
+        while self._accept(";"):
+            pass
+        return self._peek()[0] == "eof"
+
+    # -- grammar --------------------------------------------------------
+
+    def column(self) -> ColumnRef:
+        value = self._expect_ident()
+        if "." in value:
+            alias, name = value.split(".", 1)
+            return ColumnRef(alias=alias, name=name)
+        return ColumnRef(alias=None, name=value)
+
+    def select_item(self) -> SelectItem:
+        kind, value = self._peek()
+        if kind == "ident" and value.upper() in _AGGREGATES and self._peek(1)[1] == "(":
+            self.pos += 2
+            if self._accept("*"):
+                column = ColumnRef(alias=None, name="*")
+            else:
+                column = self.column()
+            self._expect(")")
+            item = SelectItem(column=column, aggregate=value.upper())
+        else:
+            item = SelectItem(column=self.column())
+
+        if self._accept("AS"):
+            item = SelectItem(column=item.column, aggregate=item.aggregate, alias=self._expect_ident())
+        return item
+
+    def value(self) -> Any:
+        kind, value = self._next()
+        if kind == "number":
+            return float(value) if "." in value else int(value)
+        if kind == "string":
+            return value[1:-1]
+        if kind == "param":
+            return Param(value[1:])
+        raise ValueError(f"Expected a literal or $parameter, got {value or 'end of query'!r}")
+
+    def predicate(self) -> Predicate:
+        column = self.column()
+        kind, op = self._next()
+        if kind != "op" or op not in ("=", "<", ">", "<=", ">=", "<>", "!="):
+            raise ValueError(f"Expected a comparison operator, got {op!r}")
+        return Predicate(column=column, op="!=" if op == "<>" else op, value=self.value())
+
+    def table(self) -> TableRef:
+        if self._accept("("):
+            subquery = self.query()
+            self._expect(")")
+            self._accept("AS")
+            return TableRef(alias=self._expect_ident(), subquery=subquery)
+
+        collection = self._expect_ident()
+        self._accept("AS")
+        alias = collection
+        if self._peek()[0] == "ident":
+            alias = self._expect_ident()
+        return TableRef(alias=alias, collection=collection)
+
+    def join_condition(self) -> Tuple[ColumnRef, ColumnRef]:
+        left = self.column()
+        self._expect("=")
+        return left, self.column()
+
+    def join(self) -> JoinClause:
+        table = self.table()
+        self._expect("ON")
+        left, right = self.join_condition()
+        return JoinClause(table=table, left=left, right=right)
+
+    def query(self) -> QuerySpec:
+        self._expect("SELECT")
+        select = [self.select_item()]
+        while self._accept(","):
+            select.append(self.select_item())
+
+        self._expect("FROM")
+        source = self.table()
+
+        joins = []
+        while self._peek()[1] in ("JOIN", "INNER"):
+            self._accept("INNER")
+            self._expect("JOIN")
+            joins.append(self.join())
+
+        where = []
+        if self._accept("WHERE"):
+            where.append(self.predicate())
+            while self._accept("AND"):
+                where.append(self.predicate())
+
+        group_by = []
+        if self._accept("GROUP"):
+            self._expect("BY")
+            group_by.append(self.column())
+            while self._accept(","):
+                group_by.append(self.column())
+
+        order_by = []
+        if self._accept("ORDER"):
+            self._expect("BY")
+            while True:
+                column = self.column()
+                if self._accept("DESC"):
+                    direction = "DESC"
+                else:
+                    self._accept("ASC")
+                    direction = "ASC"
+                order_by.append((column, direction))
+                if not self._accept(","):
+                    break
+
+        limit = None
+        if self._accept("LIMIT"):
+            limit_value = self.value()
+            if not isinstance(limit_value, int):
+                raise ValueError("LIMIT expects an integer")
+            limit = limit_value
+
+        return QuerySpec(
+            select=tuple(select),
+            source=source,
+            joins=tuple(joins),
+            where=tuple(where),
+            group_by=tuple(group_by),
+            order_by=tuple(order_by),
+            limit=limit
+        )
+
+
+def _parse_fragment(text: str, rule: str) -> Any:
+    """Parse a single grammar rule (e.g. "predicate") from a spec string"""
+    parser = _SqlParser(text)
+    result = getattr(parser, rule)()
+    if not parser.at_end():
+        raise ValueError(f"Unexpected trailing input in {text!r}")
+    return result
+
+
+def parse_sql(text: str) -> QuerySpec:
+    """
+    Parse a query of the supported SQL subset:
+
+        SELECT col | AGG(col) [AS name], ...
+        FROM Collection [alias] | (subquery) alias
+        [JOIN Collection [alias] | (subquery) alias ON a.key = b.key] ...
+        [WHERE a.key = value|$param [AND ...]]
+        [GROUP BY col, ...] [ORDER BY col [ASC|DESC], ...] [LIMIT n]
+
+    Raises:
+        ValueError: On syntax errors
+    """
+    parser = _SqlParser(text)
+    spec = parser.query()
+    if not parser.at_end():
+        raise ValueError(f"Unexpected trailing input: {parser._peek()[1]!r}")
+    return spec
+
+
+def spec_from_dict(spec: Dict[str, Any]) -> QuerySpec:
+    """
+    Build a QuerySpec from its JSON/YAML form. Clauses are SQL fragments:
+
+        {
+          "select": ["P.name", "P.price", "OL.NB"],
+          "from": "Product P",
+          "join": [{"table": {"alias": "OL", "query": {...}}, "on": "P.IDP = OL.IDP"}],
+          "where": ["P.brand = $brand"],
+          "group_by": ["O.IDP"],
+          "order_by": ["OL.NB DESC"],
+          "limit": 100,
+          "use_index": true
+        }
+
+    A {"sql": "..."} mapping is parsed as SQL.
+    """
+    if "sql" in spec:
+        query = parse_sql(spec["sql"])
+        if "use_index" in spec:
+            query = replace(query, use_index=bool(spec["use_index"]))
+        return query
+
+    def table(value: Union[str, Dict[str, Any]]) -> TableRef:
+        if isinstance(value, str):
+            return _parse_fragment(value, "table")
+        return TableRef(alias=value["alias"], subquery=spec_from_dict(value["query"]))
+
+    joins = []
+    for join in spec.get("join", []):
+        left, right = _parse_fragment(join["on"], "join_condition")
+        joins.append(JoinClause(table=table(join["table"]), left=left, right=right))
+
+    order_by = []
+    for item in spec.get("order_by", []):
+        parts = item.split()
+        direction = parts[1].upper() if len(parts) > 1 else "ASC"
+        if direction not in ("ASC", "DESC"):
+            raise ValueError(f"Invalid ORDER BY direction in {item!r}")
+        order_by.append((_parse_fragment(parts[0], "column"), direction))
+
+    return QuerySpec(
+        select=tuple(_parse_fragment(item, "select_item") for item in spec["select"]),
+        source=table(spec["from"]),
+        joins=tuple(joins),
+        where=tuple(_parse_fragment(item, "predicate") for item in spec.get("where", [])),
+        group_by=tuple(_parse_fragment(item, "column") for item in spec.get("group_by", [])),
+        order_by=tuple(order_by),
+        limit=spec.get("limit"),
+        use_index=spec.get("use_index", True)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Selectivity estimation
+# ---------------------------------------------------------------------------
+
+# Statistics attribute holding the number of distinct values of a key
+DISTINCT_VALUE_STATS = {
+    "IDP": "num_products",
+    "IDW": "num_warehouses",
+    "IDC": "num_clients",
+    "brand": "num_brands",
+    "date": "num_dates",
+}
+
+# (filtered key, grouped key) -> statistic holding the number of distinct
+# grouped values for one value of the filtered key
+CORRELATED_DISTINCT_STATS = {
+    ("IDC", "IDP"): "products_per_customer",
+}
+
+RANGE_SELECTIVITY = Fraction(1, 3)  # Default for <, <=, >, >= predicates
+
+
+class SelectivityEstimator:
+    """
+    Derives filter selectivities and group counts from Statistics
+
+    Distinct counts can be overridden with custom statistics named
+    "distinct_<key>" (e.g. Statistics(custom_stats={"distinct_location": 50})).
+    Keys without statistics are assumed unique within their collection.
+    """
+
+    def __init__(self, statistics: Statistics):
+        self.statistics = statistics
+
+    def distinct_values(self, collection: Collection, key: str) -> int:
+        """Number of distinct values of `key` in `collection`"""
+        custom = self.statistics.custom_stats.get(f"distinct_{key}")
+        if custom:
+            return custom
+        stat_name = DISTINCT_VALUE_STATS.get(key)
+        if stat_name:
+            return getattr(self.statistics, stat_name)
+        return max(int(collection.document_count), 1)
+
+    def predicate_selectivity(self, collection: Collection, predicate: Predicate,
+                              params: Dict[str, Any]) -> Fraction:
+        """Fraction of documents matching one predicate"""
+        value = predicate.value
+        if isinstance(value, Param):
+            value = params.get(value.name)
+        key = predicate.column.name
+
+        if predicate.op == "=":
+            if key == "brand" and isinstance(value, str) and value.lower() == "apple":
+                return Fraction(self.statistics.products_per_brand_apple, self.statistics.num_products)
+            return Fraction(1, self.distinct_values(collection, key))
+        if predicate.op == "!=":
+            return 1 - Fraction(1, self.distinct_values(collection, key))
+        return RANGE_SELECTIVITY
+
+    def filter_selectivity(self, collection: Collection, predicates: Tuple[Predicate, ...],
+                           params: Dict[str, Any]) -> Fraction:
+        """Fraction of documents matching a conjunction of predicates"""
+        selectivity = Fraction(1)
+        for predicate in predicates:
+            selectivity *= self.predicate_selectivity(collection, predicate, params)
+        return selectivity
+
+    def group_count(self, collection: Collection, group_key: str,
+                    predicates: Tuple[Predicate, ...], params: Dict[str, Any]) -> Fraction:
+        """Number of groups produced by GROUP BY `group_key` after filtering"""
+        groups = Fraction(self.distinct_values(collection, group_key))
+        for predicate in predicates:
+            stat_name = CORRELATED_DISTINCT_STATS.get((predicate.column.name, group_key))
+            if predicate.op == "=" and stat_name:
+                groups = min(groups, Fraction(getattr(self.statistics, stat_name)))
+        rows = collection.document_count * self.filter_selectivity(collection, predicates, params)
+        return min(groups, Fraction(rows))
+
+
+# ---------------------------------------------------------------------------
+# Compilation
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class CompiledQuery:
+    """
+    Operator plan for a QuerySpec. Plans do not depend on a database, so
+    they are cached by query text and reused across databases and
+    sharding strategies.
+
+    kind:
+        'filter'    -> FilterOperator.filter on the left collection
+        'join'      -> NestedLoopJoinOperator.nested_loop_join(left, right)
+        'aggregate' -> AggregateOperator.aggregator(left, right) where the
+                       right collection is grouped by `group_by_key` (None
+                       when it is already aggregated, e.g. a materialized view),
+                       or TopKAggregateOperator.top_k_aggregator when the
+                       groups are ranked by `order_by` and cut by `limit`
+    """
+    kind: str
+    spec: QuerySpec
+    left_collection: str
+    left_output_keys: Tuple[str, ...] = ()
+    left_predicates: Tuple[Predicate, ...] = ()
+    right_collection: Optional[str] = None
+    right_output_keys: Tuple[str, ...] = ()
+    right_predicates: Tuple[Predicate, ...] = ()
+    join_key: Optional[str] = None
+    group_by_key: Optional[str] = None
+    limit: Optional[int] = None
+    use_index: bool = True
+    order_by: Tuple[Tuple[str, str], ...] = ()  # (sub-query column, 'ASC' / 'DESC')
+
+    @property
+    def node_key(self) -> Tuple:
+        """
+        Canonical form of the plan: every field but `spec`, with predicates
+        stripped of their table aliases and sorted. The same plan written
+        with other aliases, spacing or predicate order gets the same key.
+        """
+        return (
+            self.kind,
+            self.left_collection, self.left_output_keys, _canonical_predicates(self.left_predicates),
+            self.right_collection, self.right_output_keys, _canonical_predicates(self.right_predicates),
+            self.join_key, self.group_by_key, self.limit, self.use_index, self.order_by
+        )
+
+    @property
+    def parameters(self) -> Tuple[str, ...]:
+        """Names of the $parameters used by the query"""
+        names = []
+        for predicate in self.left_predicates + self.right_predicates:
+            if isinstance(predicate.value, Param) and predicate.value.name not in names:
+                names.append(predicate.value.name)
+        return tuple(names)
+
+    def execute(
+        self,
+        executor,
+        sharding_strategy: Dict[str, str],
+        array_sizes: Optional[Dict[str, int]] = None,
+        **params: Any
+    ):
+        """
+        Run the plan with the operators of a QueryExecutor
+
+        Args:
+            executor: QueryExecutor providing the database, statistics and operators
+            sharding_strategy: Dict mapping collection names to sharding keys
+            array_sizes: Average array sizes
+            **params: Values of the $parameters
+
+        Returns:
+            FilterResult, JoinResult, AggregateResult or TopKAggregateResult
+        """
+        estimator = SelectivityEstimator(executor.statistics)
+        left = _get_collection(executor.database, self.left_collection)
+        left_filter_keys = [predicate.column.name for predicate in self.left_predicates]
+        left_selectivity = estimator.filter_selectivity(left, self.left_predicates, params)
+
+        if self.kind == "filter":
+            return executor.filter_op.filter(
+                collection=left,
+                filter_keys=left_filter_keys,
+                output_keys=list(self.left_output_keys),
+                sharding_key=sharding_strategy.get(self.left_collection),
+                selectivity=float(left_selectivity),
+                use_index=self.use_index,
+                array_sizes=array_sizes
+            )
+
+        right = _get_collection(executor.database, self.right_collection)
+        right_filter_keys = [predicate.column.name for predicate in self.right_predicates]
+
+        if self.kind == "join":
+            # Each outer document matches the right documents sharing its join key
+            right_selectivity = (
+                estimator.filter_selectivity(right, self.right_predicates, params)
+                / estimator.distinct_values(right, self.join_key)
+            )
+            return executor.join_op.nested_loop_join(
+                left_collection=left,
+                right_collection=right,
+                join_key=self.join_key,
+                left_output_keys=list(self.left_output_keys),
+                right_output_keys=list(self.right_output_keys),
+                left_sharding_key=sharding_strategy.get(self.left_collection),
+                right_sharding_key=sharding_strategy.get(self.right_collection),
+                left_filter_keys=left_filter_keys or None,
+                right_filter_keys=right_filter_keys or None,
+                left_filter_selectivity=float(left_selectivity),
+                right_filter_selectivity=float(right_selectivity),
+                array_sizes=array_sizes,
+                use_index=self.use_index
+            )
+
+        # Aggregate: groups of the right collection joined with the left one
+        if self.group_by_key is None:
+            # Pre-aggregated collection (materialized view): one document per group
+            groups = right.document_count * estimator.filter_selectivity(right, self.right_predicates, params)
+        else:
+            groups = estimator.group_count(right, self.group_by_key, self.right_predicates, params)
+        left_selectivity /= estimator.distinct_values(left, self.join_key)
+        aggregate = executor.top_k_op.top_k_aggregator if self.order_by else executor.aggregate_op.aggregator
+        return aggregate(
+            left_collection=left,
+            right_collection=right,
+            join_key=self.join_key,
+            limit=self.limit,
+            left_output_keys=list(self.left_output_keys),
+            right_output_keys=list(self.right_output_keys),
+            left_sharding_key=sharding_strategy.get(self.left_collection),
+            right_sharding_key=sharding_strategy.get(self.right_collection),
+            left_filter_keys=left_filter_keys or None,
+            right_filter_keys=right_filter_keys or None,
+            right_group_by_key=self.group_by_key,
+            left_filter_selectivity=float(left_selectivity),
+            right_filter_selectivity=float(groups / right.document_count),
+            array_sizes=array_sizes,
+            right_group_input_selectivity=float(
+                estimator.filter_selectivity(right, self.right_predicates, params)),
+            use_index=self.use_index
+        )
+
+
+def _canonical_predicates(predicates: Tuple[Predicate, ...]) -> Tuple:
+    """Alias-free, order-independent form of a conjunction of predicates"""
+    return tuple(sorted(
+        ((predicate.column.name, predicate.op, repr(predicate.value)) for predicate in predicates)
+    ))
+
+
+def _get_collection(database, name: str) -> Collection:
+    collection = database.get_collection(name)
+    if not collection:
+        raise ValueError(f"{name} collection not found")
+    return collection
+
+
+def _projected_keys(items: Tuple[SelectItem, ...], alias: Optional[str]) -> Tuple[str, ...]:
+    """Keys of the select items belonging to `alias` (aggregates contribute their argument)"""
+    return tuple(
+        item.column.name for item in items
+        if item.column.name != "*" and item.column.alias in (alias, None)
+    )
+
+
+def _predicates_for(predicates: Tuple[Predicate, ...], alias: str) -> Tuple[Predicate, ...]:
+    return tuple(predicate for predicate in predicates if predicate.column.alias in (alias, None))
+
+
+def _check_aliases(spec: QuerySpec, aliases: Tuple[str, ...]):
+    """Reject unknown aliases and, when joining, unqualified columns"""
+    columns = [item.column for item in spec.select if item.column.name != "*"]
+    columns += [predicate.column for predicate in spec.where]
+    for column in columns:
+        if column.alias is None and len(aliases) > 1:
+            raise ValueError(f"Column {column} must be qualified with a table alias in a join")
+        if column.alias is not None and column.alias not in aliases:
+            raise ValueError(f"Unknown table alias in {column}")
+
+
+def _compile_order_by(spec: QuerySpec, inner_table: TableRef, limit: Optional[int]) -> Tuple[Tuple[str, str], ...]:
+    """
+    ORDER BY of an aggregate query: only a top-K over the grouped sub-query
+    (ranked by its columns, cut by a LIMIT) has an operator
+    """
+    if not spec.order_by:
+        return ()
+    if limit is None:
+        raise ValueError("ORDER BY requires a LIMIT: only top-K aggregates are supported")
+    names = {item.alias or item.column.name for item in inner_table.subquery.select}
+    for column, _ in spec.order_by:
+        if column.alias != inner_table.alias or column.name not in names:
+            raise ValueError(f"ORDER BY {column} must rank a column of the grouped sub-query {inner_table.alias}")
+    return tuple((column.name, direction) for column, direction in spec.order_by)
+
+
+def compile_spec(spec: QuerySpec) -> CompiledQuery:
+    """
+    Compile a QuerySpec into an operator plan
+
+    Supported shapes:
+        - single collection with WHERE                          -> filter
+        - collection JOIN collection                            -> nested loop join
+        - collection JOIN (grouped sub-query on a collection)   -> aggregate
+          (ORDER BY sub-query column LIMIT K                    -> top-K aggregate)
+
+    Raises:
+        ValueError: For unsupported query shapes
+    """
+    if not spec.joins:
+        if spec.source.collection is None:
+            raise ValueError("A sub-query must be joined with a collection")
+        if spec.group_by:
+            raise ValueError("GROUP BY is only supported in a sub-query joined with a collection")
+        _check_aliases(spec, (spec.source.alias,))
+        if spec.order_by:
+            raise ValueError("ORDER BY is only supported on a grouped sub-query with LIMIT (top-K aggregate)")
+        return CompiledQuery(
+            kind="filter",
+            spec=spec,
+            left_collection=spec.source.collection,
+            left_output_keys=_projected_keys(spec.select, spec.source.alias),
+            left_predicates=spec.where,
+            use_index=spec.use_index
+        )
+
+    if len(spec.joins) > 1:
+        raise ValueError("Only one JOIN per compiled query is supported; use QueryOptimizer for multi-way joins")
+
+    join = spec.joins[0]
+    if join.left.name != join.right.name:
+        raise ValueError(f"Join keys must have the same name: {join.left} = {join.right}")
+    join_key = join.left.name
+    _check_aliases(spec, (spec.source.alias, join.table.alias))
+
+    tables = [spec.source, join.table]
+    grouped = [table for table in tables if table.subquery is not None]
+
+    if not grouped:
+        if spec.order_by:
+            raise ValueError("ORDER BY is only supported on a grouped sub-query with LIMIT (top-K aggregate)")
+        left, right = tables
+        return CompiledQuery(
+            kind="join",
+            spec=spec,
+            left_collection=left.collection,
+            left_output_keys=_projected_keys(spec.select, left.alias),
+            left_predicates=_predicates_for(spec.where, left.alias),
+            right_collection=right.collection,
+            right_output_keys=_projected_keys(spec.select, right.alias),
+            right_predicates=_predicates_for(spec.where, right.alias),
+            join_key=join_key,
+            use_index=spec.use_index
+        )
+
+    if len(grouped) > 1:
+        raise ValueError("Joining two sub-queries is not supported")
+    inner_table = grouped[0]
+    outer_table = tables[1] if inner_table is tables[0] else tables[0]
+    inner = inner_table.subquery
+
+    if inner.joins or inner.source.collection is None:
+        raise ValueError("A sub-query must read a single collection")
+    if len(inner.group_by) != 1:
+        raise ValueError("A joined sub-query must GROUP BY exactly one key")
+    if _predicates_for(spec.where, inner_table.alias):
+        raise ValueError("Filtering on a sub-query result is not supported")
+    if inner.order_by:
+        raise ValueError("ORDER BY inside a sub-query is not supported")
+    _check_aliases(inner, (inner.source.alias,))
+    limit = spec.limit if spec.limit is not None else inner.limit
+
+    return CompiledQuery(
+        kind="aggregate",
+        spec=spec,
+        left_collection=outer_table.collection,
+        left_output_keys=_projected_keys(spec.select, outer_table.alias),
+        left_predicates=_predicates_for(spec.where, outer_table.alias),
+        right_collection=inner.source.collection,
+        right_output_keys=_projected_keys(inner.select, inner.source.alias),
+        right_predicates=inner.where,
+        join_key=join_key,
+        group_by_key=inner.group_by[0].name,
+        limit=limit,
+        use_index=spec.use_index,
+        order_by=_compile_order_by(spec, inner_table, limit)
+    )
+
+
+@lru_cache(maxsize=256)
+def compile_sql(text: str) -> CompiledQuery:
+    """Parse and compile a SQL query (cached by query text)"""
+    return compile_spec(parse_sql(text))
+
+
+@lru_cache(maxsize=256)
+def _compile_json_spec(spec_json: str) -> CompiledQuery:
+    return compile_spec(spec_from_dict(json.loads(spec_json)))
+
+
+def compile_query(query: Union[str, Dict[str, Any], QuerySpec]) -> CompiledQuery:
+    """
+    Compile SQL text, a JSON/YAML-style dict spec or a QuerySpec (cached)
+    """
+    if isinstance(query, QuerySpec):
+        return compile_spec(query)
+    if isinstance(query, dict):
+        return _compile_json_spec(json.dumps(query, sort_keys=True))
+    return compile_sql(query)
+
+
+def load_query_specs(filepath: str) -> Dict[str, CompiledQuery]:
+    """
+    Load named queries from a JSON (or YAML, if PyYAML is installed) file
+
+    Expected format: {"Q1": "SELECT ...", "Q2": {"sql": "...", "use_index": false}, ...}
+    where values are SQL strings or dict specs (see `spec_from_dict`).
+
+    Returns:
+        Dict mapping query names to compiled plans
+    """
+    with open(filepath, 'r') as f:
+        if filepath.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to load YAML query specs (pip install pyyaml)")
+            specs = yaml.safe_load(f)
+        else:
+            specs = json.load(f)
+
+    return {name: compile_query(spec) for name, spec in specs.items()}
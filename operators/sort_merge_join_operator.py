@@ -0,0 +1,257 @@
+"""
+Sort-merge join operator for query execution
+Models a distributed sort: shuffle by join key, run generation and k-way
+merge passes on every server, then a streaming merge join
+"""
+
+from typing import List, Dict, Optional
+from dataclasses import dataclass, field
+from models.schema import Collection
+from models.statistics import Statistics
+from calculators.size_calculator import SizeCalculator
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
+from config.constants import SORT_BUFFER_BYTES
+from .cost_model import CostModel, QueryCost
+from .filter_operator import FilterOperator
+from .join_operator import JoinResult
+
+
+@dataclass
+class SortMergePhase:
+    """Volume and cost of one phase of a sort-merge join"""
+    name: str  # 'scan', 'shuffle', 'sort' or 'merge'
+    network_bytes: int  # Bytes sent over the network
+    disk_bytes: int  # Bytes read and written on disk, per server
+    cost: QueryCost
+
+
+@dataclass
+class SortMergeJoinResult(JoinResult):
+    """
+    Result of a sort-merge join
+
+    Same fields as JoinResult (o1 / o2 are the total filtered documents of
+    each side, num_loops is 1), plus the shuffle accounting of
+    AggregateResult and the external sort parameters.
+    """
+    shuffle_size_bytes1: int = 0  # Size of a shuffled left document
+    shuffle_size_bytes2: int = 0  # Size of a shuffled right document
+    shuffle1: int = 0  # Left documents moved to the shard owning their join key
+    shuffle2: int = 0  # Right documents moved to the shard owning their join key
+    bytes_per_server: int = 0  # Data sorted by each server
+    num_runs: int = 1  # Sorted runs per server
+    merge_fan_in: int = 0  # Runs merged per pass
+    merge_passes: int = 0  # Merge passes over the data (0 = sorted in memory)
+    output_docs: int = 0  # Joined documents returned to the coordinator
+    phases: List[SortMergePhase] = field(default_factory=list)
+
+
+class SortMergeJoinOperator:
+    """
+    Sort-merge join operator for joins over inputs too large for a nested
+    loop or an in-memory hash join
+    """
+
+    def __init__(self, statistics: Statistics,
+                 memory_per_server_bytes: Optional[int] = None,
+                 sort_buffer_bytes: int = SORT_BUFFER_BYTES,
+                 profile: Optional[ClusterProfile] = None):
+        """
+        Initialize the sort-merge join operator
+
+        Args:
+            statistics: Database statistics
+            memory_per_server_bytes: RAM available to the sort on each server
+                (default: the profile's RAM per server)
+            sort_buffer_bytes: Buffer per run while merging (sets the merge fan-in)
+            profile: Cluster hardware profile (default: DEFAULT_PROFILE)
+        """
+        self.profile = profile or DEFAULT_PROFILE
+        self.statistics = self.profile.apply_to(statistics)
+        self.size_calculator = SizeCalculator(self.statistics)
+        self.cost_model = CostModel.for_profile(self.profile)
+        self.memory_per_server_bytes = memory_per_server_bytes or self.profile.memory_per_server_bytes
+        self.merge_fan_in = max(self.memory_per_server_bytes // sort_buffer_bytes - 1, 2)
+        self.filter_operator = FilterOperator(statistics, self.profile)
+
+    def calculate_join_input_size(self, collection: Collection, join_key: str,
+                                  output_keys: List[str], filter_keys: Optional[List[str]] = None) -> int:
+        """Size of a projection on the output, filter and join keys (cached)"""
+        input_keys = list(output_keys) + list(filter_keys or []) + [join_key]
+        return self.size_calculator.calculate_projection_size(collection.schema, input_keys)
+
+    def calculate_join_output_size(self, collection: Collection, output_keys: List[str]) -> int:
+        """Size of a projection on the output keys (cached)"""
+        return self.size_calculator.calculate_projection_size(collection.schema, output_keys)
+
+    def calculate_join_shuffle_size(self, collection: Collection, join_key: str,
+                                    output_keys: List[str]) -> int:
+        """Size of a shuffled document: output keys plus the join key (cached)"""
+        return self.size_calculator.calculate_projection_size(collection.schema, list(output_keys) + [join_key])
+
+    def _servers_accessed(self, collection: Collection, sharding_key: Optional[str],
+                          filter_keys: Optional[List[str]]):
+        """Servers reached by one side and documents they access"""
+        if sharding_key and filter_keys and sharding_key in filter_keys:
+            return 1, collection.document_count / self.statistics.num_servers
+        return self.statistics.num_servers, collection.document_count
+
+    def sort_merge_join(
+        self,
+        left_collection: Collection,
+        right_collection: Collection,
+        join_key: str,
+        left_output_keys: Optional[List[str]],
+        right_output_keys: Optional[List[str]],
+        left_sharding_key: Optional[str] = None,
+        right_sharding_key: Optional[str] = None,
+        left_filter_keys: Optional[List[str]] = None,
+        right_filter_keys: Optional[List[str]] = None,
+        left_filter_selectivity: float = 1.0,
+        right_filter_selectivity: float = 1.0,
+        join_key_distinct_values: Optional[int] = None,
+        array_sizes: Optional[Dict[str, int]] = None
+    ) -> SortMergeJoinResult:
+        """
+        Execute a sort-merge join
+
+        Phases:
+            scan: both sides are read from storage (pages missing from the
+                buffer cache come from disk)
+            shuffle: each filtered document not already on the shard owning
+                its join key is sent there (none if the side is sharded on the join key)
+            sort: every server sorts its partition of both sides (external
+                merge sort when it does not fit in memory)
+            merge: sorted partitions are merged and the joined documents are
+                returned to the coordinator
+
+        Args:
+            left_collection, right_collection: Collections to join
+            join_key: Key to join on
+            left_output_keys, right_output_keys: Keys to include in output (None: no keys)
+            left_sharding_key, right_sharding_key: Sharding keys (if any)
+            left_filter_keys, right_filter_keys: Filter keys (if any)
+            left_filter_selectivity, right_filter_selectivity: Fraction of
+                documents passing each filter
+            join_key_distinct_values: Distinct join key values on the right side
+                (default: right document count, i.e. a unique key)
+            array_sizes: Average sizes for arrays
+
+        Returns:
+            SortMergeJoinResult with per-phase volumes and costs
+        """
+        num_servers = self.statistics.num_servers
+        left_output_keys = list(left_output_keys or [])
+        right_output_keys = list(right_output_keys or [])
+
+        s1, total_document_accessed_left = self._servers_accessed(
+            left_collection, left_sharding_key, left_filter_keys)
+        s2, total_document_accessed_right = self._servers_accessed(
+            right_collection, right_sharding_key, right_filter_keys)
+
+        o1 = int(left_collection.document_count * left_filter_selectivity)
+        o2 = int(right_collection.document_count * right_filter_selectivity)
+        output_docs = int(o1 * o2 / (join_key_distinct_values or right_collection.document_count))
+
+        input_doc_size_1 = self.calculate_join_input_size(left_collection, join_key, left_output_keys, left_filter_keys)
+        output_doc_size_1 = self.calculate_join_output_size(left_collection, left_output_keys)
+        shuffle_doc_size_1 = self.calculate_join_shuffle_size(left_collection, join_key, left_output_keys)
+
+        input_doc_size_2 = self.calculate_join_input_size(right_collection, join_key, right_output_keys, right_filter_keys)
+        output_doc_size_2 = self.calculate_join_output_size(right_collection, right_output_keys)
+        shuffle_doc_size_2 = self.calculate_join_shuffle_size(right_collection, join_key, right_output_keys)
+
+        # Storage: each side is read once (through an index on its filter keys
+        # if the catalog has one, otherwise scanned)
+        storage_left, pages_read1, cache_hit_ratio1, index1 = self.filter_operator.calculate_read_cost(
+            left_collection, left_filter_keys, total_document_accessed_left, o1, s1, array_sizes=array_sizes)
+        storage_right, pages_read2, cache_hit_ratio2, index2 = self.filter_operator.calculate_read_cost(
+            right_collection, right_filter_keys, total_document_accessed_right, o2, s2, array_sizes=array_sizes)
+        storage_cost = storage_left + storage_right
+        scan_disk_bytes = int(
+            (pages_read1 * (1 - cache_hit_ratio1) + pages_read2 * (1 - cache_hit_ratio2))
+            * self.profile.page_size_bytes
+        )
+
+        # Shuffle: a document stays put with probability 1/N
+        shuffle1 = 0 if left_sharding_key == join_key else int(o1 * (num_servers - 1) / num_servers)
+        shuffle2 = 0 if right_sharding_key == join_key else int(o2 * (num_servers - 1) / num_servers)
+
+        c1_volume = s1 * input_doc_size_1 + shuffle1 * shuffle_doc_size_1
+        c2_volume = s2 * input_doc_size_2 + shuffle2 * shuffle_doc_size_2
+
+        shuffle_cost = (
+            self.cost_model.calculate_communication_cost(
+                data_volume_bytes=c1_volume,
+                num_servers_involved=s1,
+                num_documents=total_document_accessed_left,
+                coordinator_bytes=s1 * input_doc_size_1
+            )
+            + self.cost_model.calculate_communication_cost(
+                data_volume_bytes=c2_volume,
+                num_servers_involved=s2,
+                num_documents=total_document_accessed_right,
+                coordinator_bytes=s2 * input_doc_size_2
+            )
+        )
+
+        # Sort: both sides are spread over every server by join key
+        bytes_per_server = int((o1 * shuffle_doc_size_1 + o2 * shuffle_doc_size_2) / num_servers)
+        sort_cost, num_runs, merge_passes = self.cost_model.calculate_external_sort_cost(
+            bytes_per_server=bytes_per_server,
+            memory_bytes=self.memory_per_server_bytes,
+            merge_fan_in=self.merge_fan_in,
+            num_servers_involved=num_servers
+        )
+        sort_disk_bytes = 2 * bytes_per_server * merge_passes if num_runs > 1 else 0
+
+        # Merge: joined documents are streamed back to the coordinator
+        result_volume = output_docs * (output_doc_size_1 + output_doc_size_2)
+        merge_cost = self.cost_model.calculate_communication_cost(
+            data_volume_bytes=result_volume,
+            num_servers_involved=num_servers,
+            num_documents=output_docs
+        )
+
+        phases = [
+            SortMergePhase("scan", 0, scan_disk_bytes, storage_cost),
+            SortMergePhase("shuffle", c1_volume + c2_volume, 0, shuffle_cost),
+            SortMergePhase("sort", 0, sort_disk_bytes, sort_cost),
+            SortMergePhase("merge", result_volume, 0, merge_cost),
+        ]
+
+        return SortMergeJoinResult(
+            output_size_bytes1=output_doc_size_1,
+            input_size_bytes1=input_doc_size_1,
+            output_size_bytes2=output_doc_size_2,
+            input_size_bytes2=input_doc_size_2,
+            cost=storage_cost + shuffle_cost + sort_cost + merge_cost,
+            left_sharding_key=left_sharding_key,
+            right_sharding_key=right_sharding_key,
+            join_key=join_key,
+            num_loops=1,
+            s1=s1,
+            o1=o1,
+            s2=s2,
+            o2=o2,
+            c1_volume_bytes=c1_volume,
+            c2_volume_bytes=c2_volume,
+            num_messages=s1 + s2,
+            shuffle_size_bytes1=shuffle_doc_size_1,
+            shuffle_size_bytes2=shuffle_doc_size_2,
+            shuffle1=shuffle1,
+            shuffle2=shuffle2,
+            bytes_per_server=bytes_per_server,
+            num_runs=num_runs,
+            merge_fan_in=self.merge_fan_in,
+            merge_passes=merge_passes,
+            output_docs=output_docs,
+            phases=phases,
+            storage_cost=storage_cost,
+            pages_read1=pages_read1,
+            pages_read2=pages_read2,
+            cache_hit_ratio1=cache_hit_ratio1,
+            cache_hit_ratio2=cache_hit_ratio2,
+            index_name1=index1.name if index1 else None,
+            index_name2=index2.name if index2 else None,
+        )
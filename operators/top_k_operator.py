@@ -0,0 +1,143 @@
+"""
+Top-K aggregate operator for ORDER BY ... LIMIT queries
+Each server keeps its K best complete groups; the coordinator merges the
+K x servers candidates instead of receiving the whole grouped result
+"""
+
+from typing import List, Dict, Optional
+from dataclasses import dataclass, fields, replace
+from models.schema import Collection
+from models.statistics import Statistics
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
+from .cost_model import CostModel, QueryCost
+from .aggregate_operator import AggregateOperator, AggregateResult
+
+
+@dataclass
+class TopKAggregateResult(AggregateResult):
+    """
+    Result of an aggregate with top-K pushdown
+
+    Same fields as AggregateResult (o1 is still the number of groups), plus
+    the candidates merged at the coordinator and the savings compared with
+    AggregateOperator.aggregator.
+    """
+    k: int = 0  # LIMIT
+    top_k_candidates: int = 0  # Groups sent to the coordinator: min(K * servers, o1)
+    merge_cost: Optional[QueryCost] = None  # Coordinator merge of the candidates
+    baseline_cost: Optional[QueryCost] = None  # AggregateOperator.aggregator cost, unmodified
+    saved_documents: int = 0  # Groups that no longer travel to the coordinator
+    saved_volume_bytes: int = 0  # saved_documents * size(O1)
+
+    @property
+    def saved_time_ms(self) -> float:
+        """Time saved compared with AggregateOperator.aggregator"""
+        return self.baseline_cost.time_ms - self.cost.time_ms
+
+
+class TopKAggregateOperator:
+    """
+    Aggregate operator pushing ORDER BY ... LIMIT K down to the servers
+    """
+
+    def __init__(self, statistics: Statistics, profile: Optional[ClusterProfile] = None):
+        """
+        Initialize the top-K aggregate operator
+
+        Args:
+            statistics: Database statistics
+            profile: Cluster hardware profile (default: DEFAULT_PROFILE)
+        """
+        self.profile = profile or DEFAULT_PROFILE
+        self.statistics = self.profile.apply_to(statistics)
+        self.cost_model = CostModel.for_profile(self.profile)
+        self.aggregate_operator = AggregateOperator(statistics, self.profile)
+
+    def top_k_aggregator(
+        self,
+        left_collection: Collection,
+        right_collection: Collection,
+        join_key: str,
+        limit: int,
+        left_output_keys: Optional[List[str]],
+        right_output_keys: Optional[List[str]],
+        array_sizes: Optional[Dict[str, int]] = None,
+        **aggregator_args
+    ) -> TopKAggregateResult:
+        """
+        Execute an aggregate with top-K pushdown
+
+        Groups are complete once shuffled to the server owning them (or
+        directly when the collection is sharded on the GROUP BY key), so each
+        of these servers sorts its groups and only sends its K best ones.
+        When no server holds more than K groups nothing can be pruned, and
+        the plan and cost of the aggregator are kept unchanged.
+
+        Args:
+            left_collection, right_collection, join_key, left_output_keys,
+            right_output_keys, array_sizes: As in AggregateOperator.aggregator
+            limit: K, the number of groups returned
+            **aggregator_args: Other AggregateOperator.aggregator arguments
+                (sharding and filter keys, selectivities, aggregation mode)
+
+        Returns:
+            TopKAggregateResult with the pushdown cost and its savings
+
+        Raises:
+            ValueError: If the query has no LIMIT
+        """
+        if not limit or limit < 1:
+            raise ValueError(f"Top-K pushdown requires a positive LIMIT, got {limit}")
+
+        baseline = self.aggregate_operator.aggregator(
+            left_collection=left_collection,
+            right_collection=right_collection,
+            join_key=join_key,
+            limit=limit,
+            left_output_keys=left_output_keys,
+            right_output_keys=right_output_keys,
+            array_sizes=array_sizes,
+            **aggregator_args
+        )
+
+        # Every server holding complete groups sends at most K of them
+        top_k_candidates = min(limit * baseline.s1, baseline.o1)
+        saved_documents = baseline.o1 - top_k_candidates
+        saved_volume = saved_documents * baseline.output_size_bytes1
+
+        if saved_documents == 0:
+            # Nothing to prune: keep the aggregator's plan
+            return TopKAggregateResult(
+                **{f.name: getattr(baseline, f.name) for f in fields(baseline)},
+                k=limit,
+                top_k_candidates=top_k_candidates,
+                merge_cost=QueryCost(time_ms=0, carbon_gco2=0, price_usd=0),
+                baseline_cost=replace(baseline.cost),
+            )
+
+        # Same plan, priced with only the candidates in C1, plus their merge
+        pushdown = self.aggregate_operator.aggregator(
+            left_collection=left_collection,
+            right_collection=right_collection,
+            join_key=join_key,
+            limit=limit,
+            left_output_keys=left_output_keys,
+            right_output_keys=right_output_keys,
+            array_sizes=array_sizes,
+            right_output_docs=top_k_candidates,
+            **aggregator_args
+        )
+        merge_cost = self.cost_model.calculate_top_k_merge_cost(top_k_candidates, limit)
+        cost = pushdown.cost + merge_cost
+
+        values = {f.name: getattr(pushdown, f.name) for f in fields(pushdown)}
+        values.update(cost=cost)
+        return TopKAggregateResult(
+            **values,
+            k=limit,
+            top_k_candidates=top_k_candidates,
+            merge_cost=merge_cost,
+            baseline_cost=baseline.cost,
+            saved_documents=saved_documents,
+            saved_volume_bytes=saved_volume,
+        )
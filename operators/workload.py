@@ -0,0 +1,167 @@
+"""
+Workload definitions for costing a mix of queries at given rates
+"""
+
+import copy
+import functools
+import inspect
+import re
+from typing import Dict, List, Any, Union, Tuple, Callable
+from dataclasses import dataclass, field
+from models.schema import Collection, FrozenCollection
+from .cost_model import QueryCost
+
+
+# Operator entry points whose results are plan nodes shared across a workload
+PLAN_NODE_METHODS = frozenset({
+    "filter", "nested_loop_join", "hash_join", "co_located_join", "broadcast_join",
+    "sort_merge_join", "aggregator", "top_k_aggregator"
+})
+
+
+@dataclass
+class WorkloadEntry:
+    """One query of a workload, executed `frequency_per_s` times per second"""
+    query: str  # Query identifier, e.g. "Q1", or SQL text
+    frequency_per_s: float
+    params: Dict[str, Any] = field(default_factory=dict)  # e.g. {"brand": "Apple"} for Q2/Q5
+
+    @staticmethod
+    def from_any(entry: Union['WorkloadEntry', Tuple]) -> 'WorkloadEntry':
+        """
+        Build an entry from a WorkloadEntry or a (query, params, frequency_per_s) tuple
+        """
+        if isinstance(entry, WorkloadEntry):
+            return entry
+        query, params, frequency_per_s = entry
+        return WorkloadEntry(query=query, frequency_per_s=frequency_per_s, params=dict(params or {}))
+
+    @property
+    def query_id(self) -> str:
+        """
+        Normalized query identifier ("q1", 1 and "Q1" all give "Q1");
+        SQL text is returned unchanged
+        """
+        query = str(self.query).strip()
+        if not re.fullmatch(r"[Qq]?\d+", query):
+            return query
+        query = query.upper()
+        return query if query.startswith("Q") else f"Q{query}"
+
+
+@dataclass
+class WorkloadQueryResult:
+    """Cost of one workload entry"""
+    entry: WorkloadEntry
+    result: Any  # FilterResult, JoinResult or AggregateResult of a single execution
+    cost_per_s: QueryCost  # Single execution cost × frequency
+
+
+@dataclass
+class WorkloadResult:
+    """Throughput-weighted cost of a whole workload"""
+    queries: List[WorkloadQueryResult]
+    total_cost_per_s: QueryCost  # Sum of every query cost × frequency
+    total_frequency_per_s: float
+    executions: int = 0  # Distinct (plan, params) executions actually priced
+    reused: int = 0  # Entries served from an already priced execution
+    shared_sub_results: int = 0  # Filter/join/aggregate nodes served from an already priced node
+
+    @property
+    def avg_time_ms(self) -> float:
+        """Frequency-weighted average time of one query"""
+        if not self.total_frequency_per_s:
+            return 0.0
+        return self.total_cost_per_s.time_ms / self.total_frequency_per_s
+
+    def __str__(self) -> str:
+        """String representation of workload cost"""
+        lines = [f"Workload ({len(self.queries)} queries, {self.total_frequency_per_s:,.2f} queries/s)"]
+        for query_result in self.queries:
+            entry = query_result.entry
+            cost = query_result.cost_per_s
+            lines.append(
+                f"  {entry.query_id:<4} {entry.frequency_per_s:>10,.2f}/s  "
+                f"time: {cost.time_ms:,.3f} ms/s  carbon: {cost.carbon_gco2:,.2f} gCO2/s  "
+                f"price: ${cost.price_usd:,.6f}/s"
+            )
+        total = self.total_cost_per_s
+        lines.append(
+            f"  Total            time: {total.time_ms:,.3f} ms/s  carbon: {total.carbon_gco2:,.2f} gCO2/s  "
+            f"price: ${total.price_usd:,.6f}/s"
+        )
+        lines.append(f"  Average time per query: {self.avg_time_ms:,.3f} ms")
+        return "\n".join(lines)
+
+
+def _canonical(value: Any) -> Any:
+    """Hashable, identity-free form of an operator argument"""
+    if isinstance(value, (Collection, FrozenCollection)):
+        return value.freeze()
+    if isinstance(value, dict):
+        return tuple(sorted((key, _canonical(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonical(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_canonical(item) for item in value))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def plan_node_key(method: Callable[..., Any], args: Tuple, kwargs: Dict[str, Any]) -> Tuple:
+    """
+    Canonical key of one operator call: operator class, method and bound
+    arguments (defaults applied, collections by their frozen structure).
+    Query text and table aliases never reach the operators, so two queries
+    computing the same node get the same key.
+    """
+    bound = inspect.signature(method).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = tuple((name, _canonical(value)) for name, value in bound.arguments.items())
+    return (type(method.__self__).__name__, method.__name__, arguments)
+
+
+class SharedResults:
+    """
+    Filter, join and aggregate results shared by the queries of a workload
+
+    Every call of an operator entry point (see PLAN_NODE_METHODS) is a plan
+    node keyed by `plan_node_key`; a node already priced for another query,
+    or another step of the same plan, is returned without being priced again.
+    """
+
+    def __init__(self):
+        self.results: Dict[Tuple, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def call(self, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run `method` or return a copy of the result of the same node"""
+        key = plan_node_key(method, args, kwargs)
+        if key in self.results:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.results[key] = method(*args, **kwargs)
+        return copy.copy(self.results[key])
+
+    def wrap(self, operator: Any) -> '_SharedOperator':
+        """Proxy of `operator` whose entry points go through this cache"""
+        return _SharedOperator(operator, self)
+
+
+class _SharedOperator:
+    """Operator proxy routing the PLAN_NODE_METHODS through a SharedResults"""
+
+    def __init__(self, operator: Any, shared: SharedResults):
+        self._operator = operator
+        self._shared = shared
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._operator, name)
+        if name in PLAN_NODE_METHODS and callable(attribute):
+            return functools.partial(self._shared.call, attribute)
+        return attribute
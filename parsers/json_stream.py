@@ -0,0 +1,130 @@
+"""
+Incremental reader for JSON files whose top level is one large object
+"""
+
+import codecs
+import json
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+
+class JsonObjectStream:
+    """
+    Iterate over the members of a top-level JSON object without loading the
+    whole file.
+
+    Only the member currently being decoded is held in memory: each value is
+    decoded with the C JSON scanner as soon as it is complete in the buffer,
+    then the consumed text is dropped.
+    """
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = 1 << 16):
+        """
+        Args:
+            stream: File object opened in binary mode
+            chunk_size: Minimum number of bytes read at a time
+        """
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._base = 0  # byte offset of self._buffer[0] in the file
+        self._eof = False
+
+    def _read_more(self, size: int = 0) -> bool:
+        """Append at least `size` more bytes to the buffer. Returns False at end of file."""
+        if self._eof:
+            return False
+        chunk = self.stream.read(max(size, self.chunk_size))
+        self._eof = not chunk
+        self._buffer += self._decoder.decode(chunk, final=self._eof)
+        return not self._eof
+
+    def _error(self, message: str, pos: int) -> ValueError:
+        return ValueError(f"{message} at character {pos} after byte {self._base}")
+
+    def _char_at(self, pos: int) -> str:
+        """Return the character at `pos`, reading more input if needed"""
+        while pos >= len(self._buffer):
+            if not self._read_more():
+                raise self._error("Unexpected end of JSON input", pos)
+        return self._buffer[pos]
+
+    def _skip_whitespace(self, pos: int) -> int:
+        while self._char_at(pos) in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def _decode_at(self, pos: int) -> Tuple[object, int]:
+        """
+        Decode the JSON value starting at `pos`, reading more input until it
+        is complete. A value that ends exactly at the end of the buffer may
+        be truncated (e.g. a number), so more input is read in that case too.
+
+        Returns:
+            (value, index just after the value)
+        """
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, pos)
+                if end < len(self._buffer) or self._eof:
+                    return value, end
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            # Grow geometrically so large values are not re-decoded too often
+            self._read_more(len(self._buffer) - pos)
+
+    def members(
+        self,
+        select: Optional[Callable[[str], bool]] = None
+    ) -> Iterator[Tuple[str, Optional[object], int, int]]:
+        """
+        Yield the members of the top-level object in file order.
+
+        Args:
+            select: Predicate on keys; None is yielded instead of the value
+                for non-selected members (their decoded value is dropped
+                immediately). All values are yielded when omitted.
+
+        Yields:
+            (key, value or None, byte offset of the value, byte offset after the value)
+        """
+        pos = self._skip_whitespace(0)
+        if self._char_at(pos) != "{":
+            raise self._error("Expected a JSON object", pos)
+        pos += 1
+
+        while True:
+            pos = self._skip_whitespace(pos)
+            token = self._char_at(pos)
+            if token == "}":
+                return
+            if token == ",":
+                pos = self._skip_whitespace(pos + 1)
+                token = self._char_at(pos)
+            if token != '"':
+                raise self._error("Expected a member name", pos)
+
+            key, pos = self._decode_at(pos)
+
+            pos = self._skip_whitespace(pos)
+            if self._char_at(pos) != ":":
+                raise self._error("Expected ':'", pos)
+            start = self._skip_whitespace(pos + 1)
+            value, end = self._decode_at(start)
+
+            if select is not None and not select(key):
+                value = None
+
+            start_byte = self._base + len(self._buffer[:start].encode('utf-8'))
+            end_byte = start_byte + len(self._buffer[start:end].encode('utf-8'))
+
+            yield key, value, start_byte, end_byte
+
+            # Drop the consumed text to keep memory flat
+            self._base = end_byte
+            self._buffer = self._buffer[end:]
+            pos = 0
@@ -0,0 +1,105 @@
+"""
+Checks for the single-phase, repartition and two-phase GROUP BY and the top-K pushdown
+Run with pytest or directly: python tests/test_aggregate_operator.py
+"""
+
+import sys
+import os
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from models.statistics import Statistics
+from parsers.schema_parser import SchemaParser
+from operators import QueryExecutor
+
+
+ARRAY_SIZES = {"categories": 2}
+
+
+def _executor(db_num: int = 1) -> QueryExecutor:
+    stats = Statistics()
+    db = SchemaParser.build_db_from_json(db_num, stats, os.path.join(ROOT, "schemas", f"db{db_num}.json"))
+    return QueryExecutor(db, stats)
+
+
+def test_single_phase_keeps_the_baseline():
+    """Default single phase: one shuffled document per group and server (o1 * (S-1))"""
+    executor = _executor(1)
+    result = executor.execute_q6({"OrderLine": "IDC", "Product": "IDP"}, ARRAY_SIZES)
+    assert result.aggregation == "single"
+    assert result.shuffle1 == result.o1 * (result.s1 - 1) == 99_900_000
+    assert round(result.cost.time_ms, 1) == 133_608.6
+
+
+def test_two_phase_never_costs_more_than_the_baseline():
+    """Q6 on DB1: shards hold more documents than groups, both modes shuffle the same"""
+    executor = _executor(1)
+    strategy = {"OrderLine": "IDC", "Product": "IDP"}
+    single = executor.execute_q6(strategy, ARRAY_SIZES)
+    two_phase = executor.execute_q6(strategy, ARRAY_SIZES, aggregation="two_phase")
+    assert two_phase.partials1 == 100_000_000
+    assert two_phase.shuffle1 == single.shuffle1
+    assert two_phase.cost.time_ms <= single.cost.time_ms
+
+
+def test_two_phase_beats_the_baseline_on_sparse_shards():
+    """Q7 with OrderLine sharded on IDW: 400 documents over 1,000 servers, 399 partials shuffled"""
+    executor = _executor(1)
+    strategy = {"OrderLine": "IDW", "Product": "IDP"}
+    single = executor.execute_q7(strategy, ARRAY_SIZES)
+    two_phase = executor.execute_q7(strategy, ARRAY_SIZES, aggregation="two_phase")
+    assert (single.shuffle1, two_phase.shuffle1) == (19_980, 399)
+    assert two_phase.c1_volume_bytes < single.c1_volume_bytes
+    assert two_phase.cost.time_ms * 5 < single.cost.time_ms
+
+
+def test_repartition_shuffles_group_input_documents():
+    """Opt-in repartition: each document entering the GROUP BY leaves with probability (S-1)/S"""
+    executor = _executor(1)
+    result = executor.execute_q6({"OrderLine": "IDC", "Product": "IDP"}, ARRAY_SIZES, aggregation="repartition")
+    assert result.shuffle1 == int(result.group_input_docs1 * (result.s1 - 1) / result.s1)
+    assert result.shuffle1 > executor.execute_q6({"OrderLine": "IDC", "Product": "IDP"}, ARRAY_SIZES).shuffle1
+
+
+def test_no_shuffle_when_sharded_on_group_by_key():
+    """OrderLine sharded on IDP: groups are already complete on each shard"""
+    executor = _executor(1)
+    for aggregation in ("single", "repartition", "two_phase"):
+        result = executor.execute_q6({"OrderLine": "IDP", "Product": "IDP"}, ARRAY_SIZES,
+                                     aggregation=aggregation)
+        assert result.shuffle1 == 0
+
+
+def test_top_k_pushdown_never_costs_more():
+    """Q6 top-100 pushdown on 10 servers: fewer groups reach the coordinator"""
+    stats = Statistics(num_servers=10)
+    db = SchemaParser.build_db_from_json(1, stats, os.path.join(ROOT, "schemas", "db1.json"))
+    result = QueryExecutor(db, stats).execute_q6({"OrderLine": "IDP", "Product": "IDP"}, ARRAY_SIZES,
+                                                 top_k_pushdown=True)
+    assert result.top_k_candidates == 100 * 10
+    assert result.saved_volume_bytes > 0
+    assert 0 < result.cost.latency_ms <= result.baseline_cost.latency_ms
+    assert result.cost.time_ms <= result.baseline_cost.time_ms
+
+
+def test_top_k_pushdown_without_gain_keeps_the_aggregator_plan():
+    """Default stats, OrderLine on IDC: 1,000 servers x K = 100 exceeds the 10^5 groups"""
+    executor = _executor(1)
+    strategy = {"OrderLine": "IDC", "Product": "IDP"}
+    plain = executor.execute_q6(strategy, ARRAY_SIZES)
+    result = executor.execute_q6(strategy, ARRAY_SIZES, top_k_pushdown=True)
+
+    assert result.top_k_candidates == result.o1 == 100_000
+    assert result.saved_documents == 0 and result.saved_volume_bytes == 0
+    assert result.baseline_cost == plain.cost
+    assert result.cost == plain.cost
+    assert result.saved_time_ms == 0
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
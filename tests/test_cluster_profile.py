@@ -0,0 +1,83 @@
+"""
+Checks for cluster profiles and the cost models bound to them
+Run with pytest or directly: python tests/test_cluster_profile.py
+"""
+
+import sys
+import os
+import tempfile
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
+from models.statistics import Statistics
+from parsers.schema_parser import SchemaParser
+from operators import QueryExecutor
+from operators.cost_model import CostModel
+
+
+PROFILES_DIR = os.path.join(ROOT, "profiles")
+STRATEGY = {"Stock": "IDP", "Product": "IDP", "OrderLine": "IDC"}
+
+
+def _executor(db_num: int = 1, profile: ClusterProfile = None) -> QueryExecutor:
+    stats = Statistics()
+    db = SchemaParser.build_db_from_json(db_num, stats, os.path.join(ROOT, "schemas", f"db{db_num}.json"))
+    return QueryExecutor(db, stats, profile=profile)
+
+
+def test_default_toml_matches_the_constants():
+    """profiles/default.toml holds the values of config/constants.py"""
+    profile = ClusterProfile.from_file(os.path.join(PROFILES_DIR, "default.toml"))
+    assert profile == DEFAULT_PROFILE
+    assert CostModel.for_profile(profile) is CostModel.for_profile()
+
+
+def test_json_profile():
+    """profiles/10gbe.json is named after its file and overrides the server count"""
+    profile = ClusterProfile.from_file(os.path.join(PROFILES_DIR, "10gbe.json"))
+    assert profile.name == "10gbe"
+    assert profile.num_servers == 100
+    assert profile.bandwidth_bytes_per_ms == 1_250_000
+    assert profile.coordinator_bandwidth_bytes_per_ms == profile.bandwidth_bytes_per_ms
+
+    executor = _executor(profile=profile)
+    assert executor.statistics.num_servers == 100
+    baseline = _executor().execute_q1(STRATEGY)
+    faster = executor.execute_q1(STRATEGY)
+    assert faster.cost.time_ms < baseline.cost.time_ms
+
+
+def test_profile_errors():
+    """Unknown keys, invalid values and unsupported formats are rejected"""
+    for build in (
+        lambda: ClusterProfile.from_dict({"bandwith_bytes_per_s": 1}),
+        lambda: ClusterProfile(num_servers=0),
+        lambda: ClusterProfile(buffer_cache_fraction=1.5),
+    ):
+        try:
+            build()
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cluster.yaml")
+        with open(path, 'w') as f:
+            f.write("num_servers: 10\n")
+        try:
+            ClusterProfile.from_file(path)
+        except ValueError as e:
+            assert ".yaml" in str(e)
+        else:
+            raise AssertionError("expected ValueError")
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
@@ -0,0 +1,199 @@
+"""
+Checks for the cost model: memoized costs, profiles and batch evaluation
+Run with pytest or directly: python tests/test_cost_model.py
+"""
+
+import sys
+import os
+import math
+import itertools
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from config.cluster_profile import ClusterProfile, DEFAULT_PROFILE
+from models.statistics import Statistics
+from parsers.schema_parser import SchemaParser
+from operators import QueryExecutor, QueryOptimizer
+from operators.cost_model import CostModel, QueryCost, QueryCostBatch, np
+
+
+STRATEGY = {"Stock": "IDP", "Product": "IDP", "OrderLine": "IDC"}
+
+
+def _executor(db_num: int = 1, profile: ClusterProfile = None) -> QueryExecutor:
+    stats = Statistics()
+    db = SchemaParser.build_db_from_json(db_num, stats, os.path.join(ROOT, "schemas", f"db{db_num}.json"))
+    return QueryExecutor(db, stats, profile=profile)
+
+
+def test_memoized_costs_are_copies():
+    """Mutating a returned cost never changes the next call's result"""
+    model = CostModel()
+    first = model.calculate_filter_cost(1000, 100, 10)
+    time_ms = first.time_ms
+    first.time_ms += 1e6
+    second = model.calculate_filter_cost(1000, 100, 10)
+    assert model.memo_info()['hits'] == 1
+    assert second.time_ms == time_ms
+
+    # Costs returned inside tuples are copied too
+    cost, pages_read, _ = model.calculate_storage_cost(10**8, 1000, 10**8, num_servers_total=1)
+    cost.time_ms = 0
+    again, pages_again, _ = model.calculate_storage_cost(10**8, 1000, 10**8, num_servers_total=1)
+    assert again.time_ms > 0 and pages_again == pages_read
+
+
+def test_class_calls_use_the_default_profile():
+    """CostModel.calculate_*(...) still works as a static call"""
+    default = CostModel.for_profile()
+    assert default.profile == DEFAULT_PROFILE
+    hits = default.memo_info()['hits']
+
+    expected = CostModel(DEFAULT_PROFILE).calculate_scan_cost(5000, 200)
+    assert CostModel.calculate_scan_cost(5000, 200) == expected
+    assert CostModel.calculate_scan_cost(5000, 200) == expected
+    assert default.memo_info()['hits'] == hits + 1
+
+    fast = CostModel(ClusterProfile(bandwidth_bytes_per_s=1_500_000_000))
+    assert fast.calculate_communication_cost(10**9).time_ms < \
+        CostModel.calculate_communication_cost(10**9).time_ms
+
+
+def test_storage_cost_through_the_buffer_cache():
+    """Only the pages missing from the buffer cache are read from disk"""
+    model = CostModel()
+    doc_size = 2**22
+    cached_documents = int(DEFAULT_PROFILE.buffer_cache_bytes) // doc_size
+
+    # Working set of each server within the cache: no disk reads
+    cost, pages_read, hit_ratio = model.calculate_storage_cost(cached_documents, doc_size, cached_documents, num_servers_total=1)
+    assert (cost.time_ms, hit_ratio) == (0, 1.0) and pages_read > 0
+
+    # Twice the cache: half of the pages come from disk, at the sequential speed
+    cost, pages_read, hit_ratio = model.calculate_storage_cost(2 * cached_documents, doc_size, 2 * cached_documents, num_servers_total=1)
+    assert hit_ratio == 0.5
+    expected = pages_read * 0.5 * DEFAULT_PROFILE.page_size_bytes / DEFAULT_PROFILE.disk_bytes_per_ms
+    assert abs(cost.time_ms - expected) < 1e-6
+    assert cost.latency_ms == cost.time_ms
+
+    # Index lookups pay one random read per missing page; the inner pages
+    # of an index of unknown size are counted once
+    cost, pages_read, hit_ratio = model.calculate_storage_cost(
+        2 * cached_documents, doc_size, 10, num_servers_total=1, random_access=True, index_depth=3
+    )
+    assert pages_read == 10 * (doc_size // DEFAULT_PROFILE.page_size_bytes) + 3
+    assert abs(cost.time_ms - pages_read * (1 - hit_ratio) * DEFAULT_PROFILE.disk_random_read_ms) < 1e-9
+
+
+def test_storage_cost_of_q3():
+    """DB1 stays in memory; the DB4 OrderLine (embedded products) reads from disk"""
+    db1 = _executor(1).execute_q3(STRATEGY)
+    assert db1.storage_cost.time_ms == 0 and db1.cache_hit_ratio == 1.0
+    assert round(db1.cost.time_ms, 1) == 29228.5
+
+    db4 = _executor(4).execute_q3(STRATEGY)
+    assert db4.cache_hit_ratio < 1
+    assert round(db4.cost.time_ms, -5) == 7.8e6
+    assert abs(db4.cost.time_ms - db4.storage_cost.time_ms - db1.cost.time_ms) < 1e-6
+
+    # A cache holding the whole share gives back the in-memory cost
+    in_memory = _executor(4, ClusterProfile(memory_per_server_bytes=2**40)).execute_q3(STRATEGY)
+    assert in_memory.cost.time_ms == db1.cost.time_ms
+
+
+def test_latency_of_a_transfer():
+    """Servers send their share in parallel; the coordinator link and the round trips add up"""
+    profile = ClusterProfile(coordinator_bandwidth_bytes_per_s=150_000_000)
+    model = CostModel(profile)
+    volume = 10**8
+    gathered = model.calculate_communication_cost(volume, num_servers_involved=1000)
+    assert gathered.time_ms == volume / profile.bandwidth_bytes_per_ms
+    assert gathered.latency_ms == volume / profile.coordinator_bandwidth_bytes_per_ms + profile.network_rtt_ms
+
+    shuffled = model.calculate_communication_cost(volume, num_servers_involved=1000, coordinator_bytes=0,
+                                                  num_round_trips=3)
+    assert shuffled.time_ms == gathered.time_ms
+    assert shuffled.latency_ms == volume / 1000 / profile.bandwidth_bytes_per_ms + 3 * profile.network_rtt_ms
+    assert model.calculate_communication_cost(0).latency_ms == 0
+
+    scan = model.calculate_scan_cost(10**6, 100, num_servers_involved=100)
+    assert scan.latency_ms == scan.time_ms / 100
+    assert (gathered + scan).latency_ms == gathered.latency_ms + scan.latency_ms
+    assert gathered.scale(2).latency_ms == 2 * gathered.latency_ms
+
+
+def test_latency_of_queries():
+    """Q6 shuffles in parallel (459 ms of 133,609 ms); Q3 is bound by the coordinator link"""
+    executor = _executor()
+    q3 = executor.execute_query("Q3", STRATEGY).cost
+    q6 = executor.execute_query("Q6", STRATEGY).cost
+    assert round(q6.time_ms) == 133609 and round(q6.latency_ms) == 459
+    assert round(q3.time_ms) == round(q3.latency_ms) == 29229
+
+    sql = "SELECT P.name, S.quantity FROM Stock S JOIN Product P ON S.IDP = P.IDP WHERE S.IDW = $IDW"
+    strategy = {"Stock": "IDW", "Product": "IDP"}
+    by_time = QueryOptimizer(executor, batch_sizes=[100]).optimize(sql, strategy)
+    by_latency = QueryOptimizer(executor, objective="latency_ms", batch_sizes=[100]).optimize(sql, strategy)
+    assert by_latency.objective == "latency_ms"
+    assert by_latency.cost.latency_ms <= by_time.cost.latency_ms
+
+
+def _assert_same_cost(batch_cost: QueryCost, scalar_cost: QueryCost):
+    for name in ("time_ms", "carbon_gco2", "price_usd", "data_volume_bytes", "num_documents",
+                 "num_servers_involved", "latency_ms"):
+        assert math.isclose(getattr(batch_cost, name), getattr(scalar_cost, name), rel_tol=1e-12), name
+
+
+def test_batch_costs_equal_the_scalar_costs():
+    """Each element of a QueryCostBatch is the scalar QueryCost of its inputs (NumPy is optional)"""
+    if np is None:
+        return
+    model = CostModel()
+    volumes, servers, round_trips = [0, 4_096, 10**8], [1, 10, 1000], [1, 5]
+    grid = list(itertools.product(volumes, servers, round_trips))
+    volume, server, trips = (np.array(values) for values in zip(*grid))
+
+    batch = model.calculate_communication_cost_batch(volume, server, num_documents=volume // 10,
+                                                     coordinator_bytes=volume // 2, num_round_trips=trips)
+    assert isinstance(batch, QueryCostBatch) and batch.shape == (len(grid),)
+    for i, (v, n, t) in enumerate(grid):
+        _assert_same_cost(batch[i], model.calculate_communication_cost(v, n, v // 10, v // 2, t))
+
+    indexed = np.array([False, True] * (len(grid) // 2))
+    batch = model.calculate_scan_cost_batch(volume, 200, indexed, server)
+    for i, (v, n, _) in enumerate(grid):
+        _assert_same_cost(batch[i], model.calculate_scan_cost(v, 200, bool(indexed[i]), n))
+
+    batch = model.calculate_filter_cost_batch(volume // 100, 200, volume, num_servers_involved=server)
+    for i, (v, n, _) in enumerate(grid):
+        _assert_same_cost(batch[i], model.calculate_filter_cost(v // 100, 200, v, num_servers_involved=n))
+
+    loops = np.array([1, 1000, 100000])
+    batch = model.calculate_nested_loop_join_cost_batch(10**6, 10**5, 100, 200, 10**6, np.array(volumes)[:, None],
+                                                        loops, num_servers_s2=10, c2_shuffle_bytes=1000)
+    assert batch.shape == (3, 3) and isinstance(batch[1:], QueryCostBatch)
+    for i, j in np.ndindex(batch.shape):
+        _assert_same_cost(batch[i, j], model.calculate_nested_loop_join_cost(
+            10**6, 10**5, 100, 200, 10**6, volumes[i], int(loops[j]), num_servers_s2=10,
+            c2_shuffle_bytes=1000))
+
+
+def test_batch_bandwidth_sweep():
+    """A bandwidth array prices the same transfer as one profile per bandwidth"""
+    if np is None:
+        return
+    bandwidths = np.array([15_000, 150_000, 1_500_000])
+    batch = CostModel().calculate_communication_cost_batch(10**9, 100, bandwidth_bytes_per_ms=bandwidths,
+                                                           coordinator_bandwidth_bytes_per_ms=bandwidths)
+    for i, bandwidth in enumerate(bandwidths):
+        profile = ClusterProfile(bandwidth_bytes_per_s=int(bandwidth) * 1000)
+        _assert_same_cost(batch[i], CostModel(profile).calculate_communication_cost(10**9, 100))
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
@@ -0,0 +1,92 @@
+"""
+Checks for the B-tree index catalog of collections and its use by the filter
+Run with pytest or directly: python tests/test_index_catalog.py
+"""
+
+import sys
+import os
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from models.schema import Collection, Index
+from models.statistics import Statistics
+from parsers.schema_parser import SchemaParser
+from calculators.size_calculator import SizeCalculator
+from operators import FilterOperator
+
+
+def _database(db_num: int = 1):
+    stats = Statistics()
+    return stats, SchemaParser.build_db_from_json(db_num, stats, os.path.join(ROOT, "schemas", f"db{db_num}.json"))
+
+
+def test_index_size_and_depth():
+    """A compound index on Stock is a few levels deep and counted in the database size"""
+    stats, db = _database(1)
+    calculator = SizeCalculator(stats)
+    before = calculator.calculate_database_size(db)
+
+    stock = db.get_collection("Stock")
+    index = stock.add_index(["IDP", "IDW"], unique=True)
+    size = calculator.calculate_index_size(stock, index)
+
+    assert index.name == "IDP_1_IDW_1"
+    assert size.entries == stock.document_count
+    assert size.depth >= 2
+    assert size.pages_per_lookup == size.depth + 1
+    assert calculator.calculate_database_size(db) == before + size.size_bytes
+
+
+def test_multikey_index_has_one_entry_per_element():
+    stats, db = _database(1)
+    product = db.get_collection("Product")
+    index = product.add_index("categories.title")
+    size = SizeCalculator(stats).calculate_index_size(product, index, {"categories": 2})
+
+    assert index.is_multikey(product.schema)
+    assert size.entries == 2 * product.document_count
+
+
+def test_invalid_indexes_are_rejected():
+    stats, db = _database(5)
+    product = db.get_collection("Product")
+    for keys in (["missing"], ["categories.title", "orderLines.IDC"]):
+        try:
+            product.add_index(keys)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"add_index({keys}) should raise ValueError")
+
+    # Catalogs built without add_index are checked when sized
+    bypass = Collection(name="Product", schema=product.schema, document_count=10,
+                        indexes=[Index(("missing",))])
+    try:
+        SizeCalculator(stats).calculate_index_size(bypass, bypass.indexes[0])
+    except ValueError as error:
+        assert "missing" in str(error)
+    else:
+        raise AssertionError("calculate_index_size should raise ValueError")
+
+
+def test_filter_reports_the_catalog_index():
+    stats, db = _database(1)
+    stock = db.get_collection("Stock")
+    stock.add_index(["IDP", "IDW"])
+    operator = FilterOperator(stats)
+
+    indexed = operator.filter(stock, ["IDP", "IDW"], ["quantity"], "IDW", selectivity=1e-7)
+    assert indexed.index_used and indexed.index_name == "IDP_1_IDW_1"
+
+    # The catalog has no index on IDW alone: the filter scans, whatever use_index says
+    scanned = operator.filter(stock, ["IDW"], ["quantity"], "IDP", selectivity=0.005, use_index=True)
+    assert not scanned.index_used and scanned.index_name is None
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
@@ -0,0 +1,269 @@
+"""
+Checks for the hash, sort-merge, co-located and broadcast join operators
+Run with pytest or directly: python tests/test_join_operators.py
+"""
+
+import sys
+import os
+import math
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from models.statistics import Statistics
+from parsers.schema_parser import SchemaParser
+from operators import QueryExecutor, HashJoinOperator, SortMergeJoinOperator
+from operators.cost_model import CostModel
+
+
+def _executor(db_num: int = 1) -> QueryExecutor:
+    stats = Statistics()
+    db = SchemaParser.build_db_from_json(db_num, stats, os.path.join(ROOT, "schemas", f"db{db_num}.json"))
+    return QueryExecutor(db, stats)
+
+
+def _stock_product(executor: QueryExecutor):
+    return executor.database.get_collection("Stock"), executor.database.get_collection("Product")
+
+
+def test_hash_join_without_output_keys():
+    """None output keys behave like empty lists"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    result = executor.hash_join_op.hash_join(stock, product, "IDP", None, None)
+    keys_only = executor.hash_join_op.hash_join(stock, product, "IDP", [], [])
+    assert result.cost.time_ms == keys_only.cost.time_ms > 0
+
+
+def test_hash_join_builds_the_smaller_side():
+    """Stock filtered on one warehouse is smaller than Product: it is the build side"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    result = executor.hash_join_op.hash_join(
+        stock, product, "IDP", ["quantity"], ["name"],
+        left_filter_keys=["IDW"], left_filter_selectivity=1 / executor.statistics.num_warehouses
+    )
+    assert result.build_side == "left"
+
+
+def test_hash_join_spills_when_the_build_side_does_not_fit():
+    """A 1 MB hash table budget partitions the build side and spills to disk"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    in_memory = executor.hash_join_op.hash_join(stock, product, "IDP", ["quantity"], ["name"])
+    spilled = HashJoinOperator(executor.statistics, memory_per_server_bytes=10**6).hash_join(
+        stock, product, "IDP", ["quantity"], ["name"])
+
+    assert in_memory.spill_bytes == 0 and in_memory.num_partitions == 1
+    assert spilled.hash_table_bytes == in_memory.hash_table_bytes > spilled.memory_bytes
+    assert spilled.spill_bytes > 0 and spilled.num_partitions > 1
+    assert spilled.cost.time_ms > in_memory.cost.time_ms
+
+
+def test_sort_merge_join_without_output_keys():
+    """None output keys behave like empty lists"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    result = executor.sort_merge_join_op.sort_merge_join(stock, product, "IDP", None, None)
+    keys_only = executor.sort_merge_join_op.sort_merge_join(stock, product, "IDP", [], [])
+    assert result.cost.time_ms == keys_only.cost.time_ms > 0
+
+
+def test_co_located_join_requires_both_sides_sharded_on_the_key():
+    """Stock sharded on IDW cannot be joined shard by shard on IDP"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    try:
+        executor.co_located_join_op.co_located_join(
+            stock, product, "IDP", ["quantity"], ["name"], {"Stock": "IDW", "Product": "IDP"})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("co-located join accepted collections sharded on different keys")
+
+
+def test_co_located_join_cheaper_than_broadcast():
+    """Both sides sharded on IDP: nothing needs to be broadcast"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    strategy = {"Stock": "IDP", "Product": "IDP"}
+    co_located = executor.co_located_join_op.co_located_join(stock, product, "IDP", ["quantity"], ["name"], strategy)
+    broadcast = executor.broadcast_join_op.broadcast_join(stock, product, "IDP", ["quantity"], ["name"], strategy)
+    assert co_located.join_strategy == "co_located" and broadcast.join_strategy == "broadcast"
+    assert co_located.output_docs == broadcast.output_docs == stock.document_count
+    assert co_located.cost.time_ms < broadcast.cost.time_ms
+
+
+def test_broadcast_join_sends_the_smaller_side():
+    """Stock filtered on one warehouse is broadcast instead of Product"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    strategy = {"Stock": "IDW", "Product": "IDP"}
+    filtered = executor.broadcast_join_op.broadcast_join(
+        stock, product, "IDP", ["quantity"], ["name"], strategy,
+        left_filter_keys=["IDW"], left_filter_selectivity=1 / executor.statistics.num_warehouses)
+    unfiltered = executor.broadcast_join_op.broadcast_join(stock, product, "IDP", ["quantity"], ["name"], strategy)
+    assert filtered.broadcast_side == "left"
+    assert unfiltered.broadcast_side == "right"
+
+
+def test_sort_merge_join_shuffles_the_mis_sharded_side():
+    """Stock sharded on IDW moves (S-1)/S of its documents; Product stays in place"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    num_servers = executor.statistics.num_servers
+    result = executor.sort_merge_join_op.sort_merge_join(
+        stock, product, "IDP", ["quantity"], ["name"], left_sharding_key="IDW", right_sharding_key="IDP")
+    assert result.shuffle1 == stock.document_count * (num_servers - 1) // num_servers
+    assert result.shuffle2 == 0
+
+    co_partitioned = executor.sort_merge_join_op.sort_merge_join(
+        stock, product, "IDP", ["quantity"], ["name"], left_sharding_key="IDP", right_sharding_key="IDP")
+    assert co_partitioned.shuffle1 == co_partitioned.shuffle2 == 0
+
+
+def test_sort_merge_join_external_sort():
+    """Partitions larger than the memory are sorted in runs and merged in passes"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    args = (stock, product, "IDP", ["quantity"], ["name"])
+    in_memory = executor.sort_merge_join_op.sort_merge_join(*args, left_sharding_key="IDW", right_sharding_key="IDP")
+    external = SortMergeJoinOperator(executor.statistics, memory_per_server_bytes=10**4).sort_merge_join(
+        *args, left_sharding_key="IDW", right_sharding_key="IDP")
+    assert in_memory.num_runs == 1 and in_memory.merge_passes == 0
+    assert external.num_runs > 1 and external.merge_passes > 0
+    assert external.cost.time_ms > in_memory.cost.time_ms
+
+
+def test_distributed_joins_without_output_keys():
+    """None output keys behave like empty lists in co-located and broadcast joins"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    strategy = {"Stock": "IDP", "Product": "IDP"}
+    for join in (executor.co_located_join_op.co_located_join, executor.broadcast_join_op.broadcast_join):
+        result = join(stock, product, "IDP", None, None, strategy)
+        keys_only = join(stock, product, "IDP", [], [], strategy)
+        assert result.cost.time_ms == keys_only.cost.time_ms > 0
+
+
+def test_every_strategy_sizes_output_documents_alike():
+    """Output documents are projections on the output keys, as in the nested loop join"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    strategy = {"Stock": "IDP", "Product": "IDP"}
+    expected = executor.join_op.nested_loop_join(stock, product, "IDP", ["quantity"], ["name"],
+                                                 left_filter_selectivity=1, right_filter_selectivity=1)
+    results = [
+        executor.hash_join_op.hash_join(stock, product, "IDP", ["quantity"], ["name"]),
+        executor.sort_merge_join_op.sort_merge_join(stock, product, "IDP", ["quantity"], ["name"]),
+        executor.co_located_join_op.co_located_join(stock, product, "IDP", ["quantity"], ["name"], strategy),
+        executor.broadcast_join_op.broadcast_join(stock, product, "IDP", ["quantity"], ["name"], strategy),
+    ]
+    for result in results:
+        assert (result.output_size_bytes1, result.output_size_bytes2) == \
+            (expected.output_size_bytes1, expected.output_size_bytes2), type(result).__name__
+
+    # Shuffled documents are routed by the join key, so they carry it
+    sort_merge = results[1]
+    assert sort_merge.shuffle_size_bytes1 > sort_merge.output_size_bytes1
+
+
+def test_batched_nested_loop_join():
+    """Q4: $in batches of 1 to 1e6 outer keys cut the loops from 100000 to 1"""
+    executor = _executor()
+    strategy = {"Stock": "IDW", "Product": "IDP"}
+    unbatched = executor.execute_q4(strategy)
+    assert executor.execute_q4(strategy, batch_size=1) == unbatched
+    assert (unbatched.num_loops, unbatched.batch_size, unbatched.num_messages) == (100000, 1, 100001)
+
+    previous = unbatched
+    for batch_size in (10, 100, 10**4, 10**6):
+        result = executor.execute_q4(strategy, batch_size=batch_size)
+        assert result.batch_size == min(batch_size, result.o1)
+        assert result.num_loops == math.ceil(result.o1 / result.batch_size)
+        assert result.num_messages == result.s1 + result.num_loops * result.s2
+        assert result.cost.latency_ms < previous.cost.latency_ms
+        assert result.cost.time_ms <= previous.cost.time_ms
+        previous = result
+    assert previous.num_loops == 1
+
+    try:
+        executor.execute_q4(strategy, batch_size=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("batch_size=0 accepted")
+
+
+def test_expected_shards_per_batch():
+    """Keys routed by the join key fan out to N * (1 - (1 - 1/N)^B) shards"""
+    join = _executor().join_op
+    num_servers = join.statistics.num_servers
+    assert join.expected_shards_per_batch(1) == 1
+    assert join.expected_shards_per_batch(10) == num_servers * (1 - (1 - 1 / num_servers) ** 10)
+    assert 9 < join.expected_shards_per_batch(10) < 10
+    assert join.expected_shards_per_batch(10**6) == num_servers
+    assert join.expected_shards_per_batch(10**6, distinct_keys=50) == 50
+
+
+def test_bloom_filter_size():
+    """m = -n ln(p) / ln(2)^2 bits: about 9.6 bits per key at 1%"""
+    assert CostModel.calculate_bloom_filter_size(1000, 0.01) == 1199
+    assert CostModel.calculate_bloom_filter_size(0, 0.01) == 0
+    assert CostModel.calculate_bloom_filter_size(1000, 0.001) > CostModel.calculate_bloom_filter_size(1000, 0.01)
+
+
+def test_semi_join_hash_join():
+    """A Bloom filter of 50 Apple products lets only matching stocks (plus false positives) travel"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    args = (product, stock, "IDP", ["name"], ["quantity"], "IDP", "IDW", ["brand"], None, 0.0005, 1.0)
+    plain = executor.hash_join_op.hash_join(*args)
+    assert plain.bloom_filter_bytes == 0 and plain.build_side == "left"
+
+    previous = plain
+    for fpr in (0.1, 0.01, 0.001):
+        result = executor.hash_join_op.hash_join(*args, semi_join_fpr=fpr)
+        matches = plain.o2 * plain.o1 // product.document_count
+        assert result.false_positive_docs == int(fpr * (plain.o2 - matches))
+        assert result.bloom_filter_bytes == CostModel.calculate_bloom_filter_size(plain.o1, fpr)
+        assert result.c2_volume_bytes == \
+            result.s2 * result.input_size_bytes2 + (matches + result.false_positive_docs) * result.output_size_bytes2
+        assert result.c1_volume_bytes == plain.c1_volume_bytes
+        assert result.cost.time_ms < previous.cost.time_ms
+        previous = result
+
+
+def test_semi_join_nested_loop_join():
+    """The semi-join replaces the loops with one Bloom filter and one transfer"""
+    executor = _executor()
+    stock, product = _stock_product(executor)
+    args = (stock, product, "IDP", ["quantity"], ["name"], "IDW", "brand", ["IDW"], None, 1 / 200,
+            1 / product.document_count)
+    plain = executor.join_op.nested_loop_join(*args)
+    result = executor.join_op.nested_loop_join(*args, semi_join_fpr=0.01)
+    assert (plain.num_loops, result.num_loops) == (100000, 1)
+    assert result.num_messages == result.s1 + result.s2
+    assert result.bloom_filter_bytes == CostModel.calculate_bloom_filter_size(result.o1, 0.01)
+    assert result.cost.time_ms < plain.cost.time_ms
+
+    for kwargs in ({"semi_join_fpr": 0}, {"semi_join_fpr": 1}, {"semi_join_fpr": 0.01, "batch_size": 10}):
+        try:
+            executor.join_op.nested_loop_join(*args, **kwargs)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted: {kwargs}")
+    try:
+        executor.hash_join_op.hash_join(product, stock, "IDP", ["name"], ["quantity"], semi_join_fpr=1.5)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("semi_join_fpr=1.5 accepted")
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
@@ -0,0 +1,109 @@
+"""
+Checks for materialized views and the query rewrites onto them
+Run with pytest or directly: python tests/test_materialized_view.py
+"""
+
+import sys
+import os
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from models.statistics import Statistics
+from parsers.schema_parser import SchemaParser
+from operators import QueryExecutor
+from operators.materialized_view import MaterializedViewPlanner, define_materialized_view
+from operators.query_spec import compile_query
+
+
+STRATEGY = {"Product": "IDP", "OrderLine": "IDC", "Stock": "IDP"}
+
+
+def _planner(db_num: int = 1, query_specs=None) -> MaterializedViewPlanner:
+    stats = Statistics()
+    db = SchemaParser.build_db_from_json(db_num, stats, os.path.join(ROOT, "schemas", f"db{db_num}.json"))
+    define_materialized_view(db, stats, "ProductSales", "OrderLine",
+                             ["IDP"], {"NB": "SUM(quantity)"}, sharding_key="IDP")
+    define_materialized_view(db, stats, "CustomerProductSales", "OrderLine",
+                             ["IDC", "IDP"], {"NB": "sum( quantity )"}, sharding_key="IDC")
+    return MaterializedViewPlanner(QueryExecutor(db, stats), query_specs)
+
+
+def test_view_definition():
+    """One document per group, estimated from the statistics"""
+    planner = _planner()
+    stats = planner.statistics
+    view = planner.database.views["CustomerProductSales"]
+    assert view.aggregates == {"NB": "SUM(quantity)"}
+    assert view.document_count == stats.num_clients * stats.products_per_customer
+    assert view.schema.get_field("IDC") is not None and view.schema.get_field("NB") is not None
+
+
+def test_rewrite_needs_a_matching_view():
+    """Q6 reads ProductSales; Q7 fixes IDC so only CustomerProductSales answers it"""
+    planner = _planner()
+    q6, q7 = planner.query_specs["Q6"], planner.query_specs["Q7"]
+    assert [view.name for view, _ in planner.rewrite(q6)] == ["ProductSales"]
+    assert [view.name for view, _ in planner.rewrite(q7)] == ["CustomerProductSales"]
+
+    _, rewritten = planner.rewrite(q6)[0]
+    assert rewritten.right_collection == "ProductSales" and rewritten.group_by_key is None
+    assert rewritten.right_output_keys == ("IDP", "NB")
+    assert planner.rewrite(rewritten) == []
+    assert planner.rewrite(planner.query_specs["Q4"]) == []
+
+    average = compile_query("SELECT P.name, OL.NB FROM Product P JOIN "
+                            "(SELECT O.IDP, AVG(O.quantity) AS NB FROM OrderLine O GROUP BY O.IDP) OL "
+                            "ON P.IDP = OL.IDP")
+    assert planner.rewrite(average) == []
+
+
+def test_plan_picks_the_cheapest_by_query_id():
+    """Without query_specs, the built-in plans of the query ids are rewritten"""
+    planner = _planner()
+    q6 = planner.plan("Q6", STRATEGY)
+    assert q6.view == "ProductSales"
+    assert round(q6.result.cost.time_ms, 1) == 273.9
+    assert round(planner.executor.execute_query("Q6", STRATEGY).cost.time_ms, 1) == 133608.6
+
+    # The customer's groups are already summed on its IDC shard
+    q7 = planner.plan("Q7", STRATEGY)
+    assert q7.view == "CustomerProductSales" and q7.compiled.right_collection == "CustomerProductSales"
+    assert q7.result.cost.time_ms < planner.executor.execute_query("Q7", STRATEGY).cost.time_ms
+
+
+def test_query_specs_override_the_built_in_plans():
+    """Given plans replace those of queries/td2.json; unknown ids raise"""
+    unordered = compile_query("SELECT P.name, OL.NB FROM Product P JOIN "
+                              "(SELECT O.IDP, SUM(O.quantity) AS NB FROM OrderLine O GROUP BY O.IDP) OL "
+                              "ON P.IDP = OL.IDP")
+    planner = _planner(query_specs={"Q6": unordered})
+    assert planner.query_specs["Q6"] is unordered and "Q7" in planner.query_specs
+    assert planner.plan("Q6", STRATEGY).compiled.spec is unordered.spec
+    try:
+        planner.plan("Q42", STRATEGY)
+    except ValueError as error:
+        assert "Q42" in str(error)
+    else:
+        raise AssertionError("Q42 planned")
+
+
+def test_maintenance_and_workload():
+    """Each view costs one routed update per insert; Q6 pays for both views"""
+    planner = _planner()
+    maintenance = planner.maintenance_cost("OrderLine", STRATEGY)
+    assert round(maintenance.time_ms, 3) == 0.207
+    assert planner.maintenance_cost("Stock", STRATEGY).time_ms == 0
+
+    comparison = planner.compare_workload([("Q1", {}, 1000), ("Q6", {}, 1), ("Q7", {}, 100)],
+                                          STRATEGY, inserts_per_s=1000)
+    assert comparison.maintenance_cost_per_s.time_ms == maintenance.time_ms * 1000
+    assert comparison.saved_time_ms_per_s > 0
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
@@ -0,0 +1,119 @@
+"""
+Checks for the branch-and-bound QueryOptimizer
+Run with pytest or directly: python tests/test_optimizer.py
+"""
+
+import sys
+import os
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from config.cluster_profile import ClusterProfile
+from models.statistics import Statistics
+from parsers.schema_parser import SchemaParser
+from operators import QueryExecutor, QueryOptimizer
+
+
+Q4_SQL = "SELECT P.name, S.quantity FROM Stock S JOIN Product P ON S.IDP = P.IDP WHERE S.IDW = $IDW"
+THREE_WAY_SQL = ("SELECT W.location, P.name, S.quantity "
+                 "FROM Warehouse W JOIN Stock S ON W.IDW = S.IDW JOIN Product P ON S.IDP = P.IDP "
+                 "WHERE W.IDW = $IDW AND P.brand = $brand")
+Q6_SQL = ("SELECT P.name, P.price, OL.NB FROM Product P JOIN "
+          "(SELECT O.IDP, SUM(O.quantity) AS NB FROM OrderLine O GROUP BY O.IDP) OL "
+          "ON P.IDP = OL.IDP ORDER BY OL.NB DESC LIMIT 100")
+STRATEGY = {"Stock": "IDP", "Product": "IDP", "Warehouse": "IDW"}
+
+
+def _executor(db_num: int = 1, profile: ClusterProfile = None) -> QueryExecutor:
+    stats = Statistics()
+    db = SchemaParser.build_db_from_json(db_num, stats, os.path.join(ROOT, "schemas", f"db{db_num}.json"))
+    return QueryExecutor(db, stats, profile=profile)
+
+
+def _single_method_costs(executor: QueryExecutor, sql: str, strategy, **params):
+    """Best plan cost with the optimizer restricted to each join method in turn"""
+    costs = {}
+    for method_name in QueryOptimizer(executor).join_methods:
+        optimizer = QueryOptimizer(executor)
+        optimizer.join_methods = {method_name: optimizer.join_methods[method_name]}
+        try:
+            costs[method_name] = optimizer.optimize(sql, strategy, **params).cost.time_ms
+        except ValueError:
+            continue  # e.g. co-located join on collections not sharded on the join key
+    return costs
+
+
+def test_picks_the_cheapest_join_method():
+    """The chosen plan costs the minimum over every single-method plan"""
+    executor = _executor()
+    plan = QueryOptimizer(executor).optimize(Q4_SQL, STRATEGY)
+    costs = _single_method_costs(executor, Q4_SQL, STRATEGY)
+    assert plan.cost.time_ms == min(costs.values())
+    assert costs[plan.steps[0].operator] == plan.cost.time_ms
+    assert plan.cost.time_ms <= executor.execute_q4(STRATEGY).cost.time_ms
+
+
+def test_three_way_join_is_cheapest_and_pruned():
+    """Branch-and-bound explores connected orders and cuts expensive prefixes"""
+    executor = _executor()
+    plan = QueryOptimizer(executor).optimize(THREE_WAY_SQL, STRATEGY, brand="Apple")
+    costs = _single_method_costs(executor, THREE_WAY_SQL, STRATEGY, brand="Apple")
+    assert len(plan.steps) == 2
+    assert sorted(plan.join_order) == ["P", "S", "W"]
+    assert plan.cost.time_ms <= min(costs.values())
+    assert plan.plans_pruned > 0
+
+
+def test_sharding_candidates():
+    """The best sharding among the candidates is never worse than a fixed one"""
+    executor = _executor()
+    optimizer = QueryOptimizer(executor)
+    plan = optimizer.optimize(Q4_SQL, STRATEGY, sharding_candidates={"Stock": ["IDP", "IDW", None]})
+    for stock_key in ("IDP", "IDW", None):
+        fixed = optimizer.optimize(Q4_SQL, {**STRATEGY, "Stock": stock_key})
+        assert plan.cost.time_ms <= fixed.cost.time_ms
+
+
+def test_use_index_reaches_the_join_operators():
+    """Without indexes, lookups and filters read whole collections from disk"""
+    # No buffer cache, so every page read is priced
+    executor = _executor(profile=ClusterProfile(buffer_cache_fraction=0))
+    for method_name in ("nested_loop", "hash"):
+        costs = {}
+        for use_index in (True, False):
+            optimizer = QueryOptimizer(executor)
+            optimizer.join_methods = {method_name: optimizer.join_methods[method_name]}
+            plan = optimizer.optimize({"sql": Q4_SQL, "use_index": use_index}, STRATEGY, IDW=1)
+            costs[use_index] = plan.steps[0].result.storage_cost.time_ms
+        assert costs[True] < costs[False], method_name
+
+
+def test_use_index_reaches_the_aggregate():
+    """Grouped joins look the outside documents up by index only if allowed"""
+    executor = _executor(profile=ClusterProfile(buffer_cache_fraction=0))
+    strategy = {"Product": "IDP", "OrderLine": "IDC"}
+    with_index = QueryOptimizer(executor).optimize(Q6_SQL, strategy)
+    without_index = QueryOptimizer(executor).optimize({"sql": Q6_SQL, "use_index": False}, strategy)
+    assert with_index.steps[0].operator == without_index.steps[0].operator == "aggregate"
+    assert with_index.cost.time_ms < without_index.cost.time_ms
+
+
+def test_multi_way_join_rejects_order_by():
+    """Join plans have no sort step: ORDER BY raises instead of being dropped"""
+    executor = _executor()
+    try:
+        QueryOptimizer(executor).optimize(THREE_WAY_SQL + " ORDER BY S.quantity DESC LIMIT 10", STRATEGY,
+                                          brand="Apple")
+    except ValueError as error:
+        assert "ORDER BY" in str(error)
+    else:
+        raise AssertionError("ORDER BY accepted")
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
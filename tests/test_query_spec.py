@@ -0,0 +1,126 @@
+"""
+Checks for the declarative query parser and compiler
+Run with pytest or directly: python tests/test_query_spec.py
+"""
+
+import sys
+import os
+from dataclasses import replace
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from config.cluster_profile import ClusterProfile
+from models.statistics import Statistics
+from parsers.schema_parser import SchemaParser
+from operators import QueryExecutor
+from operators.top_k_operator import TopKAggregateResult
+from operators.query_spec import Param, compile_query, load_query_specs, parse_sql
+
+
+Q4_SQL = "SELECT P.name, S.quantity FROM Stock S JOIN Product P ON S.IDP = P.IDP WHERE S.IDW = $IDW"
+Q5_SQL = ("SELECT P.name, P.price, S.IDW, S.quantity "
+          "FROM Product P JOIN Stock S ON P.IDP = S.IDP WHERE P.brand = $brand")
+STRATEGY = {"Stock": "IDP", "Product": "IDP", "OrderLine": "IDC"}
+
+
+def _executor(db_num: int = 1, profile: ClusterProfile = None) -> QueryExecutor:
+    stats = Statistics()
+    db = SchemaParser.build_db_from_json(db_num, stats, os.path.join(ROOT, "schemas", f"db{db_num}.json"))
+    return QueryExecutor(db, stats, profile=profile)
+
+
+def test_parse_join_query():
+    """Q5: FROM / JOIN ... ON / WHERE with a $parameter"""
+    spec = parse_sql(Q5_SQL)
+    assert spec.source.collection == "Product" and spec.source.alias == "P"
+    assert spec.joins[0].table.collection == "Stock"
+    assert spec.where[0].value == Param("brand")
+
+    plan = compile_query(Q5_SQL)
+    assert (plan.kind, plan.left_collection, plan.right_collection, plan.join_key) == \
+        ("join", "Product", "Stock", "IDP")
+    assert plan.left_output_keys == ("name", "price")
+    assert plan.right_output_keys == ("IDW", "quantity")
+    assert plan.parameters == ("brand",)
+
+
+def test_specs_reproduce_hand_written_queries():
+    """Q4 and Q5 compiled from SQL cost exactly as execute_q4 / execute_q5"""
+    executor = _executor()
+    specs = load_query_specs(os.path.join(ROOT, "queries", "td2.json"))
+    for query, params in (("Q4", {}), ("Q5", {"brand": "Apple"})):
+        compiled = specs[query].execute(executor, STRATEGY, **params)
+        hand_written = executor.execute_query(query, STRATEGY, **params)
+        assert compiled.c1_volume_bytes == hand_written.c1_volume_bytes
+        assert compiled.c2_volume_bytes == hand_written.c2_volume_bytes
+        assert compiled.cost.time_ms == hand_written.cost.time_ms
+
+    assert executor.execute_spec(Q4_SQL, STRATEGY).cost.time_ms == executor.execute_q4(STRATEGY).cost.time_ms
+
+
+def test_invalid_queries_are_rejected():
+    """Malformed SQL, unsupported shapes and unknown collections raise ValueError"""
+    executor = _executor()
+    for sql in ("SELECT FROM Product",
+                "SELECT P.name FROM Product P WHERE",
+                "DELETE FROM Product",
+                "SELECT P.name FROM Product P JOIN Stock S ON P.IDP = S.IDW",
+                "SELECT N.name FROM Nope N"):
+        try:
+            executor.execute_spec(sql, STRATEGY)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted: {sql}")
+
+
+def test_join_spec_forwards_use_index():
+    """Without an index on the join key, every loop scans the right collection"""
+    executor = _executor(profile=ClusterProfile(buffer_cache_fraction=0))
+    strategy = {"Stock": "IDW", "Product": "IDP"}
+    indexed = executor.execute_spec(Q4_SQL, strategy)
+    scanned = executor.execute_spec({"sql": Q4_SQL, "use_index": False}, strategy)
+    assert indexed.pages_read2 < scanned.pages_read2
+    assert indexed.storage_cost.time_ms < scanned.storage_cost.time_ms
+
+
+def test_order_by_limit_compiles_to_top_k():
+    """Q7 ranks the grouped sub-query: the plan runs the top-K aggregate"""
+    executor = _executor()
+    strategy = {"Stock": "IDP", "Product": "IDP", "OrderLine": "IDC"}
+    top_k = load_query_specs(os.path.join(ROOT, "queries", "td2.json"))["Q7"]
+    assert top_k.order_by == (("NB", "DESC"),) and top_k.limit == 1
+
+    unordered = replace(top_k, order_by=())
+    assert unordered.node_key != top_k.node_key
+    result = top_k.execute(executor, strategy)
+    baseline = unordered.execute(executor, strategy)
+    assert isinstance(result, TopKAggregateResult) and not isinstance(baseline, TopKAggregateResult)
+    assert result.baseline_cost.time_ms == baseline.cost.time_ms
+    assert result.cost.time_ms < baseline.cost.time_ms
+
+
+def test_unsupported_order_by_is_rejected():
+    """ORDER BY is only compiled as a top-K over the grouped sub-query"""
+    grouped = "(SELECT O.IDP, SUM(O.quantity) AS NB FROM OrderLine O GROUP BY O.IDP) OL ON P.IDP = OL.IDP"
+    for sql in ("SELECT P.name FROM Product P ORDER BY P.name LIMIT 10",
+                Q4_SQL + " ORDER BY S.quantity DESC LIMIT 10",
+                f"SELECT P.name, OL.NB FROM Product P JOIN {grouped} ORDER BY OL.NB DESC",
+                f"SELECT P.name, OL.NB FROM Product P JOIN {grouped} ORDER BY P.price DESC LIMIT 10",
+                f"SELECT P.name, OL.NB FROM Product P JOIN {grouped} ORDER BY OL.total DESC LIMIT 10",
+                "SELECT P.name, OL.NB FROM Product P JOIN (SELECT O.IDP, SUM(O.quantity) AS NB "
+                "FROM OrderLine O GROUP BY O.IDP ORDER BY NB DESC LIMIT 10) OL ON P.IDP = OL.IDP"):
+        try:
+            compile_query(sql)
+        except ValueError as error:
+            assert "ORDER BY" in str(error)
+            continue
+        raise AssertionError(f"accepted: {sql}")
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
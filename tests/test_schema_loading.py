@@ -0,0 +1,211 @@
+"""
+Checks for the parsed-schema caches and the database loaders
+Run with pytest or directly: python tests/test_schema_loading.py
+"""
+
+import sys
+import os
+import io
+import json
+import shutil
+import tempfile
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from models.schema import Field
+from models.statistics import Statistics
+from parsers.json_stream import JsonObjectStream
+from parsers.schema_parser import SchemaCatalog, SchemaParser
+
+
+DB1_PATH = os.path.join(ROOT, "schemas", "db1.json")
+
+
+def _copy_schema_file(directory: str) -> str:
+    path = os.path.join(directory, "db1.json")
+    shutil.copy(DB1_PATH, path)
+    return path
+
+
+def test_disk_cache_round_trip():
+    """Schemas read back from the JSON cache equal freshly parsed ones"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = _copy_schema_file(directory)
+        fresh = SchemaParser.parse_multiple_from_file(path, use_cache=False)
+
+        SchemaParser.clear_cache()
+        SchemaParser.parse_multiple_from_file(path)
+        cache_path = SchemaParser._cache_path(path)
+        with open(cache_path) as f:
+            assert json.load(f)['schemas'].keys() == fresh.keys()
+
+        SchemaParser.clear_cache()
+        cached = SchemaParser.parse_multiple_from_file(path)
+        assert cached == fresh
+
+
+def test_corrupted_cache_is_ignored():
+    """An unreadable cache falls back to parsing the JSON file"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = _copy_schema_file(directory)
+        SchemaParser.clear_cache()
+        SchemaParser.parse_multiple_from_file(path)
+        with open(SchemaParser._cache_path(path), 'wb') as f:
+            f.write(b"\x80\x04not json")
+
+        SchemaParser.clear_cache()
+        schemas = SchemaParser.parse_multiple_from_file(path)
+        assert schemas == SchemaParser.parse_multiple_from_file(path, use_cache=False)
+
+
+REF_SCHEMAS = {
+    "definitions": {
+        "supplier": {
+            "type": "object",
+            "properties": {"IDS": {"type": "integer"}, "name": {"type": "string"}},
+            "required": ["IDS", "name"]
+        }
+    },
+    "Product": {
+        "type": "object",
+        "properties": {
+            "IDP": {"type": "integer"},
+            "supplier": {"$ref": "#/definitions/supplier"},
+            "suppliers": {"type": "array", "items": {"$ref": "#/definitions/supplier"}}
+        },
+        "required": ["IDP", "supplier", "suppliers"]
+    },
+    "Stock": {
+        "type": "object",
+        "properties": {"quantity": {"type": "integer"}, "supplier": {"$ref": "#/definitions/supplier"}},
+        "required": ["quantity", "supplier"]
+    }
+}
+
+
+def _write_ref_schemas(directory: str) -> str:
+    path = os.path.join(directory, "refs.json")
+    with open(path, 'w') as f:
+        json.dump(REF_SCHEMAS, f)
+    return path
+
+
+def _supplier_schemas(schemas):
+    return [
+        schemas["Product"].get_field("supplier").nested_schema,
+        schemas["Product"].get_field("suppliers").array_item_schema,
+        schemas["Stock"].get_field("supplier").nested_schema
+    ]
+
+
+def test_refs_share_one_schema():
+    """Every $ref to a definition resolves to the same Schema object"""
+    with tempfile.TemporaryDirectory() as directory:
+        schemas = SchemaParser.parse_multiple_from_file(_write_ref_schemas(directory), use_cache=False)
+        assert set(schemas) == {"Product", "Stock"}
+        suppliers = _supplier_schemas(schemas)
+        assert all(s is suppliers[0] for s in suppliers)
+        assert [f.name for f in suppliers[0].fields] == ["IDS", "name"]
+
+
+def test_disk_cache_keeps_shared_definitions():
+    """A warm load re-links $ref definitions exactly like a cold parse"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = _write_ref_schemas(directory)
+        cold = SchemaParser.parse_multiple_from_file(path, use_cache=False)
+
+        SchemaParser.clear_cache()
+        SchemaParser.parse_multiple_from_file(path)
+        with open(SchemaParser._cache_path(path)) as f:
+            assert list(json.load(f)['definitions']) == ["supplier"]
+
+        SchemaParser.clear_cache()
+        warm = SchemaParser.parse_multiple_from_file(path)
+        assert warm == cold
+        suppliers = _supplier_schemas(warm)
+        assert all(s is suppliers[0] for s in suppliers)
+
+
+def test_memoized_schemas_are_not_shared():
+    """Adding a field to one result does not leak into the next call"""
+    SchemaParser.clear_cache()
+    first = SchemaParser.parse_multiple_from_file(DB1_PATH)
+    name = next(iter(first))
+    first[name].add_field(Field(name="extra", field_type="integer"))
+
+    second = SchemaParser.parse_multiple_from_file(DB1_PATH)
+    assert second[name].get_field("extra") is None
+    assert second[name] is not first[name]
+
+
+def test_json_object_stream_members():
+    """Members decoded in small chunks match json.load; offsets delimit each value"""
+    with open(DB1_PATH, 'rb') as f:
+        content = f.read()
+    expected = json.loads(content)
+
+    members = list(JsonObjectStream(io.BytesIO(content), chunk_size=7).members())
+    assert [key for key, _, _, _ in members] == list(expected)
+    for key, value, start, end in members:
+        assert value == expected[key]
+        assert json.loads(content[start:end]) == expected[key]
+
+    first = next(iter(expected))
+    selected = JsonObjectStream(io.BytesIO(content)).members(select=lambda key: key == first)
+    assert [value is not None for _, value, _, _ in selected] == [key == first for key in expected]
+
+
+def test_json_object_stream_rejects_non_objects():
+    """The top level must be a JSON object"""
+    try:
+        list(JsonObjectStream(io.BytesIO(b"[1, 2]")).members())
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("accepted a top-level array")
+
+
+def test_schema_catalog_parses_on_demand():
+    """The lazy catalog and the streaming iterator agree with a full parse"""
+    parsed = SchemaParser.parse_multiple_from_file(DB1_PATH, use_cache=False)
+    catalog = SchemaCatalog(DB1_PATH)
+    assert catalog.names() == list(parsed)
+    for name in catalog:
+        assert catalog.get_schema(name) == parsed[name]
+
+    name = catalog.names_for_collections(["Stock"])[0]
+    assert name.startswith("Stock") and name in catalog
+    assert list(SchemaParser.iter_schemas_from_file(DB1_PATH, names=[name])) == [(name, parsed[name])]
+
+
+def test_build_db_with_selected_collections():
+    """Only the requested collections are parsed and added"""
+    db = SchemaParser.build_db_from_json(1, Statistics(), DB1_PATH, collections=["Product", "Stock"])
+    assert sorted(db.collections) == ["Product", "Stock"]
+
+
+def test_build_dbs_from_directory():
+    """Files load in natural order (db2 before db10), sequentially or in a process pool"""
+    stats = Statistics()
+    with tempfile.TemporaryDirectory() as directory:
+        for db_index in (10, 2):
+            shutil.copy(DB1_PATH, os.path.join(directory, f"db{db_index}.json"))
+
+        sequential = SchemaParser.build_dbs_from_directory(directory, stats, max_workers=1)
+        parallel = SchemaParser.build_dbs_from_directory(directory, stats, max_workers=2)
+
+    for results in (sequential, parallel):
+        assert [os.path.basename(result.file_path) for result in results] == ["db2.json", "db10.json"]
+        assert [result.db_index for result in results] == [2, 10]
+        assert all(result.parse_time_ms >= 0 for result in results)
+    for left, right in zip(sequential, parallel):
+        assert sorted(left.database.collections) == sorted(right.database.collections)
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
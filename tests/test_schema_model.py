@@ -0,0 +1,143 @@
+"""
+Checks for the schema model: field lookups and the frozen, interned variants
+Run with pytest or directly: python tests/test_schema_model.py
+"""
+
+import sys
+import os
+import copy
+from dataclasses import FrozenInstanceError
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from models.schema import Collection, Field, FrozenField, FrozenSchema, Index, Schema
+from models.statistics import Statistics
+from calculators.size_calculator import SizeCalculator
+
+
+def _order_schema() -> Schema:
+    price = Schema(name="price", fields=[
+        Field(name="amount", field_type="number"),
+        Field(name="currency", field_type="string")
+    ])
+    line = Schema(name="orderLines_item", fields=[
+        Field(name="IDP", field_type="integer"),
+        Field(name="price", field_type="object", nested_schema=price)
+    ])
+    return Schema(name="Order", fields=[
+        Field(name="IDO", field_type="integer"),
+        Field(name="orderLines", field_type="array", array_item_schema=line),
+        Field(name="IDO", field_type="string")
+    ])
+
+
+def test_get_field_by_name():
+    """Top-level lookups go through the name index; the first duplicate wins"""
+    schema = _order_schema()
+    assert schema.get_field("IDO") is schema.fields[0]
+    assert schema.get_field("orderLines") is schema.fields[1]
+    assert schema.get_field("missing") is None
+    assert schema.get_field("") is None
+
+
+def test_get_field_by_dotted_path():
+    """Dotted paths go through nested objects and array items"""
+    schema = _order_schema()
+    line = schema.fields[1].array_item_schema
+    assert schema.get_field("orderLines.IDP") is line.fields[0]
+    assert schema.get_field("orderLines.price.amount").field_type == "number"
+    assert schema.get_field("orderLines.price.missing") is None
+    assert schema.get_field("IDO.IDP") is None
+
+
+def test_add_field_updates_the_indexes():
+    """Fields added after a lookup are found by name and by path"""
+    schema = _order_schema()
+    assert schema.get_field("customer.name") is None
+
+    customer = Schema(name="customer", fields=[Field(name="name", field_type="string")])
+    schema.add_field(Field(name="customer", field_type="object", nested_schema=customer))
+    assert schema.get_field("customer") is schema.fields[-1]
+    assert schema.get_field("customer.name") is customer.fields[0]
+
+
+def test_frozen_schema_lookups_match():
+    """The frozen variant answers the same lookups"""
+    schema = _order_schema()
+    frozen = schema.freeze()
+    for name in ("IDO", "orderLines", "orderLines.IDP", "orderLines.price.currency", "missing"):
+        found = schema.get_field(name)
+        expected = found.freeze() if found is not None else None
+        assert frozen.get_field(name) == expected
+
+
+def test_index_array_paths():
+    """Only keys going through an array field make an index multikey"""
+    schema = _order_schema()
+    assert Index(("IDO",)).array_paths(schema) == ()
+    assert not Index(("IDO",)).is_multikey(schema)
+    assert Index(("orderLines.IDP", "IDO")).array_paths(schema) == ("orderLines",)
+    assert Index(("orderLines.price.amount",)).is_multikey(schema.freeze())
+
+
+def test_frozen_schemas_are_interned():
+    """Structurally equal schemas freeze to one object and share their subtrees"""
+    first, second = _order_schema(), _order_schema()
+    assert first.freeze() is second.freeze()
+    assert first.freeze() is first.freeze().freeze()
+    assert FrozenField("IDP", "integer") is first.fields[1].array_item_schema.fields[0].freeze()
+
+    price = first.fields[1].array_item_schema.fields[1].nested_schema.freeze()
+    invoice = Schema(name="Invoice", fields=[
+        Field(name="total", field_type="object", nested_schema=Schema(name="price", fields=[
+            Field(name="amount", field_type="number"),
+            Field(name="currency", field_type="string")
+        ]))
+    ])
+    assert invoice.freeze().fields[0].nested_schema is price
+    assert copy.deepcopy(first.freeze()) is first.freeze()
+
+    collection = Collection(name="Order", schema=first, document_count=10)
+    assert collection.freeze() is Collection(name="Order", schema=second, document_count=10).freeze()
+    assert collection.freeze().schema is first.freeze()
+    assert collection.freeze() is not Collection(name="Order", schema=first, document_count=11).freeze()
+
+
+def test_frozen_schemas_are_immutable():
+    """Assignments raise; with_field and add_field give a new frozen schema"""
+    schema = _order_schema()
+    frozen = schema.freeze()
+    for target, name in ((frozen, "name"), (frozen, "fields"), (frozen.fields[0], "field_type")):
+        try:
+            setattr(target, name, None)
+        except FrozenInstanceError:
+            pass
+        else:
+            raise AssertionError(f"assigned {name}")
+    try:
+        del frozen.name
+    except FrozenInstanceError:
+        pass
+    else:
+        raise AssertionError("deleted name")
+
+    note = Field(name="note", field_type="string")
+    extended = frozen.with_field(note.freeze())
+    assert extended is not frozen and len(frozen.fields) == 3
+    schema.add_field(note)
+    assert schema.freeze() is extended
+    assert isinstance(extended, FrozenSchema) and hash(extended) == hash(FrozenSchema("Order", extended.fields))
+
+    # Derived caches may still be filled in on a frozen schema
+    calculator = SizeCalculator(Statistics())
+    assert calculator.calculate_document_size(extended, {"orderLines": 3}) == \
+        calculator.calculate_document_size(schema, {"orderLines": 3})
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
@@ -0,0 +1,167 @@
+"""
+Checks for the size calculator: size plans, batch sizes and the projection cache
+Run with pytest or directly: python tests/test_size_calculator.py
+"""
+
+import sys
+import os
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from models.schema import Field, Schema
+from models.statistics import Statistics
+from parsers.schema_parser import SchemaParser
+from calculators.size_calculator import ProjectionSizeCache, SizeCalculator, np
+from config.constants import ARRAY_OVERHEAD, KEY_VALUE_OVERHEAD, TYPE_SIZES
+
+
+ARRAY_SIZES = {
+    1: {"categories": 2},
+    2: {"categories": 2, "stocks": 200},
+    3: {"categories": 2},
+    4: {"categories": 2},
+    5: {"categories": 2, "orderLines": 5}
+}
+
+
+def _database(db_num: int = 1):
+    stats = Statistics()
+    return stats, SchemaParser.build_db_from_json(db_num, stats, os.path.join(ROOT, "schemas", f"db{db_num}.json"))
+
+
+def _recursive_size(schema: Schema, array_sizes) -> int:
+    """Reference document size, walking the schema field by field"""
+    size = 0
+    for schema_field in schema.fields:
+        size += KEY_VALUE_OVERHEAD + TYPE_SIZES.get(schema_field.field_type, 0)
+        if schema_field.field_type == 'object' and schema_field.nested_schema:
+            size += _recursive_size(schema_field.nested_schema, array_sizes)
+        elif schema_field.field_type == 'array' and schema_field.array_item_schema:
+            size += ARRAY_OVERHEAD + array_sizes.get(schema_field.name, 1) * _recursive_size(
+                schema_field.array_item_schema, array_sizes)
+    return size
+
+
+def _nested_arrays() -> Schema:
+    """Order { id, lines: [{ qty, lots: [{ code }] }] }"""
+    lot = Schema(name="Lot", fields=[Field(name="code", field_type="string")])
+    line = Schema(name="Line", fields=[Field(name="qty", field_type="integer"),
+                                       Field(name="lots", field_type="array", array_item_schema=lot)])
+    return Schema(name="Order", fields=[Field(name="id", field_type="integer"),
+                                        Field(name="lines", field_type="array", array_item_schema=line)])
+
+
+def test_size_plans_equal_the_recursive_sizes():
+    """Every collection of DB1-DB5 has the size of the field-by-field walk"""
+    for db_num, array_sizes in ARRAY_SIZES.items():
+        stats, db = _database(db_num)
+        calculator = SizeCalculator(stats)
+        for collection in db.collections.values():
+            for sizes in ({}, array_sizes, {name: 7 * count for name, count in array_sizes.items()}):
+                assert calculator.calculate_document_size(collection.schema, sizes) == \
+                    _recursive_size(collection.schema, sizes), (db_num, collection.name, sizes)
+
+
+def test_size_plan_of_nested_arrays():
+    """Nested arrays multiply their cardinalities; the plan is rebuilt after add_field"""
+    calculator = SizeCalculator(Statistics())
+    schema = _nested_arrays()
+    plan = calculator.compile_size_plan(schema)
+    assert dict(plan.array_terms).keys() == {("lines",), ("lines", "lots")}
+    assert plan.array_names == ("lines", "lots")
+    for sizes in ({}, {"lines": 3}, {"lines": 3, "lots": 4}):
+        assert plan.evaluate(sizes) == _recursive_size(schema, sizes)
+    assert calculator.compile_size_plan(schema) is plan
+
+    schema.add_field(Field(name="note", field_type="longstring"))
+    assert calculator.compile_size_plan(schema) is not plan
+    assert calculator.calculate_document_size(schema, {"lots": 2}) == _recursive_size(schema, {"lots": 2})
+
+
+def test_batch_sizes_equal_the_scalar_sizes():
+    """Each grid point of the batch APIs matches the scalar calculation (NumPy is optional)"""
+    if np is None:
+        return
+    stats, db = _database(2)
+    calculator = SizeCalculator(stats)
+    stocks, categories = np.meshgrid(np.arange(50, 60), np.arange(1, 4))
+    batch = calculator.calculate_sizes_batch(db, {"stocks": stocks, "categories": categories})
+    assert batch.database_size.shape == stocks.shape
+
+    for row, col in np.ndindex(stocks.shape):
+        sizes = {"stocks": int(stocks[row, col]), "categories": int(categories[row, col])}
+        database_size = 0
+        for collection in db.collections.values():
+            collection_size = calculator.calculate_collection_size(collection, sizes)
+            assert batch.document_sizes[collection.name][row, col] == \
+                calculator.calculate_document_size(collection.schema, sizes)
+            assert batch.collection_sizes[collection.name][row, col] == collection_size
+            database_size += collection_size
+        assert batch.database_size[row, col] == database_size
+
+    schema = _nested_arrays()
+    lines = np.arange(1, 6)
+    assert list(calculator.calculate_document_size_batch(schema, {"lines": lines, "lots": 3})) == \
+        [_recursive_size(schema, {"lines": int(count), "lots": 3}) for count in lines]
+
+
+def test_projection_cache_hits():
+    """Equal projections hit the cache whatever the key order and return the same size"""
+    stats, db = _database(1)
+    calculator = SizeCalculator(stats, projection_cache=ProjectionSizeCache())
+    schema = db.get_collection("Product").schema
+
+    first = calculator.calculate_projection_size(schema, ["IDP", "price"])
+    second = calculator.calculate_projection_size(schema, ["price", "IDP"])
+    assert first == second
+    assert calculator.projection_cache.info()['hits'] == 1
+    assert calculator.projection_cache.info()['misses'] == 1
+
+    # Repeated keys count each time, like the projections of the operators
+    assert calculator.calculate_projection_size(schema, ["IDP", "IDP"]) > \
+        calculator.calculate_projection_size(schema, ["IDP"])
+
+
+def test_projection_cache_eviction():
+    """The least recently used entry is evicted once the cache is full"""
+    stats, db = _database(1)
+    calculator = SizeCalculator(stats, projection_cache=ProjectionSizeCache(maxsize=2))
+    schema = db.get_collection("Product").schema
+
+    calculator.calculate_projection_size(schema, ["IDP"])
+    calculator.calculate_projection_size(schema, ["name"])
+    calculator.calculate_projection_size(schema, ["IDP"])  # "name" is now the oldest
+    calculator.calculate_projection_size(schema, ["brand"])
+    assert len(calculator.projection_cache) == 2
+
+    cache = calculator.projection_cache
+    calculator.calculate_projection_size(schema, ["IDP"])
+    assert cache.info()['hits'] == 2
+    calculator.calculate_projection_size(schema, ["name"])
+    assert cache.info()['misses'] == 4
+
+
+def test_projection_cache_follows_schema_changes():
+    """Adding a field gives a new cache entry instead of the stale size"""
+    calculator = SizeCalculator(Statistics(), projection_cache=ProjectionSizeCache())
+    schema = Schema(name="Item", fields=[Field(name="id", field_type="integer")])
+    before = calculator.calculate_projection_size(schema, ["id", "label"])
+
+    schema.add_field(Field(name="label", field_type="string"))
+    after = calculator.calculate_projection_size(schema, ["id", "label"])
+    assert after > before
+    assert after == calculator.calculate_document_size(schema)
+
+    # Structurally equal schemas share their entries
+    twin = Schema(name="Item", fields=list(schema.fields))
+    assert calculator.calculate_projection_size(twin, ["id", "label"]) == after
+    assert calculator.projection_cache.info()['hits'] == 1
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")
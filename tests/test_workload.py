@@ -0,0 +1,116 @@
+"""
+Checks for workload costing and the shared executions of execute_workload
+Run with pytest or directly: python tests/test_workload.py
+"""
+
+import sys
+import os
+# Add parent directory to path to import modules
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+from models.statistics import Statistics
+from parsers.schema_parser import SchemaParser
+from operators import QueryExecutor, QueryOptimizer
+
+
+STRATEGY = {"Stock": "IDP", "Product": "IDP", "OrderLine": "IDC"}
+ARRAY_SIZES = {"categories": 2}
+
+
+def _executor(db_num: int = 1) -> QueryExecutor:
+    stats = Statistics()
+    db = SchemaParser.build_db_from_json(db_num, stats, os.path.join(ROOT, "schemas", f"db{db_num}.json"))
+    return QueryExecutor(db, stats)
+
+
+def test_repeated_entries_are_executed_once():
+    """Q1 twice and "q1" once: one execution, two reuses"""
+    result = _executor().execute_workload(
+        [("Q1", {}, 10), ("q1", {}, 5), ("Q2", {"brand": "Apple"}, 1)], STRATEGY, ARRAY_SIZES
+    )
+    assert result.executions == 2
+    assert result.reused == 1
+    assert result.total_frequency_per_s == 16
+
+
+def test_same_sql_plan_is_shared():
+    """Differently written SQL compiling to the same plan is priced once"""
+    result = _executor().execute_workload(
+        [("SELECT S.quantity FROM Stock S WHERE S.IDP = $IDP", {}, 1),
+         ("select S.quantity  from Stock S where S.IDP = $IDP", {}, 1)],
+        STRATEGY, ARRAY_SIZES
+    )
+    assert result.executions == 1
+    assert result.reused == 1
+
+
+def test_unhashable_parameters():
+    """List-valued parameters are keyed without raising TypeError"""
+    calls = []
+
+    def execute(query, sharding_strategy, array_sizes, **params):
+        calls.append(params)
+        return _executor().execute_query("Q1", sharding_strategy, array_sizes)
+
+    result = _executor().execute_workload(
+        [("Q1", {"ids": [1, 2]}, 1), ("Q1", {"ids": [1, 2]}, 1), ("Q1", {"ids": [3]}, 1)],
+        STRATEGY, ARRAY_SIZES, execute=execute
+    )
+    assert len(calls) == 2
+    assert result.executions == 2
+    assert result.reused == 1
+
+
+def test_aliases_do_not_change_the_plan():
+    """The same plan written with other aliases is one execution"""
+    result = _executor().execute_workload(
+        [("SELECT P.name, S.quantity FROM Stock S JOIN Product P ON S.IDP = P.IDP WHERE S.IDW = $IDW", {}, 1),
+         ("SELECT Prod.name, St.quantity FROM Stock St JOIN Product Prod ON St.IDP = Prod.IDP "
+          "WHERE St.IDW = $IDW", {}, 1)],
+        STRATEGY, ARRAY_SIZES
+    )
+    assert result.executions == 1
+    assert result.reused == 1
+
+
+def test_hand_written_and_sql_queries_share_their_join():
+    """Q4 by id and as SQL are two executions computing the same join node"""
+    result = _executor().execute_workload(
+        [("Q4", {}, 1),
+         ("SELECT P.name, S.quantity FROM Stock S JOIN Product P ON S.IDP = P.IDP WHERE S.IDW = $IDW", {}, 1)],
+        STRATEGY, ARRAY_SIZES
+    )
+    assert result.executions == 2
+    assert result.shared_sub_results == 1
+    assert result.queries[0].result.cost.time_ms == result.queries[1].result.cost.time_ms
+
+
+def test_sub_plans_are_shared_across_queries():
+    """A two-way join and a three-way join priced by the optimizer share their Warehouse-Stock steps"""
+    executor = _executor()
+    optimizer = QueryOptimizer(executor)
+    strategy = {"Stock": "IDP", "Product": "IDP", "Warehouse": "IDW"}
+    two_way = ("SELECT W.location, S.quantity, S.IDP FROM Warehouse W JOIN Stock S ON W.IDW = S.IDW "
+               "WHERE W.IDW = $IDW", {}, 1)
+    three_way = ("SELECT W.location, P.name, S.quantity "
+                 "FROM Warehouse W JOIN Stock S ON W.IDW = S.IDW JOIN Product P ON S.IDP = P.IDP "
+                 "WHERE W.IDW = $IDW AND P.brand = $brand", {"brand": "Apple"}, 1)
+
+    def optimize(query, sharding_strategy, array_sizes, **params):
+        return optimizer.optimize(query, sharding_strategy, array_sizes, **params)
+
+    alone = [executor.execute_workload([entry], strategy, execute=optimize) for entry in (two_way, three_way)]
+    together = executor.execute_workload([two_way, three_way], strategy, execute=optimize)
+
+    assert together.shared_sub_results > sum(result.shared_sub_results for result in alone)
+    for shared, single in zip(together.queries, alone):
+        assert shared.result.cost.time_ms == single.queries[0].result.cost.time_ms
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            check()
+            print(f"{name}: ok")